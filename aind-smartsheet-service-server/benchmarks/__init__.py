@@ -0,0 +1,19 @@
+"""Benchmarks of the server. Run from the server directory, e.g.
+python -m benchmarks.handler_benchmark"""
+
+import os
+
+# The settings of the server require these. The benchmarks never contact
+# Smartsheet, so placeholder values are enough.
+for _name, _value in {
+    "SMARTSHEET_ACCESS_TOKEN": "benchmark",
+    "SMARTSHEET_ACCESS_TOKEN_2": "benchmark",
+    "SMARTSHEET_FUNDING_ID": "1",
+    "SMARTSHEET_PROTOCOLS_ID": "2",
+    "SMARTSHEET_PERFUSIONS_ID": "3",
+    "SMARTSHEET_MOUSE_TRACKER_ID": "4",
+    "SMARTSHEET_SAMPLE_TRACKING_ID": "5",
+    "SMARTSHEET_IMAGING_QUEUE_ID": "6",
+    "SMARTSHEET_EXASPIM_QC_SHEET_ID": "7",
+}.items():
+    os.environ.setdefault(_name, _value)
@@ -0,0 +1,216 @@
+"""A local stand-in for the Smartsheet API that serves generated sheets
+with configurable latency, errors and rate limiting.
+Usage: python -m benchmarks.fake_smartsheet --port 8001 --latency 0.5"""
+
+import argparse
+import asyncio
+import json
+import random
+import threading
+import time
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+
+import uvicorn
+from pydantic import BaseModel, Field
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse, Response
+from starlette.routing import Route
+
+from aind_smartsheet_service_server.registry import sheet_registry
+from benchmarks.sheet_generator import generate_registered_sheet
+
+
+class FakeSmartsheetConfig(BaseModel):
+    """How the fake API behaves"""
+
+    latency: float = Field(default=0.0, description="Seconds per response")
+    jitter: float = Field(
+        default=0.0, description="Random seconds added to the latency"
+    )
+    error_rate: float = Field(
+        default=0.0, description="Fraction of requests answered with a 500"
+    )
+    rate_limit_rate: float = Field(
+        default=0.0, description="Fraction of requests answered with a 429"
+    )
+
+
+class FakeSmartsheet:
+    """
+    Serves GET /2.0/sheets/{id} and GET /2.0/sheets/{id}/version for a set
+    of sheets. Errors use the error codes the Smartsheet SDK retries, so
+    clients behave as they would against the real API. Every response is
+    counted by endpoint and status code.
+    """
+
+    def __init__(
+        self,
+        sheets: Dict[int, dict],
+        config: Optional[FakeSmartsheetConfig] = None,
+        seed: int = 0,
+    ):
+        """
+        Class constructor
+        Parameters
+        ----------
+        sheets : Dict[int, dict]
+          Sheets to serve by sheet_id.
+        config : FakeSmartsheetConfig | None
+        seed : int
+          Seed of the random latency and errors.
+        """
+        self.config = config or FakeSmartsheetConfig()
+        self.calls: Counter[Tuple[str, int]] = Counter()
+        self._bodies = {i: json.dumps(s).encode() for i, s in sheets.items()}
+        self._versions = {i: s["version"] for i, s in sheets.items()}
+        self._random = random.Random(seed)
+        self.app = Starlette(
+            routes=[
+                Route("/2.0/sheets/{sheet_id:int}", self.get_sheet),
+                Route(
+                    "/2.0/sheets/{sheet_id:int}/version",
+                    self.get_sheet_version,
+                ),
+            ]
+        )
+
+    @property
+    def sheet_ids(self) -> List[int]:
+        """Ids of the served sheets."""
+        return sorted(self._bodies)
+
+    async def _failure(self, endpoint: str) -> Optional[Response]:
+        """Wait for the latency and pick an error response, if any."""
+        config = self.config
+        await asyncio.sleep(
+            config.latency + self._random.random() * config.jitter
+        )
+        draw = self._random.random()
+        if draw < config.rate_limit_rate:
+            self.calls[(endpoint, 429)] += 1
+            return JSONResponse(
+                {"errorCode": 4003, "message": "Rate limit exceeded."},
+                status_code=429,
+            )
+        if draw < config.rate_limit_rate + config.error_rate:
+            self.calls[(endpoint, 500)] += 1
+            return JSONResponse(
+                {
+                    "errorCode": 4004,
+                    "message": "An unexpected error has occurred.",
+                },
+                status_code=500,
+            )
+        return None
+
+    def _not_found(self, endpoint: str) -> Response:
+        """Error returned for an unknown sheet."""
+        self.calls[(endpoint, 404)] += 1
+        return JSONResponse(
+            {"errorCode": 1006, "message": "Not Found"}, status_code=404
+        )
+
+    async def get_sheet(self, request: Request) -> Response:
+        """Return a whole sheet."""
+        sheet_id = request.path_params["sheet_id"]
+        failure = await self._failure("sheet")
+        if failure is not None:
+            return failure
+        if sheet_id not in self._bodies:
+            return self._not_found("sheet")
+        self.calls[("sheet", 200)] += 1
+        return Response(self._bodies[sheet_id], media_type="application/json")
+
+    async def get_sheet_version(self, request: Request) -> Response:
+        """Return the version of a sheet."""
+        sheet_id = request.path_params["sheet_id"]
+        failure = await self._failure("version")
+        if failure is not None:
+            return failure
+        if sheet_id not in self._versions:
+            return self._not_found("version")
+        self.calls[("version", 200)] += 1
+        return JSONResponse({"version": self._versions[sheet_id]})
+
+
+class ServerThread:
+    """Runs an ASGI app with uvicorn in a background thread"""
+
+    def __init__(self, app, host: str = "127.0.0.1", port: int = 0):
+        """
+        Class constructor
+        Parameters
+        ----------
+        app : ASGIApp
+        host : str
+        port : int
+          0 picks a free port.
+        """
+        self.server = uvicorn.Server(
+            uvicorn.Config(app, host=host, port=port, log_level="warning")
+        )
+        self._thread = threading.Thread(target=self.server.run, daemon=True)
+
+    @property
+    def url(self) -> str:
+        """Base url of the running server."""
+        host, port = self.server.servers[0].sockets[0].getsockname()[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "ServerThread":
+        """Start the server and wait until it accepts requests."""
+        self._thread.start()
+        while not self.server.started:
+            if not self._thread.is_alive():
+                raise RuntimeError("Server failed to start.")
+            time.sleep(0.01)
+        return self
+
+    def stop(self) -> None:
+        """Shut the server down and wait for it."""
+        self.server.should_exit = True
+        self._thread.join()
+
+
+def generate_sheets(rows: int, columns: int) -> Dict[int, dict]:
+    """Generated copy of every registered sheet with a model by sheet_id."""
+    return {
+        sheet.sheet_id: generate_registered_sheet(
+            sheet, rows=rows, columns=columns
+        )
+        for sheet in sheet_registry
+        if sheet.model is not None
+    }
+
+
+def main() -> None:
+    """Serve generated sheets until interrupted."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--port", type=int, default=8001)
+    parser.add_argument("--rows", type=int, default=20_000)
+    parser.add_argument("--columns", type=int, default=150)
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--jitter", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0)
+    args = parser.parse_args()
+    fake = FakeSmartsheet(
+        sheets=generate_sheets(rows=args.rows, columns=args.columns),
+        config=FakeSmartsheetConfig(
+            latency=args.latency,
+            jitter=args.jitter,
+            error_rate=args.error_rate,
+            rate_limit_rate=args.rate_limit_rate,
+        ),
+    )
+    print(
+        f"Set SMARTSHEET_API_BASE=http://127.0.0.1:{args.port}/2.0 to use "
+        f"this API. Sheet ids: {fake.sheet_ids}"
+    )
+    uvicorn.run(fake.app, host="127.0.0.1", port=args.port)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,238 @@
+"""Measure how parsing, filtering, mapping and serializing generated sheets
+scales with their size.
+Usage: python -m benchmarks.handler_benchmark --rows 1000 20000
+"""
+
+import argparse
+import gc
+import sys
+import tracemalloc
+from time import perf_counter
+from typing import Any, Callable, Dict, List, Optional
+
+from pydantic import BaseModel, TypeAdapter
+
+from aind_smartsheet_service_server.handler import (
+    RowFilter,
+    SheetHandler,
+    SheetIndex,
+    default_row_map,
+)
+from aind_smartsheet_service_server.models import SheetFields
+from aind_smartsheet_service_server.parsing import validate_rows
+from aind_smartsheet_service_server.registry import (
+    RegisteredSheet,
+    sheet_registry,
+)
+from benchmarks.sheet_generator import generate_registered_sheet
+
+
+class StageResult(BaseModel):
+    """Time and memory of one stage on one generated sheet"""
+
+    sheet: str
+    rows: int
+    columns: int
+    stage: str
+    seconds: float
+    rows_per_second: float
+    peak_mib: float
+
+
+def measure(func: Callable[[], Any], repeat: int) -> tuple[float, float, Any]:
+    """
+    Time func and measure the memory it allocates.
+    Parameters
+    ----------
+    func : Callable[[], Any]
+    repeat : int
+      The fastest of this many runs is kept.
+
+    Returns
+    -------
+    tuple[float, float, Any]
+      Fastest run in seconds, peak traced memory in MiB and the result of
+      the last run.
+
+    """
+    best = float("inf")
+    for _ in range(repeat):
+        gc.collect()
+        start = perf_counter()
+        result = func()
+        best = min(best, perf_counter() - start)
+    # Tracing memory slows code down, so it is a separate run
+    gc.collect()
+    tracemalloc.start()
+    func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return best, peak / 2**20, result
+
+
+def benchmark_sheet(
+    sheet: RegisteredSheet, rows: int, columns: int, repeat: int
+) -> List[StageResult]:
+    """
+    Run every stage on a generated copy of a sheet.
+    Parameters
+    ----------
+    sheet : RegisteredSheet
+    rows : int
+    columns : int
+    repeat : int
+
+    Returns
+    -------
+    List[StageResult]
+
+    """
+    raw_sheet = generate_registered_sheet(sheet, rows=rows, columns=columns)
+    model = sheet.model
+    filter_column = int(
+        model.model_fields[sheet.index_columns[0]].validation_alias
+    )
+    results = []
+
+    def record(stage: str, func: Callable[[], Any]) -> Any:
+        """Measure a stage and keep its result for the next stages."""
+        seconds, peak_mib, result = measure(func, repeat)
+        results.append(
+            StageResult(
+                sheet=sheet.name,
+                rows=rows,
+                columns=columns,
+                stage=stage,
+                seconds=seconds,
+                rows_per_second=rows / seconds,
+                peak_mib=peak_mib,
+            )
+        )
+        return result
+
+    sheet_fields: SheetFields = record(
+        "validate", lambda: SheetFields.model_validate(raw_sheet)
+    )
+    # Columns are indexed on first use
+    record("index", lambda: SheetIndex(sheet_fields).column(filter_column))
+    sheet_index = SheetIndex(sheet_fields)
+    value = next(
+        cell.displayValue
+        for cell in sheet_fields.rows[0].cells
+        if cell.columnId == filter_column
+    )
+    row_filter = RowFilter(values={filter_column: [value]})
+    record(
+        "filter_scan",
+        lambda: SheetHandler(
+            sheet_fields=sheet_fields, row_filter=row_filter
+        ).get_matched_rows(),
+    )
+    record(
+        "filter_index",
+        lambda: SheetHandler(
+            sheet_fields=sheet_fields,
+            row_filter=row_filter,
+            sheet_index=sheet_index,
+        ).get_matched_rows(),
+    )
+    mapped_rows = record(
+        "map", lambda: [default_row_map(r) for r in sheet_fields.rows]
+    )
+    parsed_rows = record(
+        "parse", lambda: validate_rows(model, mapped_rows, validate=True)
+    )
+    adapter = TypeAdapter(List[model])
+    record("serialize", lambda: adapter.dump_json(parsed_rows))
+    return results
+
+
+def find_regressions(
+    results: List[StageResult],
+    baseline: List[StageResult],
+    max_slowdown: float,
+) -> List[str]:
+    """
+    Compare results with a saved baseline.
+    Parameters
+    ----------
+    results : List[StageResult]
+    baseline : List[StageResult]
+    max_slowdown : float
+      Ratio of seconds to the baseline above which a stage has regressed.
+
+    Returns
+    -------
+    List[str]
+      Description of each regressed stage.
+
+    """
+    previous: Dict[tuple, StageResult] = {
+        (r.sheet, r.rows, r.columns, r.stage): r for r in baseline
+    }
+    regressions = []
+    for result in results:
+        before = previous.get(
+            (result.sheet, result.rows, result.columns, result.stage)
+        )
+        if before is not None and result.seconds > (
+            before.seconds * max_slowdown
+        ):
+            regressions.append(
+                f"{result.sheet} {result.rows} rows {result.stage}: "
+                f"{before.seconds:.4f}s -> {result.seconds:.4f}s"
+            )
+    return regressions
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Run the benchmarks and print a table of the results."""
+    sheets = [s for s in sheet_registry if s.model is not None]
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--sheets", nargs="+", choices=[s.name for s in sheets]
+    )
+    parser.add_argument("--rows", nargs="+", type=int, default=[1000, 20000])
+    parser.add_argument("--columns", type=int, default=150)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--output", help="Write the results as json")
+    parser.add_argument("--baseline", help="Results json to compare with")
+    parser.add_argument(
+        "--max-slowdown",
+        type=float,
+        default=1.25,
+        help="Fail if a stage is this many times slower than the baseline",
+    )
+    args = parser.parse_args(argv)
+    results: List[StageResult] = []
+    print(
+        f"{'sheet':<18}{'rows':>8}{'stage':>14}{'seconds':>10}"
+        f"{'rows/s':>12}{'peak MiB':>10}"
+    )
+    for sheet in sheets:
+        if args.sheets and sheet.name not in args.sheets:
+            continue
+        for rows in args.rows:
+            for r in benchmark_sheet(sheet, rows, args.columns, args.repeat):
+                print(
+                    f"{r.sheet:<18}{r.rows:>8}{r.stage:>14}"
+                    f"{r.seconds:>10.4f}{r.rows_per_second:>12.0f}"
+                    f"{r.peak_mib:>10.1f}"
+                )
+                results.append(r)
+    adapter = TypeAdapter(List[StageResult])
+    if args.output:
+        with open(args.output, "wb") as f:
+            f.write(adapter.dump_json(results, indent=2))
+    if args.baseline:
+        with open(args.baseline, "rb") as f:
+            baseline = adapter.validate_json(f.read())
+        regressions = find_regressions(results, baseline, args.max_slowdown)
+        for regression in regressions:
+            print(f"Regression: {regression}", file=sys.stderr)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
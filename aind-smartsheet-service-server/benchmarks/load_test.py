@@ -0,0 +1,350 @@
+"""Run the service against a local fake Smartsheet API and drive it with a
+mix of concurrent requests under several upstream scenarios.
+Usage: python -m benchmarks.load_test --rows 5000 --requests 500
+"""
+
+import argparse
+import asyncio
+import logging
+import random
+import sys
+from statistics import quantiles
+from time import perf_counter
+from typing import Dict, List, Optional, Tuple
+
+import httpx
+from pydantic import BaseModel, RedisDsn, SecretStr, TypeAdapter
+
+from aind_smartsheet_service_server.configs import settings
+from aind_smartsheet_service_server.models import (
+    FundingModel,
+    PerfusionsModel,
+    ProtocolsModel,
+)
+from aind_smartsheet_service_server.registry import sheet_registry
+from aind_smartsheet_service_server.snapshot import snapshot_store
+from benchmarks.fake_smartsheet import (
+    FakeSmartsheet,
+    FakeSmartsheetConfig,
+    ServerThread,
+    generate_sheets,
+)
+
+ADMIN_TOKEN = "load-test"
+
+
+class Scenario(BaseModel):
+    """Behaviour of the fake API while a batch of requests is sent"""
+
+    name: str
+    upstream: FakeSmartsheetConfig
+
+
+SCENARIOS = [
+    Scenario(name="fast_upstream", upstream=FakeSmartsheetConfig()),
+    Scenario(
+        name="slow_upstream",
+        upstream=FakeSmartsheetConfig(latency=2.0, jitter=1.0),
+    ),
+    Scenario(
+        name="flaky_upstream",
+        upstream=FakeSmartsheetConfig(
+            latency=0.2, error_rate=0.1, rate_limit_rate=0.2
+        ),
+    ),
+]
+
+
+class ScenarioResult(BaseModel):
+    """Throughput, latency and upstream calls of one scenario"""
+
+    scenario: str
+    requests: int
+    errors: int
+    seconds: float
+    throughput: float
+    p50_ms: float
+    p90_ms: float
+    p99_ms: float
+    upstream_calls: Dict[str, int]
+
+
+def _field_value(raw_sheet: dict, model: type[BaseModel], field: str) -> str:
+    """First non empty displayValue of the column of a model field."""
+    column_id = int(model.model_fields[field].validation_alias)
+    return next(
+        cell["displayValue"]
+        for row in raw_sheet["rows"]
+        for cell in row["cells"]
+        if cell["columnId"] == column_id and cell.get("displayValue")
+    )
+
+
+def default_mix(sheets: Dict[int, dict]) -> Dict[str, int]:
+    """
+    Weighted request paths with filter values found in the sheets.
+    Parameters
+    ----------
+    sheets : Dict[int, dict]
+      Generated sheets by sheet_id.
+
+    Returns
+    -------
+    Dict[str, int]
+      Relative weight of each path.
+
+    """
+    funding = sheets[settings.funding_id]
+    protocols = sheets[settings.protocols_id]
+    perfusions = sheets[settings.perfusions_id]
+    protocol_name = _field_value(protocols, ProtocolsModel, "protocol_name")
+    mouse_tracker = sheet_registry.get("mouse_tracker")
+    params = {
+        "project_name": _field_value(funding, FundingModel, "project_name"),
+        "subject_id": _field_value(perfusions, PerfusionsModel, "subject_id"),
+        "specimen_id": _field_value(
+            sheets[mouse_tracker.sheet_id], mouse_tracker.model, "mouse_id"
+        ),
+    }
+    query = {k: httpx.QueryParams({k: v}) for k, v in params.items()}
+    return {
+        f"/funding?{query['project_name']}": 3,
+        "/project_names": 2,
+        "/protocols?"
+        f"{httpx.QueryParams(protocol_name_prefix=protocol_name[:5])}": 2,
+        f"/protocols/search?{httpx.QueryParams(q=protocol_name[:8])}": 1,
+        f"/perfusions?{query['subject_id']}": 2,
+        f"/get_exaspim_info?{query['specimen_id']}": 1,
+        "/sheets/funding": 1,
+    }
+
+
+def summarize(
+    scenario: str,
+    results: List[Tuple[float, int]],
+    seconds: float,
+    upstream_calls: Dict[str, int],
+) -> ScenarioResult:
+    """
+    Build the result of a scenario.
+    Parameters
+    ----------
+    scenario : str
+    results : List[Tuple[float, int]]
+      Latency in seconds and status code of each request.
+    seconds : float
+      Time to send every request.
+    upstream_calls : Dict[str, int]
+
+    Returns
+    -------
+    ScenarioResult
+
+    """
+    latencies = sorted(r[0] * 1000 for r in results)
+    cuts = quantiles(latencies, n=100) if len(latencies) > 1 else latencies
+    return ScenarioResult(
+        scenario=scenario,
+        requests=len(results),
+        errors=sum(1 for _, status in results if status >= 400),
+        seconds=seconds,
+        throughput=len(results) / seconds,
+        p50_ms=cuts[min(49, len(cuts) - 1)],
+        p90_ms=cuts[min(89, len(cuts) - 1)],
+        p99_ms=cuts[min(98, len(cuts) - 1)],
+        upstream_calls=upstream_calls,
+    )
+
+
+async def drive(
+    base_url: str,
+    mix: Dict[str, int],
+    requests: int,
+    concurrency: int,
+    seed: int = 0,
+) -> Tuple[List[Tuple[float, int]], float]:
+    """
+    Send requests picked from the mix with a fixed number in flight.
+    Parameters
+    ----------
+    base_url : str
+    mix : Dict[str, int]
+      Relative weight of each path.
+    requests : int
+    concurrency : int
+    seed : int
+
+    Returns
+    -------
+    Tuple[List[Tuple[float, int]], float]
+      Latency and status code of each request, and the total seconds.
+
+    """
+    paths = random.Random(seed).choices(
+        list(mix), weights=list(mix.values()), k=requests
+    )
+    queue: asyncio.Queue = asyncio.Queue()
+    for path in paths:
+        queue.put_nowait(path)
+    results: List[Tuple[float, int]] = []
+
+    async def worker(client: httpx.AsyncClient) -> None:
+        """Send requests until the queue is empty."""
+        while not queue.empty():
+            path = queue.get_nowait()
+            start = perf_counter()
+            try:
+                status = (await client.get(path)).status_code
+            except httpx.HTTPError:
+                status = 599
+            results.append((perf_counter() - start, status))
+
+    limits = httpx.Limits(max_connections=concurrency)
+    async with httpx.AsyncClient(
+        base_url=base_url, limits=limits, timeout=120
+    ) as client:
+        start = perf_counter()
+        await asyncio.gather(*(worker(client) for _ in range(concurrency)))
+        return results, perf_counter() - start
+
+
+def reset_cache(client: httpx.Client) -> None:
+    """Evict every sheet so each scenario starts cold."""
+    headers = {"Authorization": f"Bearer {ADMIN_TOKEN}"}
+    for sheet in sheet_registry:
+        client.post(
+            f"/admin/sheets/{sheet.sheet_id}/evict", headers=headers
+        ).raise_for_status()
+    snapshot_store.clear()
+
+
+def run_scenarios(
+    scenarios: List[Scenario],
+    rows: int,
+    columns: int,
+    requests: int,
+    concurrency: int,
+    mix: Optional[Dict[str, int]] = None,
+) -> List[ScenarioResult]:
+    """
+    Start the fake API and the service, then run each scenario.
+    Parameters
+    ----------
+    scenarios : List[Scenario]
+    rows : int
+      Rows of each generated sheet.
+    columns : int
+    requests : int
+      Requests per scenario.
+    concurrency : int
+      Requests in flight at once.
+    mix : Dict[str, int] | None
+      Weighted request paths. Defaults to default_mix.
+
+    Returns
+    -------
+    List[ScenarioResult]
+
+    """
+    # Imported here so that importing this module does not build the app
+    from aind_smartsheet_service_server.main import app
+
+    sheets = generate_sheets(rows=rows, columns=columns)
+    fake = FakeSmartsheet(sheets=sheets)
+    fake_server = ServerThread(fake.app).start()
+    settings.api_base = f"{fake_server.url}/2.0"
+    settings.admin_token = SecretStr(ADMIN_TOKEN)
+    app_server = ServerThread(app).start()
+    results = []
+    try:
+        with httpx.Client(base_url=app_server.url) as admin_client:
+            for scenario in scenarios:
+                fake.config = scenario.upstream
+                reset_cache(admin_client)
+                fake.calls.clear()
+                responses, seconds = asyncio.run(
+                    drive(
+                        base_url=app_server.url,
+                        mix=mix or default_mix(sheets),
+                        requests=requests,
+                        concurrency=concurrency,
+                    )
+                )
+                upstream_calls = {
+                    f"{endpoint} {status}": count
+                    for (endpoint, status), count in sorted(fake.calls.items())
+                }
+                results.append(
+                    summarize(
+                        scenario.name, responses, seconds, upstream_calls
+                    )
+                )
+    finally:
+        app_server.stop()
+        fake_server.stop()
+    return results
+
+
+def parse_mix(items: List[str]) -> Dict[str, int]:
+    """Parse PATH=WEIGHT arguments."""
+    mix = {}
+    for item in items:
+        path, _, weight = item.rpartition("=")
+        mix[path] = int(weight)
+    return mix
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Run the scenarios and print a table of the results."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--scenarios",
+        nargs="+",
+        choices=[s.name for s in SCENARIOS],
+        default=[s.name for s in SCENARIOS],
+    )
+    parser.add_argument("--rows", type=int, default=5000)
+    parser.add_argument("--columns", type=int, default=150)
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument(
+        "--mix", nargs="+", help="PATH=WEIGHT pairs of requests to send"
+    )
+    parser.add_argument(
+        "--redis-url", help="Cache in redis instead of in memory"
+    )
+    parser.add_argument("--output", help="Write the results as json")
+    args = parser.parse_args(argv)
+    # Every request the load test sends would be logged otherwise
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    if args.redis_url:
+        settings.redis_url = RedisDsn(args.redis_url)
+    results = run_scenarios(
+        scenarios=[s for s in SCENARIOS if s.name in args.scenarios],
+        rows=args.rows,
+        columns=args.columns,
+        requests=args.requests,
+        concurrency=args.concurrency,
+        mix=parse_mix(args.mix) if args.mix else None,
+    )
+    print(
+        f"{'scenario':<16}{'requests':>9}{'errors':>8}{'req/s':>9}"
+        f"{'p50 ms':>9}{'p90 ms':>9}{'p99 ms':>9}  upstream calls"
+    )
+    for r in results:
+        calls = ", ".join(f"{k}: {v}" for k, v in r.upstream_calls.items())
+        print(
+            f"{r.scenario:<16}{r.requests:>9}{r.errors:>8}"
+            f"{r.throughput:>9.1f}{r.p50_ms:>9.0f}{r.p90_ms:>9.0f}"
+            f"{r.p99_ms:>9.0f}  {calls}"
+        )
+    if args.output:
+        with open(args.output, "wb") as f:
+            f.write(
+                TypeAdapter(List[ScenarioResult]).dump_json(results, indent=2)
+            )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,220 @@
+"""Measure the memory each representation of a generated sheet holds, per
+cached sheet, while a sheet is loaded and per concurrent request.
+Usage: python -m benchmarks.memory_benchmark --rows 1000 20000
+"""
+
+import argparse
+import gc
+import sys
+import tracemalloc
+from functools import partial
+from typing import Any, Callable, List, Optional, Tuple
+
+from fastapi_cache.coder import JsonCoder
+from pydantic import BaseModel, TypeAdapter
+
+from aind_smartsheet_service_server.models import SheetFields
+from aind_smartsheet_service_server.registry import (
+    RegisteredSheet,
+    sheet_registry,
+)
+from aind_smartsheet_service_server.snapshot import SheetSnapshot
+from benchmarks.sheet_generator import generate_registered_sheet
+
+
+class MemoryResult(BaseModel):
+    """Memory of one representation of one generated sheet"""
+
+    sheet: str
+    rows: int
+    columns: int
+    representation: str
+    scope: str
+    retained_mib: float
+    peak_mib: float
+    estimated_mib: Optional[float] = None
+
+
+def measure_memory(func: Callable[[], Any]) -> Tuple[float, float, Any]:
+    """
+    Measure the memory allocated by func.
+    Parameters
+    ----------
+    func : Callable[[], Any]
+
+    Returns
+    -------
+    Tuple[float, float, Any]
+      MiB still held by the result, peak MiB while func ran and the result.
+
+    """
+    gc.collect()
+    tracemalloc.start()
+    result = func()
+    gc.collect()
+    retained, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return retained / 2**20, peak / 2**20, result
+
+
+def benchmark_sheet(
+    sheet: RegisteredSheet, rows: int, columns: int
+) -> List[MemoryResult]:
+    """
+    Build each representation the service holds of a generated sheet.
+    Parameters
+    ----------
+    sheet : RegisteredSheet
+    rows : int
+    columns : int
+
+    Returns
+    -------
+    List[MemoryResult]
+
+    """
+    generated = generate_registered_sheet(sheet, rows=rows, columns=columns)
+    results = []
+
+    def record(
+        representation: str, scope: str, func: Callable[[], Any]
+    ) -> Any:
+        """Measure a representation and keep it for the next ones."""
+        retained_mib, peak_mib, result = measure_memory(func)
+        results.append(
+            MemoryResult(
+                sheet=sheet.name,
+                rows=rows,
+                columns=columns,
+                representation=representation,
+                scope=scope,
+                retained_mib=retained_mib,
+                peak_mib=peak_mib,
+            )
+        )
+        return result
+
+    # The cache holds the encoded sheet
+    encoded = record("cached", "sheet", partial(JsonCoder.encode, generated))
+    del generated
+    # The cached sheet is only decoded while it is loaded: when it was not
+    # cached, its version changed or its snapshot was dropped by the budget
+    raw_sheet = record(
+        "decoded",
+        "load",
+        lambda: JsonCoder.decode_as_type(encoded, type_=dict),
+    )
+
+    def build_snapshot() -> SheetSnapshot:
+        """Validate a decoded copy that is dropped, as the service does."""
+        snapshot = SheetSnapshot(
+            sheet_id=sheet.sheet_id,
+            sheet_fields=SheetFields.model_validate(
+                JsonCoder.decode_as_type(encoded, type_=dict)
+            ),
+        )
+        for field_name in sheet.index_columns:
+            snapshot.index.column(snapshot.column_id(sheet.model, field_name))
+        return snapshot
+
+    snapshot = record("snapshot", "sheet", build_snapshot)
+    results[-1].estimated_mib = snapshot.size_bytes / 2**20
+    del raw_sheet
+    handler = snapshot.get_handler(model=sheet.model)
+    parsed_rows = record(
+        "parsed",
+        "request",
+        lambda: handler.parse_rows(
+            rows=handler.get_matched_rows(), model=sheet.model
+        ),
+    )
+    adapter = TypeAdapter(List[sheet.model])
+    record("response", "request", lambda: adapter.dump_json(parsed_rows))
+    return results
+
+
+def summarize(
+    results: List[MemoryResult], concurrency: int
+) -> Tuple[float, float]:
+    """
+    Memory needed to serve the benchmarked sheets.
+    Parameters
+    ----------
+    results : List[MemoryResult]
+    concurrency : int
+      Requests served at once.
+
+    Returns
+    -------
+    Tuple[float, float]
+      MiB held per cached sheet and MiB held while concurrency requests
+      for a sheet are served as it is loaded, each for the largest sheet.
+
+    """
+    totals: dict = {"sheet": {}, "load": {}, "request": {}}
+    for r in results:
+        key = (r.sheet, r.rows, r.columns)
+        retained = r.retained_mib if r.scope == "sheet" else r.peak_mib
+        totals[r.scope][key] = totals[r.scope].get(key, 0.0) + retained
+    # Concurrent requests for a sheet wait for a single load
+    serving = {
+        key: totals["load"].get(key, 0.0) + mib * concurrency
+        for key, mib in totals["request"].items()
+    }
+    return (
+        max(totals["sheet"].values(), default=0.0),
+        max(serving.values(), default=0.0),
+    )
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Run the benchmark and print a table of the results."""
+    sheets = [s for s in sheet_registry if s.model is not None]
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--sheets", nargs="+", choices=[s.name for s in sheets]
+    )
+    parser.add_argument("--rows", nargs="+", type=int, default=[1000, 20000])
+    parser.add_argument("--columns", type=int, default=150)
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=8,
+        help="Requests served at once when totalling per request memory",
+    )
+    parser.add_argument("--output", help="Write the results as json")
+    args = parser.parse_args(argv)
+    results: List[MemoryResult] = []
+    print(
+        f"{'sheet':<18}{'rows':>8}{'representation':>16}{'scope':>9}"
+        f"{'retained MiB':>14}{'peak MiB':>10}{'estimate MiB':>14}"
+    )
+    for sheet in sheets:
+        if args.sheets and sheet.name not in args.sheets:
+            continue
+        for rows in args.rows:
+            for r in benchmark_sheet(sheet, rows, args.columns):
+                estimate = (
+                    "" if r.estimated_mib is None else f"{r.estimated_mib:.1f}"
+                )
+                print(
+                    f"{r.sheet:<18}{r.rows:>8}{r.representation:>16}"
+                    f"{r.scope:>9}{r.retained_mib:>14.1f}"
+                    f"{r.peak_mib:>10.1f}{estimate:>14}"
+                )
+                results.append(r)
+    per_sheet, per_requests = summarize(results, args.concurrency)
+    print(
+        f"Largest sheet: {per_sheet:.1f} MiB cached, {per_requests:.1f} MiB "
+        f"while serving {args.concurrency} requests at once as it is loaded"
+    )
+    if args.output:
+        with open(args.output, "wb") as f:
+            f.write(
+                TypeAdapter(List[MemoryResult]).dump_json(results, indent=2)
+            )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
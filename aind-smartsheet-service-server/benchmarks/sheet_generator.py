@@ -0,0 +1,270 @@
+"""Generate synthetic sheets shaped like the sheets the service serves.
+Usage: python -m benchmarks.sheet_generator funding --rows 20000"""
+
+import argparse
+import json
+import random
+from datetime import date, datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional, Sequence, Tuple, get_args
+
+from pydantic import BaseModel
+
+from aind_smartsheet_service_server.registry import (
+    RegisteredSheet,
+    sheet_registry,
+)
+
+WORDS = [
+    "brain",
+    "cortex",
+    "mouse",
+    "neuron",
+    "imaging",
+    "protocol",
+    "perfusion",
+    "clearing",
+    "injection",
+    "virus",
+    "sample",
+    "light",
+    "sheet",
+    "tissue",
+    "molecular",
+    "anatomy",
+    "dynamics",
+    "behavior",
+    "pipeline",
+    "expression",
+]
+START = datetime(2023, 1, 1, tzinfo=timezone.utc)
+
+
+def model_columns(model: type[BaseModel]) -> List[Tuple[int, str, Any]]:
+    """
+    Columns a model reads from.
+    Parameters
+    ----------
+    model : type[BaseModel]
+
+    Returns
+    -------
+    List[Tuple[int, str, Any]]
+      Column ID, title and annotation of each field with a column ID alias.
+
+    """
+    return [
+        (int(field.validation_alias), field.title or name, field.annotation)
+        for name, field in model.model_fields.items()
+        if isinstance(field.validation_alias, str)
+        and field.validation_alias.isdigit()
+    ]
+
+
+def _value_type(annotation: Any) -> Any:
+    """The type of a field annotation without None."""
+    types = [a for a in get_args(annotation) if a is not type(None)]
+    return types[0] if types else annotation
+
+
+def _phrase(rng: random.Random, max_words: int = 6) -> str:
+    """A few random words."""
+    return " ".join(rng.choices(WORDS, k=rng.randint(1, max_words)))
+
+
+def _cell(
+    rng: random.Random,
+    column_id: int,
+    value_type: Any,
+    pool: Optional[Sequence[str]],
+) -> Dict[str, Any]:
+    """A cell with a value of value_type, or drawn from pool if set."""
+    if pool is not None:
+        text = rng.choice(pool)
+        return {"columnId": column_id, "displayValue": text, "value": text}
+    if value_type is bool:
+        return {"columnId": column_id, "value": rng.random() < 0.5}
+    if value_type in (int, float):
+        number = rng.randint(1, 100_000)
+        return {
+            "columnId": column_id,
+            "displayValue": str(number),
+            "value": float(number),
+        }
+    if value_type in (date, datetime):
+        day = (START + timedelta(days=rng.randint(0, 730))).date()
+        return {"columnId": column_id, "value": day.isoformat()}
+    text = _phrase(rng)
+    return {"columnId": column_id, "displayValue": text, "value": text}
+
+
+def generate_sheet(
+    model: type[BaseModel],
+    rows: int,
+    columns: Optional[int] = None,
+    index_columns: Sequence[str] = (),
+    blank_fraction: float = 0.2,
+    seed: int = 0,
+    sheet_id: int = 1,
+    version: int = 1,
+) -> dict:
+    """
+    Build a sheet in the form get_smartsheet caches it.
+    Parameters
+    ----------
+    model : type[BaseModel]
+      Row model. Every column it reads from is added to the sheet.
+    rows : int
+    columns : int | None
+      Total number of columns. Text columns not read by the model are added
+      to reach it.
+    index_columns : Sequence[str]
+      Fields that are filtered on. Their values repeat across rows, about
+      ten rows per value, like ids and names do in the real sheets.
+    blank_fraction : float
+      Fraction of cells left empty.
+    seed : int
+    sheet_id : int
+    version : int
+
+    Returns
+    -------
+    dict
+
+    """
+    rng = random.Random(seed)
+    fields = model_columns(model)
+    for extra in range(max((columns or 0) - len(fields), 0)):
+        fields.append(
+            (rng.randint(10**14, 10**16), f"Extra column {extra}", str)
+        )
+    required = {
+        int(f.validation_alias)
+        for f in model.model_fields.values()
+        if f.is_required()
+    }
+    pool_size = max(rows // 10, 1)
+    pools = {
+        int(model.model_fields[name].validation_alias): [
+            f"{_phrase(rng, 3)} {i}" for i in range(pool_size)
+        ]
+        for name in index_columns
+    }
+    sheet_rows = []
+    for position in range(rows):
+        created_at = START + timedelta(minutes=rng.randint(0, 10**6))
+        modified_at = created_at + timedelta(minutes=rng.randint(0, 10**5))
+        cells = [
+            (
+                {"columnId": column_id}
+                if column_id not in required and rng.random() < blank_fraction
+                else _cell(
+                    rng,
+                    column_id,
+                    _value_type(annotation),
+                    pools.get(column_id),
+                )
+            )
+            for column_id, _, annotation in fields
+        ]
+        sheet_rows.append(
+            {
+                "cells": cells,
+                "createdAt": created_at.isoformat(),
+                "expanded": True,
+                "id": rng.randint(10**14, 10**16),
+                "modifiedAt": modified_at.isoformat(),
+                "rowNumber": position + 1,
+            }
+        )
+    return {
+        "columns": [
+            {
+                "id": column_id,
+                "index": index,
+                "title": title,
+                "type": "TEXT_NUMBER",
+                "validation": False,
+                "version": 0,
+                "width": 150,
+                "primary": index == 0,
+            }
+            for index, (column_id, title, _) in enumerate(fields)
+        ],
+        "accessLevel": "VIEWER",
+        "createdAt": START.isoformat(),
+        "dependenciesEnabled": False,
+        "effectiveAttachmentOptions": ["FILE", "LINK"],
+        "ganttEnabled": False,
+        "hasSummaryFields": False,
+        "id": sheet_id,
+        "modifiedAt": (START + timedelta(days=730)).isoformat(),
+        "name": f"Synthetic {model.__name__}",
+        "permalink": f"https://app.smartsheet.com/sheets/{sheet_id}",
+        "readOnly": True,
+        "resourceManagementEnabled": False,
+        "rows": sheet_rows,
+        "totalRowCount": rows,
+        "userPermissions": {"summaryPermissions": "READ_ONLY"},
+        "userSettings": {
+            "criticalPathEnabled": False,
+            "displaySummaryTasks": True,
+        },
+        "version": version,
+        "workspace": {"id": 1, "name": "Synthetic workspace"},
+    }
+
+
+def generate_registered_sheet(
+    sheet: RegisteredSheet, rows: int, columns: Optional[int] = None, **kwargs
+) -> dict:
+    """
+    Build a sheet for a registered sheet with its model and index columns.
+    Parameters
+    ----------
+    sheet : RegisteredSheet
+      Must have a model.
+    rows : int
+    columns : int | None
+    kwargs
+      Passed to generate_sheet.
+
+    Returns
+    -------
+    dict
+
+    """
+    return generate_sheet(
+        model=sheet.model,
+        rows=rows,
+        columns=columns,
+        index_columns=sheet.index_columns,
+        sheet_id=sheet.sheet_id,
+        **kwargs,
+    )
+
+
+def main() -> None:
+    """Write a generated sheet as json."""
+    sheet_names = [s.name for s in sheet_registry if s.model is not None]
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("sheet", choices=sheet_names)
+    parser.add_argument("--rows", type=int, default=20_000)
+    parser.add_argument("--columns", type=int, default=150)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default="-", help="File or - for stdout")
+    args = parser.parse_args()
+    raw_sheet = generate_registered_sheet(
+        sheet_registry.get(args.sheet),
+        rows=args.rows,
+        columns=args.columns,
+        seed=args.seed,
+    )
+    if args.output == "-":
+        print(json.dumps(raw_sheet))
+    else:
+        with open(args.output, "w") as f:
+            json.dump(raw_sheet, f)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,165 @@
+"""Measure how long a new worker takes from importing the app until its
+startup is done, and which packages take longest to import.
+Usage: python -m benchmarks.startup_benchmark --runs 5 --budget 1.5
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from collections import defaultdict
+from typing import Dict, List, Optional
+
+from pydantic import BaseModel, TypeAdapter
+
+# Packages only imported once they are used. Importing them on startup would
+# slow down every new worker.
+DEFERRED_PACKAGES = ("pythonjsonlogger", "redis", "smartsheet", "yaml")
+
+# Median seconds until a new worker is ready that the benchmark fails above
+DEFAULT_BUDGET_SECONDS = 1.5
+
+# Runs in a new interpreter so that nothing is imported yet
+_STARTUP_SCRIPT = """
+import asyncio, json, sys
+from time import perf_counter
+
+start = perf_counter()
+import benchmarks
+from aind_smartsheet_service_server.main import app, lifespan
+
+imported = perf_counter()
+
+
+async def start_app():
+    async with lifespan(app):
+        return perf_counter()
+
+
+ready = asyncio.run(start_app())
+print(json.dumps({
+    "import_seconds": imported - start,
+    "ready_seconds": ready - start,
+    "packages": sorted({m.split(".")[0] for m in sys.modules}),
+}))
+"""
+
+
+class StartupResult(BaseModel):
+    """Time one new interpreter took to import the app and start it"""
+
+    run: int
+    import_seconds: float
+    ready_seconds: float
+    deferred_packages_loaded: List[str]
+
+
+def _run_startup(*options: str) -> subprocess.CompletedProcess:
+    """Import and start the app in a new interpreter with the same path."""
+    env = {**os.environ, "PYTHONPATH": os.pathsep.join(sys.path)}
+    return subprocess.run(
+        [sys.executable, *options, "-c", _STARTUP_SCRIPT],
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+
+
+def measure_startup(run: int) -> StartupResult:
+    """
+    Import and start the app once in a new interpreter.
+    Parameters
+    ----------
+    run : int
+      Number of the run, for reporting.
+
+    Returns
+    -------
+    StartupResult
+
+    """
+    output = json.loads(_run_startup().stdout.splitlines()[-1])
+    return StartupResult(
+        run=run,
+        import_seconds=output["import_seconds"],
+        ready_seconds=output["ready_seconds"],
+        deferred_packages_loaded=[
+            p for p in DEFERRED_PACKAGES if p in output["packages"]
+        ],
+    )
+
+
+def slowest_packages(top: int) -> Dict[str, float]:
+    """
+    Import and start the app with -X importtime and add up the time spent
+    importing the modules of each package.
+    Parameters
+    ----------
+    top : int
+      Number of packages to return.
+
+    Returns
+    -------
+    Dict[str, float]
+      Seconds per package, slowest first.
+
+    """
+    seconds: Dict[str, float] = defaultdict(float)
+    stderr = _run_startup("-X", "importtime").stderr
+    for line in stderr.splitlines():
+        # "import time: self [us] | cumulative | imported package"
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        self_us, _, name = line.removeprefix("import time:").split("|")
+        seconds[name.strip().split(".")[0]] += int(self_us) / 1e6
+    return dict(sorted(seconds.items(), key=lambda i: -i[1])[:top])
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Run the benchmark and print the startup times."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument(
+        "--top", type=int, default=10, help="Slowest packages to report"
+    )
+    parser.add_argument(
+        "--budget",
+        type=float,
+        default=DEFAULT_BUDGET_SECONDS,
+        help=(
+            "Exit with an error if the median seconds until the app is "
+            "ready exceed this"
+        ),
+    )
+    parser.add_argument("--output", help="Write the results as json")
+    args = parser.parse_args(argv)
+    print(f"{'run':>4}{'import s':>10}{'ready s':>10}  deferred loaded")
+    results: List[StartupResult] = []
+    for run in range(args.runs):
+        r = measure_startup(run)
+        print(
+            f"{r.run:>4}{r.import_seconds:>10.3f}{r.ready_seconds:>10.3f}  "
+            f"{', '.join(r.deferred_packages_loaded) or '-'}"
+        )
+        results.append(r)
+    print(f"{'package':<32}{'import s':>10}")
+    for package, seconds in slowest_packages(args.top).items():
+        print(f"{package:<32}{seconds:>10.3f}")
+    if args.output:
+        with open(args.output, "wb") as f:
+            f.write(
+                TypeAdapter(List[StartupResult]).dump_json(results, indent=2)
+            )
+    ready = statistics.median(r.ready_seconds for r in results)
+    print(f"Median seconds until ready: {ready:.3f}")
+    if ready > args.budget:
+        print(f"Startup is over the budget of {args.budget:.3f} seconds")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,168 @@
+"""Module for endpoints to inspect and manage the sheet cache"""
+
+import hmac
+from typing import List, Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Path, Query, status
+from fastapi.responses import PlainTextResponse
+from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
+
+from aind_smartsheet_service_server.caching import (
+    SHEET_EXPIRE_SECONDS,
+    evict_sheet,
+    get_cached_sheet_entry,
+)
+from aind_smartsheet_service_server.configs import settings
+from aind_smartsheet_service_server.models import CachedSheet, EvictedSheet
+from aind_smartsheet_service_server.profiling import profile
+from aind_smartsheet_service_server.refresh import reload_sheet
+from aind_smartsheet_service_server.registry import (
+    RegisteredSheet,
+    sheet_registry,
+)
+from aind_smartsheet_service_server.shared import reject_reload
+from aind_smartsheet_service_server.snapshot import snapshot_store
+
+bearer_scheme = HTTPBearer(auto_error=False)
+
+
+def require_admin(
+    credentials: Optional[HTTPAuthorizationCredentials] = Depends(
+        bearer_scheme
+    ),
+) -> None:
+    """
+    Check the request carries the admin bearer token.
+    Parameters
+    ----------
+    credentials : HTTPAuthorizationCredentials | None
+
+    Raises
+    ------
+    HTTPException
+      503 if no admin token is configured and 401 if the token is missing or
+      wrong.
+
+    """
+    if settings.admin_token is None:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Admin endpoints are not configured.",
+        )
+    if credentials is None or not hmac.compare_digest(
+        credentials.credentials.encode(),
+        settings.admin_token.get_secret_value().encode(),
+    ):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid admin token.",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+
+
+router = APIRouter(
+    prefix="/admin",
+    dependencies=[Depends(require_admin)],
+    include_in_schema=False,
+)
+
+
+def _get_sheet(sheet_id: int) -> RegisteredSheet:
+    """The served sheet with sheet_id or a 404 error."""
+    sheet = sheet_registry.get_by_id(sheet_id)
+    if sheet is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Sheet {sheet_id} is not served.",
+        )
+    return sheet
+
+
+async def _describe_sheet(sheet: RegisteredSheet) -> CachedSheet:
+    """Build the cache status of a sheet."""
+    entry = await get_cached_sheet_entry(
+        sheet_id=sheet.sheet_id, access_token=sheet.access_token
+    )
+    if entry is None:
+        return CachedSheet(
+            sheet_name=sheet.name, sheet_id=sheet.sheet_id, cached=False
+        )
+    ttl, size = entry
+    return CachedSheet(
+        sheet_name=sheet.name,
+        sheet_id=sheet.sheet_id,
+        cached=True,
+        # Also known once the memory budget dropped the snapshot
+        version=snapshot_store.get_version(sheet.sheet_id),
+        age_seconds=max(SHEET_EXPIRE_SECONDS - ttl, 0),
+        size_bytes=size,
+    )
+
+
+@router.get("/sheets", response_model=List[CachedSheet])
+async def list_cached_sheets():
+    """
+    ## Cached Sheets
+    Cache status of every served sheet with its version, age and size.
+    """
+    return [await _describe_sheet(sheet) for sheet in sheet_registry]
+
+
+@router.post("/sheets/{sheet_id}/evict", response_model=EvictedSheet)
+async def evict_cached_sheet(sheet_id: int = Path(...)):
+    """
+    ## Evict Sheet
+    Remove the cached copy of a sheet. It is downloaded on the next request.
+    """
+    sheet = _get_sheet(sheet_id)
+    evicted = await evict_sheet(
+        sheet_id=sheet_id, access_tokens=[sheet.access_token]
+    )
+    return EvictedSheet(sheet_id=sheet_id, evicted=evicted)
+
+
+@router.post("/sheets/{sheet_id}/refresh", response_model=CachedSheet)
+async def refresh_cached_sheet(sheet_id: int = Path(...)):
+    """
+    ## Refresh Sheet
+    Evict the cached copy of a sheet and download it again. Not available
+    with shared sheets, which only the publisher downloads.
+    """
+    sheet = _get_sheet(sheet_id)
+    reject_reload()
+    await reload_sheet(sheet_id=sheet_id, access_token=sheet.access_token)
+    return await _describe_sheet(sheet)
+
+
+@router.post("/profile", response_class=PlainTextResponse)
+async def profile_service(
+    seconds: float = Query(
+        default=10, gt=0, le=300, description="How long to sample for."
+    ),
+    interval_ms: float = Query(
+        default=5, ge=1, le=1000, description="Time between samples."
+    ),
+    flagged_only: bool = Query(
+        default=False,
+        description=(
+            "Only sample requests sent with an X-Profile header, instead of "
+            "every thread of the process."
+        ),
+    ),
+):
+    """
+    ## Profile
+    Sample the stacks of the service for some seconds. Returns the samples
+    as folded stacks, which flamegraph.pl and speedscope can render.
+    """
+    try:
+        profiler = await profile(
+            seconds=seconds,
+            interval=interval_ms / 1000,
+            flagged_only=flagged_only,
+        )
+    except RuntimeError as e:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT, detail=str(e)
+        )
+    return PlainTextResponse(content=profiler.folded())
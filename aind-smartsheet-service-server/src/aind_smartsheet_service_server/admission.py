@@ -0,0 +1,149 @@
+"""Module to bound how long and how many requests are served at once"""
+
+import asyncio
+from typing import Optional
+
+from fastapi.responses import JSONResponse
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from aind_smartsheet_service_server.configs import settings
+from aind_smartsheet_service_server.metrics import (
+    CANCELLED_REQUESTS,
+    SHED_REQUESTS,
+)
+
+# Streams, probes, metrics and admin calls are neither limited nor timed out
+UNLIMITED_PATHS = (
+    "/events",
+    "/healthcheck",
+    "/metrics",
+    "/admin",
+    "/webhooks",
+)
+
+
+def request_timeout(path: str) -> Optional[float]:
+    """
+    Seconds a request for a path may take.
+    Parameters
+    ----------
+    path : str
+
+    Returns
+    -------
+    float | None
+      The timeout of the longest matching path in route_timeout_seconds,
+      else request_timeout_seconds.
+
+    """
+    matches = [
+        p
+        for p in settings.route_timeout_seconds
+        if path == p or path.startswith(p.rstrip("/") + "/")
+    ]
+    if not matches:
+        return settings.request_timeout_seconds
+    return settings.route_timeout_seconds[max(matches, key=len)]
+
+
+class _RequestState:
+    """Passes messages between a request and its client, keeping track of
+    the response and expiring the deadline once the client disconnects"""
+
+    def __init__(
+        self, receive: Receive, send: Send, deadline: asyncio.Timeout
+    ):
+        """
+        Class constructor
+        Parameters
+        ----------
+        receive : Receive
+        send : Send
+        deadline : asyncio.Timeout
+        """
+        self._receive = receive
+        self._send = send
+        self.deadline = deadline
+        self.messages: asyncio.Queue = asyncio.Queue()
+        self.started = False
+        self.finished = False
+        self.disconnected = False
+
+    async def send(self, message: Message) -> None:
+        """Send a message of the response to the client."""
+        if message["type"] == "http.response.start":
+            self.started = True
+        elif not message.get("more_body", False):
+            self.finished = True
+        await self._send(message)
+
+    async def watch(self) -> None:
+        """Queue messages from the client until it disconnects."""
+        while True:
+            message = await self._receive()
+            self.messages.put_nowait(message)
+            if message["type"] == "http.disconnect":
+                if not self.finished:
+                    self.disconnected = True
+                    self.deadline.reschedule(asyncio.get_running_loop().time())
+                return
+
+
+class AdmissionMiddleware:
+    """Rejects requests with a 503 error while max_pending_requests are
+    being served, and cancels requests that run out of time, with a 504
+    error, or whose client disconnects. Cancelling a request cancels the
+    downloads only it was waiting for."""
+
+    def __init__(self, app: ASGIApp):
+        """Class constructor"""
+        self.app = app
+        self.pending = 0
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        """Admit the request if there is room and serve it."""
+        if scope["type"] != "http" or scope["path"].startswith(
+            UNLIMITED_PATHS
+        ):
+            await self.app(scope, receive, send)
+            return
+        limit = settings.max_pending_requests
+        if limit is not None and self.pending >= limit:
+            SHED_REQUESTS.labels(reason="pending_requests").inc()
+            response = JSONResponse(
+                {"detail": f"{self.pending} requests are being served."},
+                status_code=503,
+                headers={"Retry-After": str(settings.retry_after_seconds)},
+            )
+            await response(scope, receive, send)
+            return
+        self.pending += 1
+        try:
+            await self._serve(scope, receive, send)
+        finally:
+            self.pending -= 1
+
+    async def _serve(self, scope: Scope, receive: Receive, send: Send):
+        """Serve the request until it is done, times out or the client
+        disconnects."""
+        deadline = asyncio.timeout(request_timeout(scope["path"]))
+        state = _RequestState(receive=receive, send=send, deadline=deadline)
+        try:
+            async with deadline:
+                watcher = asyncio.create_task(state.watch())
+                try:
+                    await self.app(scope, state.messages.get, state.send)
+                finally:
+                    watcher.cancel()
+        except TimeoutError:
+            if not deadline.expired():
+                raise
+            if state.disconnected:
+                CANCELLED_REQUESTS.labels(reason="disconnect").inc()
+                return
+            CANCELLED_REQUESTS.labels(reason="timeout").inc()
+            if not state.started:
+                response = JSONResponse(
+                    {"detail": "Request timed out."}, status_code=504
+                )
+                await response(scope, receive, send)
@@ -0,0 +1,138 @@
+"""Module for cache backends"""
+
+from collections import OrderedDict
+from time import monotonic
+from typing import Optional, Tuple
+
+from aind_smartsheet_service_server.caching import PeekableBackend
+from aind_smartsheet_service_server.metrics import (
+    CACHE_EVICTIONS,
+    CACHE_SIZE_BYTES,
+)
+
+
+class LRUMemoryBackend(PeekableBackend):
+    """In-process cache bounded by the size of its entries. Once the entries
+    exceed max_bytes, the least recently read or written ones are dropped.
+    Expired entries are dropped when they are next looked up."""
+
+    def __init__(self, max_bytes: Optional[int] = None):
+        """
+        Class constructor
+        Parameters
+        ----------
+        max_bytes : int | None
+          Total size of the keys and values the cache may hold. The cache is
+          unbounded if None.
+        """
+        self.max_bytes = max_bytes
+        self.size_bytes = 0
+        # Values and the monotonic time they expire at, oldest use first
+        self._store: "OrderedDict[str, Tuple[bytes, Optional[float]]]" = (
+            OrderedDict()
+        )
+
+    @staticmethod
+    def _entry_bytes(key: str, value: bytes) -> int:
+        """Approximate memory of an entry."""
+        return len(key) + len(value)
+
+    def _remove(self, key: str, reason: Optional[str] = None) -> None:
+        """Drop an entry, counting it as evicted if a reason is given."""
+        value, _ = self._store.pop(key)
+        self.size_bytes -= self._entry_bytes(key, value)
+        CACHE_SIZE_BYTES.set(self.size_bytes)
+        if reason is not None:
+            CACHE_EVICTIONS.labels(reason=reason).inc()
+
+    def peek(self, key: str) -> Tuple[int, Optional[bytes]]:
+        """
+        Look up an entry without marking it as used.
+        Parameters
+        ----------
+        key : str
+
+        Returns
+        -------
+        Tuple[int, bytes | None]
+          Seconds until the entry expires and its value, or (0, None) if
+          the key is not cached. Entries without an expiry have a ttl of -1.
+
+        """
+        entry = self._store.get(key)
+        if entry is None:
+            return 0, None
+        value, expires_at = entry
+        if expires_at is None:
+            return -1, value
+        ttl = expires_at - monotonic()
+        if ttl <= 0:
+            self._remove(key, reason="expired")
+            return 0, None
+        return round(ttl), value
+
+    async def get_with_ttl(self, key: str) -> Tuple[int, Optional[bytes]]:
+        """Look up an entry and its ttl and mark it as used."""
+        ttl, value = self.peek(key)
+        if value is not None:
+            self._store.move_to_end(key)
+        return ttl, value
+
+    async def get(self, key: str) -> Optional[bytes]:
+        """Look up an entry and mark it as used."""
+        _, value = await self.get_with_ttl(key)
+        return value
+
+    async def set(
+        self, key: str, value: bytes, expire: Optional[int] = None
+    ) -> None:
+        """
+        Store an entry, then drop the least recently used entries until
+        the cache fits in max_bytes, if it is bounded. A value larger than
+        max_bytes is not stored.
+        Parameters
+        ----------
+        key : str
+        value : bytes
+        expire : int | None
+          Seconds until the entry expires. Never expires if None.
+        """
+        if key in self._store:
+            self._remove(key)
+        entry_bytes = self._entry_bytes(key, value)
+        max_bytes = float("inf") if self.max_bytes is None else self.max_bytes
+        if entry_bytes > max_bytes:
+            CACHE_EVICTIONS.labels(reason="size").inc()
+            return
+        self._store[key] = (
+            value,
+            None if expire is None else monotonic() + expire,
+        )
+        self.size_bytes += entry_bytes
+        while self.size_bytes > max_bytes:
+            self._remove(next(iter(self._store)), reason="size")
+        CACHE_SIZE_BYTES.set(self.size_bytes)
+
+    async def clear(
+        self, namespace: Optional[str] = None, key: Optional[str] = None
+    ) -> int:
+        """
+        Remove one key, or every key starting with namespace.
+        Parameters
+        ----------
+        namespace : str | None
+        key : str | None
+
+        Returns
+        -------
+        int
+          Number of entries removed.
+
+        """
+        if namespace:
+            keys = [k for k in self._store if k.startswith(namespace)]
+        else:
+            keys = [key] if key in self._store else []
+        for k in keys:
+            self._remove(k)
+        return len(keys)
@@ -0,0 +1,285 @@
+"""Module for cache keys and helpers around the sheet cache"""
+
+import hashlib
+from abc import abstractmethod
+from inspect import signature
+from time import monotonic
+from typing import Any, Callable, Dict, Iterable, Optional, Tuple
+
+from fastapi_cache import FastAPICache
+from fastapi_cache.types import Backend
+from starlette.requests import Request
+from starlette.responses import Response
+
+SHEET_NAMESPACE = "smartsheet"
+SHEET_EXPIRE_SECONDS = 600
+
+
+class PeekableBackend(Backend):
+    """A cache backend that can look up an entry without marking it as used,
+    so that status checks do not change which entries it evicts."""
+
+    @abstractmethod
+    def peek(self, key: str) -> Tuple[int, Optional[bytes]]:
+        """Seconds until an entry expires and its value, or (0, None)."""
+
+
+def token_fingerprint(access_token: str) -> str:
+    """Short stable hash of a token so it never appears in cache keys."""
+    return hashlib.sha256(access_token.encode()).hexdigest()[:16]
+
+
+def sheet_cache_key(sheet_id: int, access_token: str) -> str:
+    """Cache key of a sheet downloaded with access_token."""
+    namespace = f"{FastAPICache.get_prefix()}:{SHEET_NAMESPACE}"
+    return f"{namespace}:{sheet_id}:{token_fingerprint(access_token)}"
+
+
+def sheet_version_key(sheet_id: int, access_token: str) -> str:
+    """Cache key of the version of the cached copy of a sheet."""
+    return f"{sheet_cache_key(sheet_id, access_token)}:version"
+
+
+def sheet_key_builder(
+    func: Callable[..., Any],
+    namespace: str = "",
+    *,
+    request: Optional[Request] = None,
+    response: Optional[Response] = None,
+    args: Tuple[Any, ...] = (),
+    kwargs: Optional[Dict[str, Any]] = None,
+) -> str:
+    """
+    Build readable cache keys like "prefix:smartsheet:{sheet_id}:{token}" so
+    that the entries of a single sheet can be found and evicted.
+    Parameters
+    ----------
+    func : Callable[..., Any]
+      The cached function. Must take sheet_id and access_token arguments.
+    namespace : str
+      The cache prefix and namespace joined by a colon.
+    request : Request | None
+    response : Response | None
+    args : Tuple[Any, ...]
+    kwargs : Dict[str, Any] | None
+
+    Returns
+    -------
+    str
+
+    """
+    arguments = signature(func).bind_partial(*args, **(kwargs or {})).arguments
+    return (
+        f"{namespace}:{arguments['sheet_id']}:"
+        f"{token_fingerprint(arguments['access_token'])}"
+    )
+
+
+class SheetErrorCache:
+    """Upstream errors of sheets by sheet and token. An error is kept for a
+    few seconds so that requests for a broken sheet return it instead of
+    each calling Smartsheet again."""
+
+    def __init__(self):
+        """Class constructor"""
+        self._errors: Dict[Tuple[int, str], Tuple[float, int, str]] = {}
+
+    def get(
+        self, sheet_id: int, access_token: str
+    ) -> Optional[Tuple[int, str]]:
+        """
+        The unexpired error of a sheet downloaded with access_token.
+        Parameters
+        ----------
+        sheet_id : int
+        access_token : str
+
+        Returns
+        -------
+        Tuple[int, str] | None
+          Status code and detail of the error, or None.
+
+        """
+        key = (sheet_id, token_fingerprint(access_token))
+        entry = self._errors.get(key)
+        if entry is None:
+            return None
+        expires_at, status_code, detail = entry
+        if expires_at <= monotonic():
+            del self._errors[key]
+            return None
+        return status_code, detail
+
+    def add(
+        self,
+        sheet_id: int,
+        access_token: str,
+        status_code: int,
+        detail: str,
+        ttl_seconds: float,
+    ) -> None:
+        """
+        Keep an error of a sheet for ttl_seconds.
+        Parameters
+        ----------
+        sheet_id : int
+        access_token : str
+        status_code : int
+        detail : str
+        ttl_seconds : float
+        """
+        self._errors[(sheet_id, token_fingerprint(access_token))] = (
+            monotonic() + ttl_seconds,
+            status_code,
+            detail,
+        )
+
+    def discard(self, sheet_id: int, access_token: str) -> None:
+        """Forget the error of a sheet, if any."""
+        self._errors.pop((sheet_id, token_fingerprint(access_token)), None)
+
+    def clear(self) -> None:
+        """Forget all errors."""
+        self._errors.clear()
+
+
+sheet_error_cache = SheetErrorCache()
+
+
+async def evict_sheet(sheet_id: int, access_tokens: Iterable[str]) -> int:
+    """
+    Remove the cached copies of a sheet, their versions and any cached
+    error.
+    Parameters
+    ----------
+    sheet_id : int
+    access_tokens : Iterable[str]
+      Tokens the sheet may have been downloaded with.
+
+    Returns
+    -------
+    int
+      Number of cache entries removed.
+
+    """
+    backend = FastAPICache.get_backend()
+    count = 0
+    for access_token in set(access_tokens):
+        sheet_error_cache.discard(sheet_id, access_token)
+        await backend.clear(key=sheet_version_key(sheet_id, access_token))
+        count += await backend.clear(
+            key=sheet_cache_key(sheet_id, access_token)
+        )
+    return count
+
+
+async def get_cached_sheet_entry(
+    sheet_id: int, access_token: str
+) -> Optional[Tuple[int, int]]:
+    """
+    Look up the cached copy of a sheet without decoding it.
+    Parameters
+    ----------
+    sheet_id : int
+    access_token : str
+
+    Returns
+    -------
+    Tuple[int, int] | None
+      Seconds until the entry expires and its size in bytes, or None if the
+      sheet is not cached.
+
+    """
+    backend = FastAPICache.get_backend()
+    key = sheet_cache_key(sheet_id, access_token)
+    if isinstance(backend, PeekableBackend):
+        ttl, value = backend.peek(key)
+    else:
+        ttl, value = await backend.get_with_ttl(key)
+    if value is None:
+        return None
+    return ttl, len(value)
+
+
+async def get_cached_sheet_ttl(
+    sheet_id: int, access_token: str
+) -> Optional[int]:
+    """
+    Look up when the cached copy of a sheet expires without reading it.
+    Parameters
+    ----------
+    sheet_id : int
+    access_token : str
+
+    Returns
+    -------
+    int | None
+      Seconds until the entry expires, -1 if it never expires, or None if
+      the sheet is not cached.
+
+    """
+    backend = FastAPICache.get_backend()
+    key = sheet_cache_key(sheet_id, access_token)
+    if isinstance(backend, PeekableBackend):
+        ttl, value = backend.peek(key)
+        return None if value is None else ttl
+    redis = getattr(backend, "redis", None)
+    if redis is not None:
+        # Redis reports a ttl of -2 for missing keys
+        ttl = await redis.ttl(key)
+        return None if ttl == -2 else ttl
+    ttl, value = await backend.get_with_ttl(key)
+    return None if value is None else ttl
+
+
+async def set_cached_sheet_version(
+    sheet_id: int, access_token: str, version: Optional[int]
+) -> None:
+    """
+    Store the version of the cached copy of a sheet next to it, expiring
+    with it, so that requests can tell which version is cached without
+    reading and decoding the copy.
+    Parameters
+    ----------
+    sheet_id : int
+    access_token : str
+    version : int | None
+      Version of the copy that was just cached. None removes the stored
+      version, which is done before a new copy is downloaded.
+    """
+    backend = FastAPICache.get_backend()
+    key = sheet_version_key(sheet_id, access_token)
+    if version is None:
+        await backend.clear(key=key)
+        return
+    ttl = await get_cached_sheet_ttl(sheet_id, access_token)
+    if ttl is None:
+        return
+    # Only read while the copy is cached, so it may outlive the copy
+    await backend.set(
+        key, str(version).encode(), expire=None if ttl < 0 else max(ttl, 1)
+    )
+
+
+async def get_cached_sheet_version(
+    sheet_id: int, access_token: str
+) -> Optional[int]:
+    """
+    Look up the version of the cached copy of a sheet without reading it.
+    Parameters
+    ----------
+    sheet_id : int
+    access_token : str
+
+    Returns
+    -------
+    int | None
+      None if the sheet or its version is not cached.
+
+    """
+    if await get_cached_sheet_ttl(sheet_id, access_token) is None:
+        return None
+    value = await FastAPICache.get_backend().get(
+        sheet_version_key(sheet_id, access_token)
+    )
+    return None if value is None else int(value)
@@ -1,12 +1,47 @@
 """Module for settings to connect to backend"""
 
-from typing import Optional
+from pathlib import Path
+from typing import Dict, List, Literal, Optional
 
 from aind_settings_utils.aws import SecretsManagerBaseSettings
-from pydantic import Field, RedisDsn, SecretStr
+from pydantic import BaseModel, Field, RedisDsn, SecretStr
 from pydantic_settings import SettingsConfigDict
 
 
+class SheetConfig(BaseModel):
+    """Where to find a sheet and how to serve it"""
+
+    sheet_id: int = Field(..., description="SmartSheet ID of the sheet")
+    access_token: Literal["access_token", "access_token_2"] = Field(
+        default="access_token",
+        description="Name of the settings field with the token to use.",
+    )
+    model: Optional[str] = Field(
+        default=None,
+        description=(
+            "Import path of the row model, e.g. "
+            "'aind_smartsheet_service_server.models.FundingModel'. If not "
+            "set, rows are returned as a mapping of column title to value."
+        ),
+    )
+    index_columns: List[str] = Field(
+        default=[],
+        description=(
+            "Model fields read from a column, or column titles if no model "
+            "is set, that can be filtered on."
+        ),
+    )
+    ttl_seconds: int = Field(
+        default=600,
+        gt=0,
+        le=600,
+        description=(
+            "Maximum age of the cached sheet. Cannot exceed the shared cache "
+            "expiry of 600 seconds."
+        ),
+    )
+
+
 class Settings(SecretsManagerBaseSettings):
     """Smartsheet configs with client settings and sheet IDs"""
 
@@ -27,6 +62,21 @@ class Settings(SecretsManagerBaseSettings):
     max_connections: int = Field(
         default=8, description="Maximum connection pool size."
     )
+    error_cache_seconds: float = Field(
+        default=10,
+        ge=0,
+        description=(
+            "Seconds an upstream error for a sheet and token is returned "
+            "without calling Smartsheet again. 0 turns it off."
+        ),
+    )
+    api_base: str = Field(
+        default="https://api.smartsheet.com/2.0",
+        description=(
+            "Base url of the Smartsheet API. Can point to a local fake API "
+            "for load tests."
+        ),
+    )
     funding_id: int = Field(..., description="SmartSheet ID of funding info")
     perfusions_id: int = Field(
         ..., description="SmartSheet ID of perfusions info"
@@ -48,9 +98,178 @@ class Settings(SecretsManagerBaseSettings):
     )
     app_concurrency_limit: int = Field(
         default=2,
-        description="Limit number of large sheets being downloaded at once.",
+        gt=0,
+        description=(
+            "Limit of sheets being downloaded at once with the same token. "
+            "Large sheets count as more than one, see fetch_weight_rows."
+        ),
+    )
+    fetch_weight_rows: int = Field(
+        default=10000,
+        gt=0,
+        description=(
+            "A download counts once towards app_concurrency_limit per this "
+            "many rows the sheet had when it was last downloaded."
+        ),
+    )
+    fetch_queue_limit: Optional[int] = Field(
+        default=None,
+        gt=0,
+        description=(
+            "Downloads that may wait to start per token. Requests that need "
+            "another download are rejected with a 503 error. No limit if "
+            "not set."
+        ),
+    )
+    max_pending_requests: Optional[int] = Field(
+        default=None,
+        gt=0,
+        description=(
+            "Requests for sheet data served at once. Further requests are "
+            "rejected with a 503 error. No limit if not set."
+        ),
+    )
+    request_timeout_seconds: Optional[float] = Field(
+        default=None,
+        gt=0,
+        description=(
+            "Seconds a request for sheet data may take before it is "
+            "cancelled with a 504 error. No limit if not set."
+        ),
+    )
+    route_timeout_seconds: Dict[str, float] = Field(
+        default={},
+        description=(
+            "Timeouts that replace request_timeout_seconds for some paths, "
+            "as a json object keyed by path, e.g. "
+            '{"/get_exaspim_info": 120}. A path also sets the timeout of '
+            "the paths below it."
+        ),
+    )
+    retry_after_seconds: int = Field(
+        default=5,
+        ge=0,
+        description="Retry-After header of rejected requests.",
+    )
+    column_mapping_mode: Literal["id", "title"] = Field(
+        default="id",
+        description=(
+            "How model fields are matched to sheet columns. 'id' uses the "
+            "column IDs in the models. 'title' matches fields to columns by "
+            "title and falls back to the column ID, so fields keep working "
+            "when a sheet is rebuilt with new column IDs."
+        ),
+    )
+    parse_executor: Literal["inline", "thread", "process"] = Field(
+        default="inline",
+        description=(
+            "Where the batches of rows of large sheets are validated and "
+            "parsed: on the event loop, in a thread or in a process pool. "
+            "Control returns to the event loop between batches either way."
+        ),
+    )
+    parse_offload_min_rows: int = Field(
+        default=1000,
+        description=(
+            "Sheets with fewer rows are parsed directly on the event loop."
+        ),
+    )
+    parse_chunk_size: int = Field(
+        default=500, gt=0, description="Rows parsed per batch."
+    )
+    parse_workers: Optional[int] = Field(
+        default=None,
+        description="Size of the process pool. Defaults to the cpu count.",
+    )
+    loop_lag_threshold_ms: Optional[int] = Field(
+        default=None,
+        description=(
+            "If set, log the route and stack of any code that blocks the "
+            "event loop for longer than this."
+        ),
+    )
+    loop_lag_interval_ms: int = Field(
+        default=50, gt=0, description="Interval between lag measurements."
+    )
+    tracing_enabled: bool = Field(
+        default=False,
+        description=(
+            "Record OpenTelemetry spans of requests, cache reads, Smartsheet "
+            "calls and parsing. Requires opentelemetry-api, and an SDK set "
+            "up to export the spans, e.g. with opentelemetry-instrument."
+        ),
+    )
+    changes_history_size: int = Field(
+        default=10,
+        description=(
+            "Number of versions of each sheet to remember for the changes "
+            "feed."
+        ),
+    )
+    snapshot_memory_budget_mb: Optional[int] = Field(
+        default=None,
+        gt=0,
+        description=(
+            "Approximate memory for validated sheets held in the process. "
+            "Past it, the least recently used sheets are dropped and are "
+            "validated again from the cache on their next request. No limit "
+            "if not set."
+        ),
+    )
+    refresh_interval_seconds: Optional[int] = Field(
+        default=None,
+        description=(
+            "If set, check every sheet for a new version at this interval "
+            "and refresh the cache when one is found."
+        ),
+    )
+    sse_keepalive_seconds: int = Field(
+        default=15,
+        description="Seconds between keepalive comments on event streams.",
+    )
+    sheets: Dict[str, SheetConfig] = Field(
+        default={},
+        description=(
+            "Additional sheets to serve at /sheets/{name}, as a json object "
+            "keyed by name. Entries with the name of a built-in sheet "
+            "replace it, also for its built-in routes, which keep parsing "
+            "rows into their own models."
+        ),
+    )
+    webhook_shared_secret: Optional[SecretStr] = Field(
+        default=None,
+        description=(
+            "Shared secret of the Smartsheet webhooks. Webhook callbacks are "
+            "rejected if not set."
+        ),
+    )
+    admin_token: Optional[SecretStr] = Field(
+        default=None,
+        description=(
+            "Bearer token for the /admin endpoints. The endpoints are "
+            "disabled if not set."
+        ),
     )
     redis_url: Optional[RedisDsn] = Field(default=None)
+    cache_max_mb: Optional[int] = Field(
+        default=None,
+        gt=0,
+        description=(
+            "If set, the in-process cache drops its least recently used "
+            "sheets once they take more than this many MiB. Otherwise it is "
+            "unbounded. Not used if redis_url is set."
+        ),
+    )
+    shared_sheets_dir: Optional[Path] = Field(
+        default=None,
+        description=(
+            "Directory the sheets are published to by a single publisher "
+            "process, started with python -m "
+            "aind_smartsheet_service_server.publisher. If set, the server "
+            "reads the sheets from it and never downloads them itself, so "
+            "any number of workers can share one publisher."
+        ),
+    )
     model_config = SettingsConfigDict(env_prefix="SMARTSHEET_")
 
 
@@ -0,0 +1,113 @@
+"""Module to push sheet version changes to subscribers"""
+
+import asyncio
+import logging
+from typing import Iterable, Optional, Set
+
+from aind_smartsheet_service_server.snapshot import (
+    SheetSnapshot,
+    snapshot_store,
+)
+
+
+class SheetEvent:
+    """A sheet changed from previous_version to snapshot.version"""
+
+    def __init__(self, snapshot: SheetSnapshot, previous_version: int):
+        """Class constructor"""
+        self.snapshot = snapshot
+        self.previous_version = previous_version
+
+
+class Subscription:
+    """Queue of events for the sheets a single client subscribed to"""
+
+    def __init__(self, sheet_ids: Iterable[int], maxsize: int = 100):
+        """Class constructor"""
+        self.sheet_ids: Set[int] = set(sheet_ids)
+        self.queue: asyncio.Queue[SheetEvent] = asyncio.Queue(maxsize=maxsize)
+
+    async def get(self, timeout: float) -> Optional[SheetEvent]:
+        """
+        Wait for the next event.
+        Parameters
+        ----------
+        timeout : float
+          Seconds to wait.
+
+        Returns
+        -------
+        SheetEvent | None
+          None if no event arrived before the timeout.
+
+        """
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout=timeout)
+        except asyncio.TimeoutError:
+            return None
+
+
+class SheetEventBroker:
+    """Fans out sheet version changes to subscriptions"""
+
+    def __init__(self):
+        """Class constructor"""
+        self._subscriptions: Set[Subscription] = set()
+
+    def subscribe(self, sheet_ids: Iterable[int]) -> Subscription:
+        """Start receiving events for sheet_ids."""
+        subscription = Subscription(sheet_ids=sheet_ids)
+        self._subscriptions.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        """Stop receiving events."""
+        self._subscriptions.discard(subscription)
+
+    def publish(self, snapshot: SheetSnapshot, previous_version: int) -> None:
+        """
+        Queue an event for every subscription to the snapshot's sheet. Slow
+        subscribers whose queue is full miss the event.
+        Parameters
+        ----------
+        snapshot : SheetSnapshot
+        previous_version : int
+        """
+        event = SheetEvent(
+            snapshot=snapshot, previous_version=previous_version
+        )
+        for subscription in list(self._subscriptions):
+            if snapshot.sheet_id in subscription.sheet_ids:
+                try:
+                    subscription.queue.put_nowait(event)
+                except asyncio.QueueFull:
+                    logging.warning(
+                        f"Dropped event for sheet {snapshot.sheet_id}. "
+                        f"Subscriber queue is full."
+                    )
+
+
+def format_sse(event: str, data: str, event_id: Optional[str] = None) -> str:
+    """
+    Format a message in the Server-Sent Events wire format.
+    Parameters
+    ----------
+    event : str
+      Event type
+    data : str
+      Single line payload, usually json.
+    event_id : str | None
+
+    Returns
+    -------
+    str
+
+    """
+    message = f"event: {event}\n"
+    if event_id is not None:
+        message += f"id: {event_id}\n"
+    return message + f"data: {data}\n\n"
+
+
+event_broker = SheetEventBroker()
+snapshot_store.add_listener(event_broker.publish)
@@ -1,14 +1,24 @@
 """Module to handle smartsheet api responses"""
 
-from collections.abc import Callable
-from typing import Any, Dict, List, Optional, TypeVar
+from bisect import bisect_left
+from collections import defaultdict
+from collections.abc import Callable, Iterable
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Literal, Optional, Set, TypeVar
 
-from pydantic import BaseModel, ValidationError
+from pydantic import BaseModel
 
+from aind_smartsheet_service_server.metrics import timed
 from aind_smartsheet_service_server.models import (
+    SheetColumn,
     SheetFields,
     SheetRow,
 )
+from aind_smartsheet_service_server.parsing import (
+    parse_rows_in_chunks,
+    validate_rows,
+)
+from aind_smartsheet_service_server.tracing import start_span
 
 T = TypeVar("T", bound=BaseModel)
 
@@ -41,6 +51,32 @@ def default_row_map(
     return output_dict
 
 
+def title_row_map(
+    row: SheetRow, column_titles: Dict[int, str], by_display_value=True
+) -> Dict[str, Any]:
+    """
+    Maps a row into a dictionary like {"column title": "displayValue"}
+    Parameters
+    ----------
+    row : SheetRow
+    column_titles : Dict[int, str]
+      Map of column ID to column title.
+    by_display_value : bool
+      Whether to use the displayValue instead of the value. Default is True.
+
+    Returns
+    -------
+    Dict[str, Any]
+
+    """
+    return {
+        column_titles[int(column_id)]: value
+        for column_id, value in default_row_map(
+            row, by_display_value=by_display_value
+        ).items()
+    }
+
+
 def default_row_filter(
     row: SheetRow,
     column_id: Optional[int],
@@ -72,6 +108,307 @@ def default_row_filter(
         return True
 
 
+def get_column_id(model: type[BaseModel], field_name: str) -> int:
+    """
+    Get the Smartsheet column ID a model field is validated from.
+    Parameters
+    ----------
+    model : type[BaseModel]
+    field_name : str
+
+    Returns
+    -------
+    int
+
+    """
+    return int(model.model_fields[field_name].validation_alias)
+
+
+def _normalize_title(title: str) -> str:
+    """Column titles are matched ignoring case and surrounding spaces."""
+    return title.strip().casefold()
+
+
+class ColumnMapping:
+    """
+    Resolves the fields of a model to the columns of one version of a sheet.
+    In "id" mode each field is read from the column ID in its
+    validation_alias. In "title" mode each field is read from the column
+    with the same title as the field, falling back to the validation_alias
+    if no column has that title. This keeps fields populated when a sheet is
+    rebuilt and its column IDs change.
+    """
+
+    def __init__(
+        self,
+        model: type[BaseModel],
+        columns: List[SheetColumn],
+        mode: Literal["id", "title"] = "id",
+    ):
+        """
+        Class constructor
+        Parameters
+        ----------
+        model : type[BaseModel]
+          Model with column IDs in the validation_alias of its fields.
+        columns : List[SheetColumn]
+          Columns of the sheet.
+        mode : Literal["id", "title"]
+        """
+        self.model = model
+        self.mode = mode
+        self.column_ids: Dict[str, int] = {}
+        column_titles = {_normalize_title(c.title): c.id for c in columns}
+        for field_name, field in model.model_fields.items():
+            alias = field.validation_alias
+            if not (isinstance(alias, str) and alias.isdigit()):
+                # Field is not read from a column ID
+                continue
+            column_id = int(alias)
+            if mode == "title" and field.title is not None:
+                column_id = column_titles.get(
+                    _normalize_title(field.title), column_id
+                )
+            self.column_ids[field_name] = column_id
+        # Map of sheet column ID to the validation_alias to read it as. Left
+        # empty when every field is read from its alias so rows are mapped
+        # exactly like the ID based path.
+        self._renamed: Dict[str, str] = {}
+        if any(
+            column_id != get_column_id(model, field_name)
+            for field_name, column_id in self.column_ids.items()
+        ):
+            self._renamed = {
+                str(column_id): model.model_fields[field_name].validation_alias
+                for field_name, column_id in self.column_ids.items()
+            }
+
+    def column_id(self, field_name: str) -> int:
+        """Column ID of the sheet that a model field is read from."""
+        return self.column_ids[field_name]
+
+    def row_map(self, row: SheetRow) -> Dict[str, Any]:
+        """
+        Maps a row into a dictionary keyed by the validation_alias of the
+        model fields.
+        Parameters
+        ----------
+        row : SheetRow
+
+        Returns
+        -------
+        Dict[str, Any]
+
+        """
+        mapped_row = default_row_map(row, True)
+        if not self._renamed:
+            return mapped_row
+        renamed = self._renamed
+        return {renamed[k]: v for k, v in mapped_row.items() if k in renamed}
+
+
+def as_utc(value: Optional[datetime]) -> Optional[datetime]:
+    """Treat naive datetimes as UTC so they compare with row timestamps."""
+    if value is not None and value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value
+
+
+class SheetIndex:
+    """Lazily built indexes over the rows of a sheet. Rows are referenced by
+    their position in sheet_fields.rows."""
+
+    def __init__(self, sheet_fields: SheetFields):
+        """Class constructor"""
+        self.sheet_fields = sheet_fields
+        self._columns: Dict[int, Dict[Optional[str], List[int]]] = {}
+        self._sorted_values: Dict[int, List[str]] = {}
+        self._modified: Optional[List[datetime]] = None
+        self._modified_positions: List[int] = []
+
+    def column(self, column_id: int) -> Dict[Optional[str], List[int]]:
+        """
+        Map each displayValue in a column to the rows that contain it.
+        Parameters
+        ----------
+        column_id : int
+
+        Returns
+        -------
+        Dict[Optional[str], List[int]]
+
+        """
+        if column_id not in self._columns:
+            groups = defaultdict(list)
+            for position, row in enumerate(self.sheet_fields.rows):
+                for cell in row.cells:
+                    if cell.columnId == column_id:
+                        groups[cell.displayValue].append(position)
+                        break
+            self._columns[column_id] = dict(groups)
+        return self._columns[column_id]
+
+    def match_values(self, column_id: int, values: Iterable[str]) -> Set[int]:
+        """Rows whose displayValue in column_id is one of values."""
+        column = self.column(column_id)
+        return {p for value in values for p in column.get(value, [])}
+
+    def match_prefixes(
+        self, column_id: int, prefixes: Iterable[str]
+    ) -> Set[int]:
+        """Rows whose displayValue in column_id starts with any prefix."""
+        column = self.column(column_id)
+        if column_id not in self._sorted_values:
+            self._sorted_values[column_id] = sorted(
+                value for value in column if value is not None
+            )
+        sorted_values = self._sorted_values[column_id]
+        positions = set()
+        for prefix in prefixes:
+            start = bisect_left(sorted_values, prefix)
+            for value in sorted_values[start:]:
+                if not value.startswith(prefix):
+                    break
+                positions.update(column[value])
+        return positions
+
+    def match_modified(
+        self,
+        modified_after: Optional[datetime],
+        modified_before: Optional[datetime],
+    ) -> Set[int]:
+        """Rows with modified_after <= modifiedAt < modified_before."""
+        if self._modified is None:
+            order = sorted(
+                range(len(self.sheet_fields.rows)),
+                key=lambda p: self.sheet_fields.rows[p].modifiedAt,
+            )
+            self._modified = [
+                self.sheet_fields.rows[p].modifiedAt for p in order
+            ]
+            self._modified_positions = order
+        start = (
+            0
+            if modified_after is None
+            else bisect_left(self._modified, modified_after)
+        )
+        end = (
+            len(self._modified)
+            if modified_before is None
+            else bisect_left(self._modified, modified_before)
+        )
+        return set(self._modified_positions[start:end])
+
+
+class RowFilter:
+    """
+    Filter rows on several columns at once. Within a column a row matches
+    if its displayValue equals any of the values or starts with any of the
+    prefixes. Across columns and the modifiedAt range all conditions must
+    match. Can be evaluated against a SheetIndex or called on a single row.
+    """
+
+    def __init__(
+        self,
+        values: Optional[Dict[int, Optional[Iterable[str]]]] = None,
+        prefixes: Optional[Dict[int, Optional[Iterable[str]]]] = None,
+        modified_after: Optional[datetime] = None,
+        modified_before: Optional[datetime] = None,
+    ):
+        """
+        Class constructor
+        Parameters
+        ----------
+        values : Dict[int, Iterable[str] | None] | None
+          Map of column ID to the displayValues to match. Columns with no
+          values are ignored.
+        prefixes : Dict[int, Iterable[str] | None] | None
+          Map of column ID to displayValue prefixes to match. Columns with no
+          prefixes are ignored.
+        modified_after : datetime | None
+          Keep rows modified at or after this time. Naive datetimes are UTC.
+        modified_before : datetime | None
+          Keep rows modified before this time. Naive datetimes are UTC.
+        """
+        self.values = {k: set(v) for k, v in (values or {}).items() if v}
+        self.prefixes = {k: tuple(v) for k, v in (prefixes or {}).items() if v}
+        self.modified_after = as_utc(modified_after)
+        self.modified_before = as_utc(modified_before)
+
+    def _column_matches(self, column_id: int, display_value: Any) -> bool:
+        """Check one cell displayValue against a column's conditions."""
+        if display_value is None:
+            return False
+        return display_value in self.values.get(column_id, ()) or (
+            display_value.startswith(self.prefixes.get(column_id, ()))
+        )
+
+    def __call__(self, row: SheetRow) -> bool:
+        """
+        Check a single row against the filter.
+        Parameters
+        ----------
+        row : SheetRow
+
+        Returns
+        -------
+        bool
+          True to keep the row and False to filter it out.
+
+        """
+        if (
+            self.modified_after is not None
+            and row.modifiedAt < self.modified_after
+        ) or (
+            self.modified_before is not None
+            and row.modifiedAt >= self.modified_before
+        ):
+            return False
+        display_values = {
+            cell.columnId: cell.displayValue for cell in row.cells
+        }
+        return all(
+            self._column_matches(column_id, display_values.get(column_id))
+            for column_id in self.values.keys() | self.prefixes.keys()
+        )
+
+    def select(self, sheet_index: SheetIndex) -> List[int]:
+        """
+        Use the indexes to find the positions of matching rows.
+        Parameters
+        ----------
+        sheet_index : SheetIndex
+
+        Returns
+        -------
+        List[int]
+          Positions of matching rows in sheet order.
+
+        """
+        matches: Optional[Set[int]] = None
+        for column_id in self.values.keys() | self.prefixes.keys():
+            column_matches = sheet_index.match_values(
+                column_id, self.values.get(column_id, ())
+            ) | sheet_index.match_prefixes(
+                column_id, self.prefixes.get(column_id, ())
+            )
+            matches = (
+                column_matches if matches is None else matches & column_matches
+            )
+        if self.modified_after is not None or self.modified_before is not None:
+            modified_matches = sheet_index.match_modified(
+                self.modified_after, self.modified_before
+            )
+            matches = (
+                modified_matches
+                if matches is None
+                else matches & modified_matches
+            )
+        if matches is None:
+            return list(range(len(sheet_index.sheet_fields.rows)))
+        return sorted(matches)
+
+
 class SheetHandler:
     """Handle raw sheet object"""
 
@@ -85,12 +422,45 @@ class SheetHandler:
         row_mapper: Callable[[SheetRow], dict] = lambda row: default_row_map(
             row, True
         ),
+        sheet_index: Optional[SheetIndex] = None,
     ):
-        """Class constructor"""
+        """
+        Class constructor
+        Parameters
+        ----------
+        sheet_fields : SheetFields
+        validate : bool
+          Raise validation errors instead of constructing invalid models.
+        row_filter : Callable[[SheetRow], bool]
+        row_mapper : Callable[[SheetRow], dict]
+        sheet_index : SheetIndex | None
+          If set and row_filter is a RowFilter, the rows are selected from
+          the index instead of checking every row.
+        """
         self.sheet_fields = sheet_fields
         self.validate = validate
         self.row_filter = row_filter
         self.row_mapper = row_mapper
+        self.sheet_index = sheet_index
+
+    def get_matched_rows(self) -> List[SheetRow]:
+        """
+        Get the rows kept by the row_filter.
+
+        Returns
+        -------
+        List[SheetRow]
+
+        """
+        rows = self.sheet_fields.rows
+        with timed("filtering"):
+            if self.sheet_index is not None and isinstance(
+                self.row_filter, RowFilter
+            ):
+                return [
+                    rows[p] for p in self.row_filter.select(self.sheet_index)
+                ]
+            return [row for row in rows if self.row_filter(row)]
 
     def get_parsed_sheet_model(self, model: type[T]) -> List[T]:
         """
@@ -105,17 +475,53 @@ class SheetHandler:
         List[T]
 
         """
-        matched_rows = [
-            row for row in self.sheet_fields.rows if self.row_filter(row)
-        ]
-        mapped_rows = [self.row_mapper(row) for row in matched_rows]
-        parsed_rows = []
-        for row in mapped_rows:
-            try:
-                mapped_row = model.model_validate(row)
-            except ValidationError as e:
-                if self.validate:
-                    raise e
-                mapped_row = model.model_construct(**row)
-            parsed_rows.append(mapped_row)
-        return parsed_rows
+        return self.parse_rows(rows=self.get_matched_rows(), model=model)
+
+    @staticmethod
+    def _parse_span(rows: List[SheetRow], model: type[BaseModel]):
+        """Tracing span around parsing rows into a model."""
+        return start_span(
+            "SheetHandler.parse_rows",
+            {"sheet.model": model.__name__, "sheet.rows": len(rows)},
+        )
+
+    def parse_rows(self, rows: List[SheetRow], model: type[T]) -> List[T]:
+        """
+        Map and parse rows into a model.
+        Parameters
+        ----------
+        rows : List[SheetRow]
+        model : T
+          BaseModel type
+
+        Returns
+        -------
+        List[T]
+
+        """
+        with timed("parsing"), self._parse_span(rows=rows, model=model):
+            mapped_rows = [self.row_mapper(row) for row in rows]
+            return validate_rows(model, mapped_rows, self.validate)
+
+    async def get_parsed_sheet_model_chunked(self, model: type[T]) -> List[T]:
+        """
+        Same as get_parsed_sheet_model, but large results are parsed in
+        batches off the event loop as configured by parse_executor.
+        Parameters
+        ----------
+        model : T
+          BaseModel type
+
+        Returns
+        -------
+        List[T]
+
+        """
+        rows = self.get_matched_rows()
+        with timed("parsing"), self._parse_span(rows=rows, model=model):
+            return await parse_rows_in_chunks(
+                rows=rows,
+                row_mapper=self.row_mapper,
+                model=model,
+                validate=self.validate,
+            )
@@ -0,0 +1,29 @@
+"""Module for the json log formatter used by log_config.yaml"""
+
+from datetime import datetime, timezone
+from logging import LogRecord
+
+from pythonjsonlogger import json as log_json
+
+
+# We want to standardize the timestamp format to UTC and ISO-8601, which
+# requires a custom formatter and can't be done through configuration only.
+class CustomJsonFormatter(log_json.JsonFormatter):
+    """Custom class to format log timestamps as ISO-8601 UTC"""
+
+    def formatTime(self, record: LogRecord, datefmt=None) -> str:
+        """
+        Format timestamp as ISO-8601 UTC
+        Parameters
+        ----------
+        record : LogRecord
+        datefmt : str, optional
+          Default is None
+
+        Returns
+        -------
+        str
+
+        """
+        dt = datetime.fromtimestamp(record.created, tz=timezone.utc)
+        return dt.strftime("%Y-%m-%dT%H:%M:%S.%fZ")
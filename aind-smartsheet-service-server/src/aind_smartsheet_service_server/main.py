@@ -2,20 +2,34 @@
 
 import logging
 import os
-from asyncio import Semaphore
+from asyncio import create_task
 from collections.abc import AsyncIterator
 from contextlib import asynccontextmanager
 
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi_cache import FastAPICache
-from fastapi_cache.backends.inmemory import InMemoryBackend
-from fastapi_cache.backends.redis import RedisBackend
-from redis.asyncio import from_url  # noqa
 
 from aind_smartsheet_service_server import __version__ as service_version
+from aind_smartsheet_service_server.admin import router as admin_router
+from aind_smartsheet_service_server.admission import AdmissionMiddleware
+from aind_smartsheet_service_server.backends import LRUMemoryBackend
 from aind_smartsheet_service_server.configs import settings
+from aind_smartsheet_service_server.metrics import RequestMetricsMiddleware
+from aind_smartsheet_service_server.metrics import router as metrics_router
+from aind_smartsheet_service_server.monitoring import (
+    LoopLagMonitor,
+    TaskRouteMiddleware,
+)
+from aind_smartsheet_service_server.parsing import shutdown_process_pool
+from aind_smartsheet_service_server.profiling import ProfileMiddleware
+from aind_smartsheet_service_server.refresh import SheetRefresher
 from aind_smartsheet_service_server.route import router
+from aind_smartsheet_service_server.tracing import (
+    TracingMiddleware,
+    configure_tracing,
+)
+from aind_smartsheet_service_server.webhooks import router as webhook_router
 
 # The log level can be set by adding an environment variable before launch.
 log_level = os.getenv("LOG_LEVEL", "INFO")
@@ -32,14 +46,38 @@ Service to pull data from SmartSheet.
 @asynccontextmanager
 async def lifespan(_: FastAPI) -> AsyncIterator[None]:
     """Init cache and add to lifespan of app"""
-    # noinspection PyUnresolvedReferences
-    app.state.semaphore = Semaphore(settings.app_concurrency_limit)
     if settings.redis_url is not None:
+        # Importing any fastapi_cache backend imports redis, so it is only
+        # imported when it is used
+        from fastapi_cache.backends.redis import RedisBackend
+        from redis.asyncio import from_url
+
         redis = from_url(settings.redis_url.unicode_string())
         FastAPICache.init(RedisBackend(redis), prefix="fastapi-cache")
     else:
-        FastAPICache.init(InMemoryBackend(), prefix="fastapi-cache")
+        max_bytes = settings.cache_max_mb and settings.cache_max_mb * 2**20
+        FastAPICache.init(
+            LRUMemoryBackend(max_bytes=max_bytes), prefix="fastapi-cache"
+        )
+    if settings.tracing_enabled:
+        configure_tracing()
+    lag_monitor = None
+    if settings.loop_lag_threshold_ms is not None:
+        lag_monitor = LoopLagMonitor(
+            threshold=settings.loop_lag_threshold_ms / 1000,
+            interval=settings.loop_lag_interval_ms / 1000,
+        )
+        lag_monitor.start()
+    refresh_task = None
+    if settings.refresh_interval_seconds is not None:
+        refresher = SheetRefresher(settings.refresh_interval_seconds)
+        refresh_task = create_task(refresher.run())
     yield
+    if refresh_task is not None:
+        refresh_task.cancel()
+    shutdown_process_pool()
+    if lag_monitor is not None:
+        await lag_monitor.stop()
 
 
 # noinspection PyTypeChecker
@@ -58,4 +96,12 @@ app.add_middleware(
     allow_methods=["GET"],
     allow_headers=["*"],
 )
+app.add_middleware(AdmissionMiddleware)
+app.add_middleware(TaskRouteMiddleware)
+app.add_middleware(ProfileMiddleware)
+app.add_middleware(RequestMetricsMiddleware)
+app.add_middleware(TracingMiddleware)
 app.include_router(router)
+app.include_router(webhook_router)
+app.include_router(admin_router)
+app.include_router(metrics_router)
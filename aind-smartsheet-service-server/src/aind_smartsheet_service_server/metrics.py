@@ -0,0 +1,235 @@
+"""Module for Prometheus metrics of requests, the sheet cache and
+Smartsheet downloads"""
+
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from time import perf_counter
+from typing import Dict, Iterator, Optional
+
+from fastapi import APIRouter, Response
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+)
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from aind_smartsheet_service_server.caching import get_cached_sheet_entry
+from aind_smartsheet_service_server.registry import sheet_registry
+
+STAGE_SECONDS = Histogram(
+    "smartsheet_service_stage_seconds",
+    "Time spent in each stage of serving a sheet.",
+    ["stage"],
+)
+REQUEST_SECONDS = Histogram(
+    "smartsheet_service_request_seconds",
+    "Time to serve a request by route.",
+    ["method", "route", "status"],
+)
+SHEET_REQUESTS = Counter(
+    "smartsheet_service_sheet_requests_total",
+    "Reads of a sheet from the cache by whether it had to be downloaded.",
+    ["sheet_id", "cache"],
+)
+UPSTREAM_FETCHES = Counter(
+    "smartsheet_service_upstream_fetches_total",
+    "Downloads of a sheet from Smartsheet by outcome.",
+    ["sheet_id", "outcome"],
+)
+FETCH_JOINS = Counter(
+    "smartsheet_service_fetch_joins_total",
+    "Requests that waited for a download of a sheet already in progress "
+    "instead of starting another.",
+    ["sheet_id"],
+)
+CACHED_ERRORS = Counter(
+    "smartsheet_service_cached_errors_total",
+    "Requests for a sheet answered with a recent upstream error instead of "
+    "calling Smartsheet again.",
+    ["sheet_id"],
+)
+SHED_REQUESTS = Counter(
+    "smartsheet_service_shed_requests_total",
+    "Requests rejected with a 503 error by the limit that was reached.",
+    ["reason"],
+)
+CANCELLED_REQUESTS = Counter(
+    "smartsheet_service_cancelled_requests_total",
+    "Requests cancelled because they ran out of time or the client left.",
+    ["reason"],
+)
+CACHED_BYTES = Gauge(
+    "smartsheet_service_cached_bytes",
+    "Size of the cached copy of a sheet. Updated when metrics are scraped.",
+    ["sheet_id"],
+)
+CACHE_SIZE_BYTES = Gauge(
+    "smartsheet_service_cache_size_bytes",
+    "Size of the entries in the size bounded in-process cache.",
+)
+CACHE_EVICTIONS = Counter(
+    "smartsheet_service_cache_evictions_total",
+    "Entries dropped from the size bounded in-process cache by reason.",
+    ["reason"],
+)
+SNAPSHOT_BYTES = Gauge(
+    "smartsheet_service_snapshot_bytes",
+    "Estimated memory of the validated copy of a sheet held in the process.",
+    ["sheet_id"],
+)
+SNAPSHOT_EVICTIONS = Counter(
+    "smartsheet_service_snapshot_evictions_total",
+    "Validated sheets dropped to stay within the memory budget.",
+    ["sheet_id"],
+)
+LOOP_LAG_SECONDS = Histogram(
+    "smartsheet_service_event_loop_lag_seconds",
+    "How late the event loop woke up a task sleeping for a fixed interval.",
+    # Lag is usually well under the smallest default bucket
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 5),
+)
+LOOP_STALLS = Counter(
+    "smartsheet_service_event_loop_stalls_total",
+    "Times the event loop was blocked for longer than the threshold.",
+)
+
+# Set by get_smartsheet when the sheet was not cached, and when a newly
+# published shared file is loaded, so that the caller can tell a cache hit
+# from a miss.
+sheet_downloaded: ContextVar[bool] = ContextVar(
+    "sheet_downloaded", default=False
+)
+
+
+class StageTimings:
+    """Total time spent in each stage while serving one request. Stages can
+    be recorded from tasks and threads started by the request."""
+
+    def __init__(self):
+        """Class constructor"""
+        self.durations: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def add(self, stage: str, seconds: float) -> None:
+        """Add the duration of one run of a stage."""
+        with self._lock:
+            self.durations[stage] = self.durations.get(stage, 0.0) + seconds
+
+    def server_timing(self, total: float) -> str:
+        """
+        Format the stages as a Server-Timing header value.
+        Parameters
+        ----------
+        total : float
+          Seconds since the request started.
+
+        Returns
+        -------
+        str
+          For example "cache_lookup;dur=0.4, total;dur=2.1" in milliseconds.
+
+        """
+        with self._lock:
+            durations = [*self.durations.items(), ("total", total)]
+        return ", ".join(
+            f"{stage};dur={seconds * 1000:.1f}" for stage, seconds in durations
+        )
+
+
+# Stage timings of the request being served. Tasks and threads started by
+# the request copy the context and so add to the same StageTimings.
+request_timings: ContextVar[Optional[StageTimings]] = ContextVar(
+    "request_timings", default=None
+)
+
+
+def observe_stage(stage: str, seconds: float) -> None:
+    """Record the duration of one stage of a request."""
+    STAGE_SECONDS.labels(stage=stage).observe(seconds)
+    timings = request_timings.get()
+    if timings is not None:
+        timings.add(stage, seconds)
+
+
+@contextmanager
+def timed(stage: str) -> Iterator[None]:
+    """
+    Record how long the body of the with statement takes as a stage.
+    Parameters
+    ----------
+    stage : str
+      For example cache_lookup, upstream_fetch, validation, filtering,
+      parsing or serialization.
+    """
+    start = perf_counter()
+    try:
+        yield
+    finally:
+        observe_stage(stage, perf_counter() - start)
+
+
+class RequestMetricsMiddleware:
+    """Records the duration of each request by route template and status,
+    and reports the stages of the request in a Server-Timing header"""
+
+    def __init__(self, app: ASGIApp):
+        """Class constructor"""
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        """Time the request and record it once the response is done."""
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        start = perf_counter()
+        status_code = 500
+        timings = StageTimings()
+        timings_token = request_timings.set(timings)
+
+        async def send_with_status(message: Message) -> None:
+            """Keep the status code and add the Server-Timing header."""
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                headers = MutableHeaders(scope=message)
+                headers.append(
+                    "Server-Timing",
+                    timings.server_timing(perf_counter() - start),
+                )
+                # Lets browsers on other origins read the timings
+                headers.append("Timing-Allow-Origin", "*")
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            request_timings.reset(timings_token)
+            # Label by route template rather than path to bound cardinality
+            route = getattr(scope.get("route"), "path", "unmatched")
+            REQUEST_SECONDS.labels(
+                method=scope["method"], route=route, status=str(status_code)
+            ).observe(perf_counter() - start)
+
+
+router = APIRouter(include_in_schema=False)
+
+
+@router.get("/metrics")
+async def get_metrics():
+    """
+    ## Metrics
+    Metrics in the Prometheus text format.
+    """
+    for sheet in sheet_registry:
+        entry = await get_cached_sheet_entry(
+            sheet_id=sheet.sheet_id, access_token=sheet.access_token
+        )
+        CACHED_BYTES.labels(sheet_id=str(sheet.sheet_id)).set(
+            0 if entry is None else entry[1]
+        )
+    return Response(content=generate_latest(), media_type=CONTENT_TYPE_LATEST)
@@ -2,7 +2,7 @@
 
 from datetime import date as date_type
 from datetime import datetime
-from typing import Any, List, Literal, Optional, Union
+from typing import Any, Dict, List, Literal, Optional, Union
 
 from pydantic import BaseModel, ConfigDict, Field, field_validator
 
@@ -93,6 +93,38 @@ class SheetFields(BaseModel):
     )(_parse_datetime_str)
 
 
+class RowChange(BaseModel):
+    """A row that was added or updated in a sheet"""
+
+    id: int = Field(..., description="Smartsheet row id")
+    modifiedAt: datetime
+    data: Dict[str, Any] = Field(
+        ..., description="Row parsed with the model of the sheet"
+    )
+
+
+class SheetChanges(BaseModel):
+    """Rows added, updated or deleted since a version or time"""
+
+    sheet_id: int
+    version: int = Field(..., description="Current version of the sheet")
+    since_version: Optional[int] = None
+    since: Optional[datetime] = None
+    added: List[RowChange] = []
+    updated: List[RowChange] = []
+    deleted: List[int] = Field(default=[], description="Deleted row ids")
+
+
+class SheetUpdate(BaseModel):
+    """Pushed to subscribers when a sheet has a new version"""
+
+    sheet_name: str
+    sheet_id: int
+    version: int
+    previous_version: int
+    changes: Optional[SheetChanges] = None
+
+
 class FundingModel(BaseModel):
     """Expected model for the Funding Sheet"""
 
@@ -195,3 +227,53 @@ class ProtocolsModel(BaseModel):
         default=None, title="Website pages", validation_alias="388788696338308"
     )
     model_config = ConfigDict(populate_by_name=True)
+
+
+class WebhookEvent(BaseModel):
+    """A single change reported in a webhook callback"""
+
+    objectType: str
+    eventType: str
+    id: Optional[int] = None
+    rowId: Optional[int] = None
+    columnId: Optional[int] = None
+    userId: Optional[int] = None
+    timestamp: Optional[datetime] = None
+
+
+class WebhookCallback(BaseModel):
+    """Body of a Smartsheet webhook callback, verification request or
+    status change"""
+
+    webhookId: int
+    nonce: Optional[str] = None
+    timestamp: Optional[datetime] = None
+    scope: Optional[str] = None
+    scopeObjectId: Optional[int] = None
+    challenge: Optional[str] = None
+    newWebhookStatus: Optional[str] = None
+    events: List[WebhookEvent] = []
+
+
+class WebhookResponse(BaseModel):
+    """Acknowledgement of a webhook callback"""
+
+    smartsheetHookResponse: Optional[str] = None
+
+
+class CachedSheet(BaseModel):
+    """State of the cached copy of a served sheet"""
+
+    sheet_name: str
+    sheet_id: int
+    cached: bool
+    version: Optional[int] = None
+    age_seconds: Optional[int] = None
+    size_bytes: Optional[int] = None
+
+
+class EvictedSheet(BaseModel):
+    """Result of evicting a sheet from the cache"""
+
+    sheet_id: int
+    evicted: int
@@ -0,0 +1,143 @@
+"""Module to detect callbacks that block the event loop"""
+
+import asyncio
+import logging
+import sys
+import threading
+import traceback
+from time import monotonic
+from typing import Optional
+from weakref import WeakKeyDictionary
+
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from aind_smartsheet_service_server.metrics import (
+    LOOP_LAG_SECONDS,
+    LOOP_STALLS,
+)
+
+# Route each request task is serving, so a blocked loop can be traced back
+# to a request.
+task_routes: "WeakKeyDictionary[asyncio.Task, str]" = WeakKeyDictionary()
+
+
+class TaskRouteMiddleware:
+    """Records the method and path served by each request task"""
+
+    def __init__(self, app: ASGIApp):
+        """Class constructor"""
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        """Tag the current task with the request route."""
+        if scope["type"] == "http":
+            task = asyncio.current_task()
+            if task is not None:
+                task_routes[task] = f"{scope['method']} {scope['path']}"
+        await self.app(scope, receive, send)
+
+
+class LoopLagMonitor:
+    """
+    Measures event loop lag with a task that sleeps for interval seconds
+    and records how late it wakes up. A watchdog thread checks that the task
+    keeps waking up. If the loop is blocked for more than threshold seconds,
+    the stack of the blocking code and the route of the running task are
+    logged once per stall. Each lag measurement and each stall are also
+    exported as metrics.
+    """
+
+    def __init__(
+        self, threshold: float, interval: float = 0.05, stack_limit: int = 8
+    ):
+        """
+        Class constructor
+        Parameters
+        ----------
+        threshold : float
+          Seconds the loop can be blocked before it is reported.
+        interval : float
+          Seconds between lag measurements.
+        stack_limit : int
+          Number of innermost stack frames to log.
+        """
+        self.threshold = threshold
+        self.interval = interval
+        self.stack_limit = stack_limit
+        self.last_lag = 0.0
+        self.max_lag = 0.0
+        self.blocked_count = 0
+        self._heartbeat = monotonic()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_thread_id: Optional[int] = None
+        self._task: Optional[asyncio.Task] = None
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+
+    async def _measure(self) -> None:
+        """Sleep for interval and record how late the loop woke up."""
+        while True:
+            start = monotonic()
+            await asyncio.sleep(self.interval)
+            now = monotonic()
+            self.last_lag = max(now - start - self.interval, 0.0)
+            self.max_lag = max(self.max_lag, self.last_lag)
+            LOOP_LAG_SECONDS.observe(self.last_lag)
+            self._heartbeat = now
+
+    def _watch(self) -> None:
+        """Report the loop once per stall longer than threshold."""
+        reported = None
+        while not self._stop.wait(self.interval):
+            heartbeat = self._heartbeat
+            blocked = monotonic() - heartbeat - self.interval
+            if blocked > self.threshold and reported != heartbeat:
+                reported = heartbeat
+                self.report_blocked(blocked)
+
+    def report_blocked(self, blocked: float) -> None:
+        """
+        Log the route and stack of the code blocking the loop.
+        Parameters
+        ----------
+        blocked : float
+          Seconds the loop has been blocked so far.
+        """
+        self.blocked_count += 1
+        LOOP_STALLS.inc()
+        task = asyncio.current_task(self._loop)
+        route = task_routes.get(task, "no request") if task else "no task"
+        frame = sys._current_frames().get(self._loop_thread_id)
+        stack = (
+            "".join(traceback.format_stack(frame, limit=self.stack_limit))
+            if frame is not None
+            else ""
+        )
+        logging.warning(
+            f"Event loop blocked for {blocked * 1000:.0f} ms while serving "
+            f"{route}.\n{stack}"
+        )
+
+    def start(self) -> None:
+        """Start measuring. Must be called from the running event loop."""
+        self._loop = asyncio.get_running_loop()
+        self._loop_thread_id = threading.get_ident()
+        self._heartbeat = monotonic()
+        self._stop.clear()
+        self._task = self._loop.create_task(self._measure())
+        self._thread = threading.Thread(
+            target=self._watch, name="loop-lag-monitor", daemon=True
+        )
+        self._thread.start()
+
+    async def stop(self) -> None:
+        """Stop measuring and wait for the watchdog thread to exit."""
+        self._stop.set()
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        if self._thread is not None:
+            self._thread.join()
@@ -0,0 +1,157 @@
+"""Module to parse large sheets without blocking the event loop"""
+
+import asyncio
+from concurrent.futures import Executor, ProcessPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, TypeVar
+
+from pydantic import BaseModel, TypeAdapter, ValidationError
+
+from aind_smartsheet_service_server.configs import settings
+from aind_smartsheet_service_server.models import SheetFields, SheetRow
+
+T = TypeVar("T", bound=BaseModel)
+R = TypeVar("R")
+
+_process_pool: Optional[ProcessPoolExecutor] = None
+_sheet_rows = TypeAdapter(List[SheetRow])
+
+
+def validate_rows(
+    model: type[T], mapped_rows: List[Dict[str, Any]], validate: bool = True
+) -> List[T]:
+    """
+    Parse mapped rows into a model.
+    Parameters
+    ----------
+    model : type[T]
+    mapped_rows : List[Dict[str, Any]]
+      Rows already mapped into dictionaries, e.g. by default_row_map.
+    validate : bool
+      Raise validation errors instead of constructing invalid models.
+
+    Returns
+    -------
+    List[T]
+
+    """
+    parsed_rows = []
+    for row in mapped_rows:
+        try:
+            parsed_row = model.model_validate(row)
+        except ValidationError as e:
+            if validate:
+                raise e
+            parsed_row = model.model_construct(**row)
+        parsed_rows.append(parsed_row)
+    return parsed_rows
+
+
+def get_process_pool() -> ProcessPoolExecutor:
+    """The shared process pool, created on first use."""
+    global _process_pool
+    if _process_pool is None:
+        _process_pool = ProcessPoolExecutor(max_workers=settings.parse_workers)
+    return _process_pool
+
+
+def shutdown_process_pool() -> None:
+    """Stop the shared process pool if it was started."""
+    global _process_pool
+    if _process_pool is not None:
+        _process_pool.shutdown(wait=False, cancel_futures=True)
+        _process_pool = None
+
+
+async def run_cpu_bound(func: Callable[..., R], *args: Any) -> R:
+    """
+    Run a CPU bound function where parse_executor is configured to. In
+    "process" mode func and args must be picklable.
+    Parameters
+    ----------
+    func : Callable[..., R]
+    args : Any
+
+    Returns
+    -------
+    R
+
+    """
+    if settings.parse_executor == "inline":
+        return func(*args)
+    executor: Optional[Executor] = None
+    if settings.parse_executor == "process":
+        executor = get_process_pool()
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(executor, func, *args)
+
+
+async def parse_rows_in_chunks(
+    rows: List[SheetRow],
+    row_mapper: Callable[[SheetRow], dict],
+    model: type[T],
+    validate: bool = True,
+) -> List[T]:
+    """
+    Parse rows into a model in batches of parse_chunk_size rows. Each batch
+    is validated with run_cpu_bound and control returns to the event loop
+    between batches, so other requests are served while a big sheet is
+    parsed. Fewer than parse_offload_min_rows rows are parsed directly.
+    Parameters
+    ----------
+    rows : List[SheetRow]
+    row_mapper : Callable[[SheetRow], dict]
+    model : type[T]
+    validate : bool
+
+    Returns
+    -------
+    List[T]
+
+    """
+    if len(rows) < settings.parse_offload_min_rows:
+        return validate_rows(model, [row_mapper(r) for r in rows], validate)
+    parsed_rows: List[T] = []
+    chunk_size = settings.parse_chunk_size
+    for start in range(0, len(rows), chunk_size):
+        end = start + chunk_size
+        mapped_rows = [row_mapper(r) for r in rows[start:end]]
+        parsed_rows.extend(
+            await run_cpu_bound(validate_rows, model, mapped_rows, validate)
+        )
+        await asyncio.sleep(0)
+    return parsed_rows
+
+
+def validate_sheet_rows(raw_rows: List[dict]) -> List[SheetRow]:
+    """Validate the raw rows of a sheet."""
+    return _sheet_rows.validate_python(raw_rows)
+
+
+async def validate_sheet(raw_sheet: dict) -> SheetFields:
+    """
+    Validate a raw sheet into SheetFields. The rows of sheets with at least
+    parse_offload_min_rows rows are validated in batches of
+    parse_chunk_size rows with run_cpu_bound, and control returns to the
+    event loop between batches. A single validation call holds the GIL
+    even in a thread, so the whole sheet is never validated at once.
+    Parameters
+    ----------
+    raw_sheet : dict
+
+    Returns
+    -------
+    SheetFields
+
+    """
+    raw_rows = raw_sheet.get("rows", [])
+    if len(raw_rows) < settings.parse_offload_min_rows:
+        return SheetFields.model_validate(raw_sheet)
+    sheet_fields = SheetFields.model_validate({**raw_sheet, "rows": []})
+    chunk_size = settings.parse_chunk_size
+    for start in range(0, len(raw_rows), chunk_size):
+        end = start + chunk_size
+        sheet_fields.rows.extend(
+            await run_cpu_bound(validate_sheet_rows, raw_rows[start:end])
+        )
+        await asyncio.sleep(0)
+    return sheet_fields
@@ -0,0 +1,196 @@
+"""Module for on demand sampling profiles of the running service"""
+
+import asyncio
+import sys
+import threading
+from collections import Counter
+from types import FrameType
+from typing import Dict, Optional
+from weakref import WeakSet
+
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+# Requests with this header are sampled by a profiler started with
+# flagged_only.
+PROFILE_HEADER = b"x-profile"
+
+_active_profiler: Optional["SamplingProfiler"] = None
+
+
+def fold_stack(frame: Optional[FrameType]) -> str:
+    """
+    Format a stack as semicolon separated frames, outermost first.
+    Parameters
+    ----------
+    frame : FrameType | None
+      Innermost frame of the stack.
+
+    Returns
+    -------
+    str
+      For example "module:main;module:Class.method".
+
+    """
+    names = []
+    while frame is not None:
+        module = frame.f_globals.get("__name__", "?")
+        names.append(f"{module}:{frame.f_code.co_qualname}")
+        frame = frame.f_back
+    return ";".join(reversed(names))
+
+
+class SamplingProfiler:
+    """
+    Samples the stacks of running threads from a background thread and
+    counts how often each stack is seen. The counts are written in the
+    folded format read by flamegraph.pl, speedscope and similar tools.
+    """
+
+    def __init__(
+        self,
+        interval: float = 0.005,
+        loop: Optional[asyncio.AbstractEventLoop] = None,
+        flagged_only: bool = False,
+    ):
+        """
+        Class constructor
+        Parameters
+        ----------
+        interval : float
+          Seconds between samples.
+        loop : asyncio.AbstractEventLoop | None
+          Event loop serving requests. Required if flagged_only.
+        flagged_only : bool
+          Only sample the event loop while it runs a flagged request task.
+        """
+        self.interval = interval
+        self.loop = loop
+        self.flagged_only = flagged_only
+        self.samples: Counter[str] = Counter()
+        self.sample_count = 0
+        self._tasks: "WeakSet[asyncio.Task]" = WeakSet()
+        self._loop_thread_id: Optional[int] = None
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def add_task(self, task: asyncio.Task) -> None:
+        """Flag a request task to be sampled."""
+        self._tasks.add(task)
+
+    def discard_task(self, task: asyncio.Task) -> None:
+        """Stop sampling a request task."""
+        self._tasks.discard(task)
+
+    def _frames(self) -> Dict[int, FrameType]:
+        """Current frame of each thread to sample."""
+        frames = sys._current_frames()
+        frames.pop(threading.get_ident(), None)
+        if not self.flagged_only:
+            return frames
+        task = asyncio.current_task(self.loop)
+        frame = frames.get(self._loop_thread_id)
+        if task is None or task not in self._tasks or frame is None:
+            return {}
+        return {self._loop_thread_id: frame}
+
+    def sample(self) -> None:
+        """Record the stack of each sampled thread once."""
+        names = {t.ident: t.name for t in threading.enumerate()}
+        for thread_id, frame in self._frames().items():
+            thread_name = names.get(thread_id, str(thread_id))
+            self.samples[f"{thread_name};{fold_stack(frame)}"] += 1
+        self.sample_count += 1
+
+    def _run(self) -> None:
+        """Sample every interval until stopped."""
+        while not self._stop.wait(self.interval):
+            self.sample()
+
+    def start(self) -> None:
+        """Start sampling. Must be called from the event loop thread."""
+        self._loop_thread_id = threading.get_ident()
+        self._stop.clear()
+        self._thread = threading.Thread(
+            target=self._run, name="sampling-profiler", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Stop sampling and wait for the sampling thread to exit."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def folded(self) -> str:
+        """The samples as lines of a folded stack and its count."""
+        return "".join(
+            f"{stack} {count}\n" for stack, count in self.samples.items()
+        )
+
+
+async def profile(
+    seconds: float, interval: float = 0.005, flagged_only: bool = False
+) -> SamplingProfiler:
+    """
+    Sample the process for a number of seconds.
+    Parameters
+    ----------
+    seconds : float
+    interval : float
+      Seconds between samples.
+    flagged_only : bool
+      Only sample requests sent with the X-Profile header.
+
+    Returns
+    -------
+    SamplingProfiler
+      The stopped profiler with its samples.
+
+    Raises
+    ------
+    RuntimeError
+      If a profile is already being recorded.
+
+    """
+    global _active_profiler
+    if _active_profiler is not None:
+        raise RuntimeError("A profile is already being recorded.")
+    profiler = SamplingProfiler(
+        interval=interval,
+        loop=asyncio.get_running_loop(),
+        flagged_only=flagged_only,
+    )
+    _active_profiler = profiler
+    profiler.start()
+    try:
+        await asyncio.sleep(seconds)
+    finally:
+        profiler.stop()
+        _active_profiler = None
+    return profiler
+
+
+class ProfileMiddleware:
+    """Flags requests with the X-Profile header for the active profiler.
+    Requests pass straight through while no profile is being recorded."""
+
+    def __init__(self, app: ASGIApp):
+        """Class constructor"""
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        """Flag the request task while it is served."""
+        profiler = _active_profiler
+        if (
+            profiler is None
+            or scope["type"] != "http"
+            or not any(k == PROFILE_HEADER for k, _ in scope["headers"])
+        ):
+            await self.app(scope, receive, send)
+            return
+        task = asyncio.current_task()
+        profiler.add_task(task)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            profiler.discard_task(task)
@@ -0,0 +1,106 @@
+"""Process that downloads the sheets for workers reading them from
+shared_sheets_dir.
+Usage: python -m aind_smartsheet_service_server.publisher --interval 60
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import sys
+from typing import Dict, List, Optional
+
+from aind_smartsheet_service_server.configs import settings
+from aind_smartsheet_service_server.refresh import (
+    SheetRefresher,
+    get_sheet_version,
+)
+from aind_smartsheet_service_server.route import fetch_sheet
+from aind_smartsheet_service_server.shared import SharedSheets
+
+
+class SheetPublisher(SheetRefresher):
+    """Polls the version of every configured sheet and publishes a sheet
+    when it has a version that was not published yet. Every sheet is
+    published once on start."""
+
+    def __init__(self, interval_seconds: float, shared_sheets: SharedSheets):
+        """
+        Class constructor
+        Parameters
+        ----------
+        interval_seconds : float
+        shared_sheets : SharedSheets
+        """
+        super().__init__(interval_seconds)
+        self.shared_sheets = shared_sheets
+        self._published: Dict[int, int] = {}
+
+    async def refresh_sheet(self, sheet_id: int, access_token: str) -> bool:
+        """
+        Download and publish a sheet if Smartsheet reports a version that
+        was not published.
+        Parameters
+        ----------
+        sheet_id : int
+        access_token : str
+
+        Returns
+        -------
+        bool
+          True if the sheet was published.
+
+        """
+        version = await get_sheet_version(sheet_id, access_token)
+        if self._published.get(sheet_id) == version:
+            return False
+        raw_sheet = await fetch_sheet(
+            sheet_id=sheet_id,
+            user_agent=settings.user_agent,
+            max_connections=settings.max_connections,
+            access_token=access_token,
+        )
+        if not isinstance(raw_sheet, dict):
+            raise RuntimeError(
+                f"Unable to download sheet {sheet_id}: "
+                f"{raw_sheet.result.message}"
+            )
+        await asyncio.to_thread(
+            self.shared_sheets.publish, sheet_id, access_token, raw_sheet
+        )
+        self._published[sheet_id] = raw_sheet["version"]
+        logging.info(
+            f"Published version {raw_sheet['version']} of sheet {sheet_id}."
+        )
+        return True
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Publish the sheets until the process is stopped."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--interval",
+        type=float,
+        default=settings.refresh_interval_seconds or 60,
+        help="Seconds between checks of the sheet versions",
+    )
+    parser.add_argument(
+        "--once", action="store_true", help="Publish once and exit"
+    )
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=os.getenv("LOG_LEVEL", "INFO"))
+    if settings.shared_sheets_dir is None:
+        parser.error("SMARTSHEET_SHARED_SHEETS_DIR is not set.")
+    publisher = SheetPublisher(
+        interval_seconds=args.interval,
+        shared_sheets=SharedSheets(settings.shared_sheets_dir),
+    )
+    if args.once:
+        asyncio.run(publisher.refresh_once())
+    else:
+        asyncio.run(publisher.run())
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,150 @@
+"""Module to refresh cached sheets in the background"""
+
+import asyncio
+import logging
+from asyncio import to_thread
+from typing import Dict, Optional, Set
+
+from aind_smartsheet_service_server.caching import evict_sheet
+from aind_smartsheet_service_server.configs import settings
+from aind_smartsheet_service_server.registry import sheet_registry
+from aind_smartsheet_service_server.route import get_sheet_snapshot
+from aind_smartsheet_service_server.shared import shared_sheets
+from aind_smartsheet_service_server.snapshot import (
+    SheetSnapshot,
+    snapshot_store,
+)
+
+
+async def get_sheet_version(sheet_id: int, access_token: str) -> int:
+    """
+    Ask Smartsheet for the current version of a sheet without downloading
+    it.
+    Parameters
+    ----------
+    sheet_id : int
+    access_token : str
+
+    Returns
+    -------
+    int
+
+    """
+    from smartsheet import Smartsheet
+    from smartsheet.models.error import Error as SmartsheetError
+
+    client = Smartsheet(
+        user_agent=settings.user_agent,
+        max_connections=settings.max_connections,
+        access_token=access_token,
+        api_base=settings.api_base,
+    )
+    version = await to_thread(client.Sheets.get_sheet_version, sheet_id)
+    if isinstance(version, SmartsheetError):
+        raise RuntimeError(
+            f"Unable to get version of sheet {sheet_id}: "
+            f"{version.result.message}"
+        )
+    return version.version
+
+
+async def reload_sheet(sheet_id: int, access_token: str) -> SheetSnapshot:
+    """
+    Evict the cached copies of a sheet and download it again. Snapshot
+    listeners are notified if the version changed.
+    Parameters
+    ----------
+    sheet_id : int
+    access_token : str
+
+    Returns
+    -------
+    SheetSnapshot
+
+    """
+    await evict_sheet(sheet_id=sheet_id, access_tokens=[access_token])
+    return await get_sheet_snapshot(
+        sheet_id=sheet_id, access_token=access_token
+    )
+
+
+class SheetRefresher:
+    """Polls the version of every configured sheet. When a sheet has a new
+    version its cache entries are evicted and it is downloaded again, which
+    notifies snapshot listeners such as the event stream. With shared
+    sheets, the published files are checked instead of Smartsheet."""
+
+    def __init__(self, interval_seconds: float):
+        """Class constructor"""
+        self.interval_seconds = interval_seconds
+
+    @staticmethod
+    def _sheets() -> Dict[int, str]:
+        """Access token to use for each configured sheet_id."""
+        return {sheet.sheet_id: sheet.access_token for sheet in sheet_registry}
+
+    async def refresh_sheet(self, sheet_id: int, access_token: str) -> bool:
+        """
+        Reload a sheet if Smartsheet reports a different version than the
+        last snapshot. A snapshot dropped to stay within the memory budget
+        is not reloaded until it is requested again.
+        Parameters
+        ----------
+        sheet_id : int
+        access_token : str
+
+        Returns
+        -------
+        bool
+          True if the sheet was reloaded.
+
+        """
+        current_version = snapshot_store.get_version(sheet_id)
+        if shared_sheets is not None:
+            if shared_sheets.is_loaded(sheet_id, access_token):
+                return False
+            reloaded = await get_sheet_snapshot(
+                sheet_id=sheet_id, access_token=access_token
+            )
+            return reloaded.version != current_version
+        version = await get_sheet_version(sheet_id, access_token)
+        if version == current_version:
+            return False
+        await reload_sheet(sheet_id=sheet_id, access_token=access_token)
+        return True
+
+    async def refresh_once(self) -> Set[int]:
+        """
+        Check every configured sheet once. Errors are logged and do not stop
+        the other sheets from being checked.
+
+        Returns
+        -------
+        Set[int]
+          The sheet_ids that were reloaded.
+
+        """
+        refreshed = set()
+        for sheet_id, access_token in self._sheets().items():
+            try:
+                if await self.refresh_sheet(sheet_id, access_token):
+                    refreshed.add(sheet_id)
+            except Exception as e:
+                logging.warning(f"Unable to refresh sheet {sheet_id}: {e}")
+        return refreshed
+
+    async def run(self, stop: Optional[asyncio.Event] = None) -> None:
+        """
+        Refresh the sheets every interval_seconds until stop is set or the
+        task is cancelled.
+        Parameters
+        ----------
+        stop : asyncio.Event | None
+        """
+        stop = stop or asyncio.Event()
+        while not stop.is_set():
+            await self.refresh_once()
+            try:
+                await asyncio.wait_for(stop.wait(), self.interval_seconds)
+            except asyncio.TimeoutError:
+                pass
@@ -0,0 +1,238 @@
+"""Module for the registry of sheets served by the app"""
+
+from importlib import import_module
+from typing import Dict, Iterable, Iterator, List, Optional
+
+from pydantic import BaseModel
+
+from aind_smartsheet_service_server.configs import (
+    Settings,
+    SheetConfig,
+    settings,
+)
+from aind_smartsheet_service_server.exaspim_models import (
+    ImagingQueue,
+    MouseTracker,
+    QcSheet,
+    SampleTracking,
+)
+from aind_smartsheet_service_server.models import (
+    FundingModel,
+    PerfusionsModel,
+    ProtocolsModel,
+)
+
+
+def import_model(path: str) -> type[BaseModel]:
+    """
+    Import a model class from a path like 'package.module.Model'.
+    Parameters
+    ----------
+    path : str
+
+    Returns
+    -------
+    type[BaseModel]
+
+    """
+    module_name, _, class_name = path.rpartition(".")
+    model = getattr(import_module(module_name), class_name)
+    if not (isinstance(model, type) and issubclass(model, BaseModel)):
+        raise TypeError(f"{path} is not a pydantic model.")
+    return model
+
+
+class RegisteredSheet:
+    """A sheet the app can serve along with how to serve it"""
+
+    def __init__(
+        self,
+        name: str,
+        sheet_id: int,
+        access_token: str,
+        model: Optional[type[BaseModel]] = None,
+        index_columns: Iterable[str] = (),
+        ttl_seconds: int = 600,
+    ):
+        """
+        Class constructor
+        Parameters
+        ----------
+        name : str
+          Name of the sheet in urls.
+        sheet_id : int
+        access_token : str
+        model : type[BaseModel] | None
+          Model to parse rows into. If None, rows are mapped by column title.
+        index_columns : Iterable[str]
+          Model fields, or column titles if model is None, that can be
+          filtered on.
+        ttl_seconds : int
+          Maximum age of the cached sheet.
+        """
+        self.name = name
+        self.sheet_id = sheet_id
+        self.access_token = access_token
+        self.model = model
+        self.index_columns = list(index_columns)
+        self.ttl_seconds = ttl_seconds
+
+    def __repr__(self) -> str:
+        """Representation without the access token."""
+        return f"RegisteredSheet(name={self.name!r}, sheet_id={self.sheet_id})"
+
+
+class SheetRegistry:
+    """Sheets served by the app, by name"""
+
+    def __init__(self, sheets: Iterable[RegisteredSheet] = ()):
+        """Class constructor"""
+        self._sheets: Dict[str, RegisteredSheet] = {}
+        for sheet in sheets:
+            self.register(sheet)
+
+    def register(self, sheet: RegisteredSheet) -> None:
+        """Add a sheet, replacing any sheet with the same name."""
+        self._sheets[sheet.name] = sheet
+
+    def unregister(self, name: str) -> None:
+        """Remove a sheet if it is registered."""
+        self._sheets.pop(name, None)
+
+    def get(self, name: str) -> Optional[RegisteredSheet]:
+        """The sheet registered under name, if any."""
+        return self._sheets.get(name)
+
+    def get_by_id(self, sheet_id: int) -> Optional[RegisteredSheet]:
+        """The first sheet registered with sheet_id, if any."""
+        return next((s for s in self if s.sheet_id == sheet_id), None)
+
+    def names(self) -> List[str]:
+        """Names of the registered sheets."""
+        return list(self._sheets)
+
+    def __iter__(self) -> Iterator[RegisteredSheet]:
+        """Iterate over the registered sheets."""
+        return iter(list(self._sheets.values()))
+
+    @classmethod
+    def from_settings(cls, app_settings: Settings) -> "SheetRegistry":
+        """
+        Build the registry from the built-in sheets and any sheets added in
+        the settings.
+        Parameters
+        ----------
+        app_settings : Settings
+
+        Returns
+        -------
+        SheetRegistry
+
+        """
+        built_in = {
+            "funding": (
+                app_settings.funding_id,
+                FundingModel,
+                ["project_name", "subproject"],
+            ),
+            "protocols": (
+                app_settings.protocols_id,
+                ProtocolsModel,
+                ["protocol_name", "protocol_type", "procedure_name"],
+            ),
+            "perfusions": (
+                app_settings.perfusions_id,
+                PerfusionsModel,
+                ["subject_id", "experimenter"],
+            ),
+        }
+        built_in_2 = {
+            "mouse_tracker": (
+                app_settings.mouse_tracker_id,
+                MouseTracker,
+                ["mouse_id"],
+            ),
+            "sample_tracking": (
+                app_settings.sample_tracking_id,
+                SampleTracking,
+                ["sample"],
+            ),
+            "imaging_queue": (
+                app_settings.imaging_queue_id,
+                ImagingQueue,
+                ["sample"],
+            ),
+            "exaspim_qc_sheet": (
+                app_settings.exaspim_qc_sheet_id,
+                QcSheet,
+                ["sample"],
+            ),
+        }
+        registry = cls()
+        for access_token, sheets in [
+            (app_settings.access_token, built_in),
+            (app_settings.access_token_2, built_in_2),
+        ]:
+            for name, (sheet_id, model, index_columns) in sheets.items():
+                registry.register(
+                    RegisteredSheet(
+                        name=name,
+                        sheet_id=sheet_id,
+                        access_token=access_token.get_secret_value(),
+                        model=model,
+                        index_columns=index_columns,
+                    )
+                )
+        for name, config in app_settings.sheets.items():
+            registry.register(cls.configured_sheet(name, config, app_settings))
+        return registry
+
+    @staticmethod
+    def configured_sheet(
+        name: str, config: SheetConfig, app_settings: Settings
+    ) -> RegisteredSheet:
+        """
+        Build a registered sheet from its config.
+        Parameters
+        ----------
+        name : str
+        config : SheetConfig
+        app_settings : Settings
+          Settings holding the access tokens.
+
+        Returns
+        -------
+        RegisteredSheet
+
+        Raises
+        ------
+        ValueError
+          If an index column is not a model field read from a column.
+
+        """
+        access_token = getattr(app_settings, config.access_token)
+        model = None if config.model is None else import_model(config.model)
+        if model is not None:
+            # Fields are read from the column ID in their validation_alias
+            unknown = [
+                c
+                for c in config.index_columns
+                if c not in model.model_fields
+                or not str(model.model_fields[c].validation_alias).isdigit()
+            ]
+            if unknown:
+                raise ValueError(
+                    f"Index columns {unknown} of sheet {name} are not fields "
+                    f"of {config.model} read from a column."
+                )
+        return RegisteredSheet(
+            name=name,
+            sheet_id=config.sheet_id,
+            access_token=access_token.get_secret_value(),
+            model=model,
+            index_columns=config.index_columns,
+            ttl_seconds=config.ttl_seconds,
+        )
+
+
+sheet_registry = SheetRegistry.from_settings(settings)
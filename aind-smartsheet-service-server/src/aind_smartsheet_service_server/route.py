@@ -1,15 +1,53 @@
 """Module to handle endpoint responses"""
 
 from asyncio import gather, to_thread
-from typing import List, Optional
+from collections import defaultdict
+from collections.abc import AsyncIterator
+from contextlib import contextmanager
+from datetime import datetime
+from functools import lru_cache, partial
+from time import perf_counter
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Dict,
+    Iterator,
+    List,
+    Optional,
+    Tuple,
+    Union,
+)
 
-from fastapi import APIRouter, HTTPException, Query, Request, status
+from fastapi import (
+    APIRouter,
+    HTTPException,
+    Path,
+    Query,
+    Request,
+    Response,
+    status,
+)
 from fastapi.openapi.models import Example
+from fastapi.responses import StreamingResponse
 from fastapi_cache.decorator import cache
-from smartsheet import Smartsheet
-from smartsheet.models.error import Error as SmartsheetError
+from pydantic import BaseModel, TypeAdapter
 
+from aind_smartsheet_service_server.caching import (
+    SHEET_EXPIRE_SECONDS,
+    SHEET_NAMESPACE,
+    evict_sheet,
+    get_cached_sheet_ttl,
+    get_cached_sheet_version,
+    set_cached_sheet_version,
+    sheet_error_cache,
+    sheet_key_builder,
+)
 from aind_smartsheet_service_server.configs import settings
+from aind_smartsheet_service_server.events import (
+    Subscription,
+    event_broker,
+    format_sse,
+)
 from aind_smartsheet_service_server.exaspim_models import (
     ExaSPIMInfo,
     ImagingQueue,
@@ -18,21 +56,74 @@ from aind_smartsheet_service_server.exaspim_models import (
     SampleTracking,
 )
 from aind_smartsheet_service_server.handler import (
+    RowFilter,
     SheetHandler,
-    default_row_filter,
+    as_utc,
+    title_row_map,
+)
+from aind_smartsheet_service_server.metrics import (
+    CACHED_ERRORS,
+    SHED_REQUESTS,
+    SHEET_REQUESTS,
+    UPSTREAM_FETCHES,
+    observe_stage,
+    sheet_downloaded,
+    timed,
 )
 from aind_smartsheet_service_server.models import (
     FundingModel,
     HealthCheck,
     PerfusionsModel,
     ProtocolsModel,
+    RowChange,
+    SheetChanges,
     SheetFields,
+    SheetRow,
+    SheetUpdate,
 )
+from aind_smartsheet_service_server.parsing import validate_sheet
+from aind_smartsheet_service_server.registry import (
+    RegisteredSheet,
+    sheet_registry,
+)
+from aind_smartsheet_service_server.scheduler import (
+    FetchQueueFull,
+    fetch_scheduler,
+)
+from aind_smartsheet_service_server.search import SearchIndex
+from aind_smartsheet_service_server.shared import shared_sheets
+from aind_smartsheet_service_server.snapshot import (
+    RowVersions,
+    SheetSnapshot,
+    snapshot_store,
+)
+from aind_smartsheet_service_server.tracing import start_span
+
+# Importing the SDK takes a tenth of a second, so it is imported on the first
+# download instead of at startup
+if TYPE_CHECKING:  # pragma: no cover
+    from smartsheet import Smartsheet
+    from smartsheet.models.error import Error as SmartsheetError
 
 router = APIRouter()
 
 
-@cache(expire=600)
+def get_registered_sheet(sheet_name: str) -> RegisteredSheet:
+    """The registered sheet with this name or a 404 error."""
+    sheet = sheet_registry.get(sheet_name)
+    if sheet is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Sheet {sheet_name} is not served.",
+        )
+    return sheet
+
+
+@cache(
+    expire=SHEET_EXPIRE_SECONDS,
+    namespace=SHEET_NAMESPACE,
+    key_builder=sheet_key_builder,
+)
 async def get_smartsheet(
     sheet_id: int, user_agent: str, max_connections: int, access_token: str
 ) -> dict:
@@ -50,19 +141,458 @@ async def get_smartsheet(
     dict or raises Exception
     """
 
+    cached_error = sheet_error_cache.get(sheet_id, access_token)
+    if cached_error is not None:
+        CACHED_ERRORS.labels(sheet_id=str(sheet_id)).inc()
+        raise HTTPException(
+            status_code=cached_error[0], detail=cached_error[1]
+        )
+    sheet_downloaded.set(True)
+    # The stored version is of the copy about to be replaced
+    await set_cached_sheet_version(
+        sheet_id=sheet_id, access_token=access_token, version=None
+    )
+    try:
+        sheet = await fetch_scheduler.fetch(
+            sheet_id=sheet_id,
+            access_token=access_token,
+            download=partial(
+                fetch_sheet,
+                sheet_id,
+                user_agent,
+                max_connections,
+                access_token,
+            ),
+        )
+    except FetchQueueFull as e:
+        SHED_REQUESTS.labels(reason="fetch_queue").inc()
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=str(e),
+            headers={"Retry-After": str(settings.retry_after_seconds)},
+        )
+    if not isinstance(sheet, dict):
+        sheet_status = sheet.result.status_code
+        message = sheet.result.message or "Smartsheet error"
+        if settings.error_cache_seconds > 0:
+            sheet_error_cache.add(
+                sheet_id=sheet_id,
+                access_token=access_token,
+                status_code=sheet_status,
+                detail=message,
+                ttl_seconds=settings.error_cache_seconds,
+            )
+        raise HTTPException(status_code=sheet_status, detail=message)
+    return sheet
+
+
+async def fetch_sheet(
+    sheet_id: int, user_agent: str, max_connections: int, access_token: str
+) -> Union[dict, "SmartsheetError"]:
+    """Download a sheet and count the download."""
+    from smartsheet import Smartsheet
+
     client = Smartsheet(
         user_agent=user_agent,
         max_connections=max_connections,
         access_token=access_token,
+        api_base=settings.api_base,
     )
-    sheet = await to_thread(client.Sheets.get_sheet, sheet_id)
+    # Serializing and validating a large sheet is slow, so it is done in the
+    # download thread instead of on the event loop
+    sheet = await to_thread(_download_sheet, client, sheet_id)
+    failed = not isinstance(sheet, dict)
+    UPSTREAM_FETCHES.labels(
+        sheet_id=str(sheet_id), outcome="error" if failed else "ok"
+    ).inc()
+    if not failed:
+        fetch_scheduler.record_rows(sheet_id, len(sheet["rows"]))
+    return sheet
+
+
+def _download_sheet(
+    client: "Smartsheet", sheet_id: int
+) -> Union[dict, "SmartsheetError"]:
+    """Download a sheet and convert it to a json compatible dict."""
+    with (
+        timed("upstream_fetch"),
+        start_span(
+            "smartsheet get_sheet",
+            {"smartsheet.sheet_id": sheet_id},
+            client=True,
+        ),
+    ):
+        sheet = client.Sheets.get_sheet(sheet_id)
+    from smartsheet.models.error import Error as SmartsheetError
 
     if isinstance(sheet, SmartsheetError):
-        sheet_status = sheet.result.status_code
-        message = sheet.result.message or "Smartsheet error"
-        raise HTTPException(status_code=sheet_status, detail=message)
-    sheet_fields = SheetFields.model_validate_json(json_data=sheet.to_json())
-    return sheet_fields.model_dump(mode="json", exclude_none=True)
+        return sheet
+    with timed("validation"):
+        sheet_fields = SheetFields.model_validate_json(
+            json_data=sheet.to_json()
+        )
+        return sheet_fields.model_dump(mode="json", exclude_none=True)
+
+
+async def _get_unchanged_snapshot(
+    sheet_id: int, access_token: str
+) -> Optional[SheetSnapshot]:
+    """The current snapshot if the cached copy of the sheet has its
+    version, found without reading the cached copy."""
+    snapshot = snapshot_store.get_current(sheet_id)
+    if snapshot is None or snapshot.version != (
+        await get_cached_sheet_version(sheet_id, access_token)
+    ):
+        return None
+    snapshot_store.touch(sheet_id)
+    return snapshot
+
+
+@contextmanager
+def _sheet_read_span(sheet_id: int) -> Iterator[None]:
+    """Span of reading a sheet, recording whether the sheet was read from
+    the cache, the current snapshot or an already loaded shared file."""
+    downloaded = sheet_downloaded.set(False)
+    with start_span(
+        "get_smartsheet", {"smartsheet.sheet_id": sheet_id}
+    ) as span:
+        try:
+            yield
+            if span is not None:
+                span.set_attribute(
+                    "smartsheet.cache_hit", not sheet_downloaded.get()
+                )
+        finally:
+            sheet_downloaded.reset(downloaded)
+
+
+async def get_sheet_snapshot(
+    sheet_id: int, access_token: str
+) -> SheetSnapshot:
+    """
+    Get the cached sheet and return the snapshot for its current version.
+    The cached sheet is only decoded and validated if its version is not
+    the version of the current snapshot. Reading the sheet is recorded in
+    a span, whether it was a cache hit or not.
+    Parameters
+    ----------
+    sheet_id : int
+    access_token : str
+
+    Returns
+    -------
+    SheetSnapshot
+    """
+    start = perf_counter()
+    with _sheet_read_span(sheet_id):
+        if shared_sheets is not None:
+            return await shared_sheets.get_snapshot(
+                sheet_id=sheet_id, access_token=access_token
+            )
+        snapshot = await _get_unchanged_snapshot(sheet_id, access_token)
+        if snapshot is not None:
+            observe_stage("cache_lookup", perf_counter() - start)
+            SHEET_REQUESTS.labels(sheet_id=str(sheet_id), cache="hit").inc()
+            return snapshot
+        raw_sheet = await get_smartsheet(
+            sheet_id=sheet_id,
+            user_agent=settings.user_agent,
+            max_connections=settings.max_connections,
+            access_token=access_token,
+        )
+        cache = "miss" if sheet_downloaded.get() else "hit"
+    if cache == "miss":
+        await set_cached_sheet_version(
+            sheet_id=sheet_id,
+            access_token=access_token,
+            version=raw_sheet["version"],
+        )
+    if cache == "hit":
+        observe_stage("cache_lookup", perf_counter() - start)
+    SHEET_REQUESTS.labels(sheet_id=str(sheet_id), cache=cache).inc()
+    sheet_fields = None
+    if not snapshot_store.is_current(sheet_id=sheet_id, raw_sheet=raw_sheet):
+        with timed("validation"):
+            sheet_fields = await validate_sheet(raw_sheet)
+    return snapshot_store.get_snapshot(
+        sheet_id=sheet_id, raw_sheet=raw_sheet, sheet_fields=sheet_fields
+    )
+
+
+async def get_registered_snapshot(sheet: RegisteredSheet) -> SheetSnapshot:
+    """
+    Get the snapshot of a registered sheet. A cached copy older than the
+    sheet's ttl_seconds is evicted first so that it is downloaded again.
+    Parameters
+    ----------
+    sheet : RegisteredSheet
+
+    Returns
+    -------
+    SheetSnapshot
+    """
+    if sheet.ttl_seconds < SHEET_EXPIRE_SECONDS:
+        ttl = await get_cached_sheet_ttl(
+            sheet_id=sheet.sheet_id, access_token=sheet.access_token
+        )
+        if ttl is not None and SHEET_EXPIRE_SECONDS - ttl > sheet.ttl_seconds:
+            await evict_sheet(
+                sheet_id=sheet.sheet_id, access_tokens=[sheet.access_token]
+            )
+    return await get_sheet_snapshot(
+        sheet_id=sheet.sheet_id, access_token=sheet.access_token
+    )
+
+
+def parse_registered_rows(
+    sheet: RegisteredSheet, snapshot: SheetSnapshot, rows: List[SheetRow]
+) -> List[Union[BaseModel, Dict[str, Any]]]:
+    """
+    Parse rows into the sheet's model, or map them by column title if the
+    sheet has no model.
+    Parameters
+    ----------
+    sheet : RegisteredSheet
+    snapshot : SheetSnapshot
+    rows : List[SheetRow]
+
+    Returns
+    -------
+    List[BaseModel | Dict[str, Any]]
+    """
+    if sheet.model is not None:
+        handler = snapshot.get_handler(model=sheet.model)
+        return handler.parse_rows(rows=rows, model=sheet.model)
+    column_titles = snapshot.derive(
+        "column_titles",
+        lambda s: {c.id: c.title for c in s.sheet_fields.columns},
+    )
+    return [title_row_map(row, column_titles) for row in rows]
+
+
+def _build_changes(
+    snapshot: SheetSnapshot,
+    baseline: RowVersions,
+    sheet: RegisteredSheet,
+    since_version: Optional[int] = None,
+    since: Optional[datetime] = None,
+) -> SheetChanges:
+    """Parse the rows changed since baseline into a SheetChanges model."""
+    added, updated, deleted = snapshot.changes_since(
+        baseline=baseline, since=since
+    )
+    rows = snapshot.sheet_fields.rows
+
+    def to_changes(positions: List[int]) -> List[RowChange]:
+        """Parse rows at positions into RowChange models."""
+        changed_rows = [rows[p] for p in positions]
+        parsed_rows = parse_registered_rows(
+            sheet=sheet, snapshot=snapshot, rows=changed_rows
+        )
+        return [
+            RowChange(
+                id=row.id,
+                modifiedAt=row.modifiedAt,
+                data=(
+                    parsed.model_dump(mode="json")
+                    if isinstance(parsed, BaseModel)
+                    else parsed
+                ),
+            )
+            for row, parsed in zip(changed_rows, parsed_rows)
+        ]
+
+    return SheetChanges(
+        sheet_id=snapshot.sheet_id,
+        version=snapshot.version,
+        since_version=since_version,
+        since=since,
+        added=to_changes(added),
+        updated=to_changes(updated),
+        deleted=deleted,
+    )
+
+
+def _serialize_sheet_update(
+    sheet_name: str,
+    snapshot: SheetSnapshot,
+    previous_version: int,
+    include_rows: bool,
+) -> str:
+    """Build the json payload pushed when a sheet changes version."""
+    changes = None
+    baseline = snapshot_store.get_baseline(
+        sheet_id=snapshot.sheet_id, version=previous_version
+    )
+    if include_rows and baseline is not None:
+        changes = _build_changes(
+            snapshot=snapshot,
+            baseline=baseline,
+            sheet=sheet_registry.get(sheet_name),
+            since_version=previous_version,
+        )
+    return SheetUpdate(
+        sheet_name=sheet_name,
+        sheet_id=snapshot.sheet_id,
+        version=snapshot.version,
+        previous_version=previous_version,
+        changes=changes,
+    ).model_dump_json(exclude_none=True)
+
+
+async def sheet_event_stream(
+    request: Request,
+    subscription: Subscription,
+    sheet_names: Dict[int, str],
+    include_rows: bool,
+) -> AsyncIterator[str]:
+    """
+    Yield Server-Sent Events for a subscription until the client leaves.
+    Parameters
+    ----------
+    request : Request
+    subscription : Subscription
+    sheet_names : Dict[int, str]
+      Name to report for each subscribed sheet_id.
+    include_rows : bool
+      Whether to include the changed rows in each event.
+
+    Returns
+    -------
+    AsyncIterator[str]
+
+    """
+    try:
+        yield ": connected\n\n"
+        while not await request.is_disconnected():
+            event = await subscription.get(
+                timeout=settings.sse_keepalive_seconds
+            )
+            if event is None:
+                yield ": keepalive\n\n"
+                continue
+            snapshot = event.snapshot
+            sheet_name = sheet_names[snapshot.sheet_id]
+            data = snapshot.derive(
+                f"sheet_update:{sheet_name}:{event.previous_version}:"
+                f"{include_rows}",
+                lambda s: _serialize_sheet_update(
+                    sheet_name=sheet_name,
+                    snapshot=s,
+                    previous_version=event.previous_version,
+                    include_rows=include_rows,
+                ),
+            )
+            yield format_sse(
+                event="sheet_updated",
+                data=data,
+                event_id=f"{snapshot.sheet_id}:{snapshot.version}",
+            )
+    finally:
+        event_broker.unsubscribe(subscription)
+
+
+@lru_cache(maxsize=None)
+def _type_adapter(response_type: Any) -> TypeAdapter:
+    """TypeAdapter of a response type, built once per type."""
+    return TypeAdapter(response_type)
+
+
+def json_response(
+    response_type: Any, content: Any, exclude_none: bool = False
+) -> Response:
+    """
+    Serialize the content of a route as json. FastAPI serializes a returned
+    model after the route returns, outside of the serialization stage, so
+    routes serialize their models themselves.
+    Parameters
+    ----------
+    response_type : Any
+      The response_model of the route.
+    content : Any
+    exclude_none : bool
+      Leave out fields set to None.
+
+    Returns
+    -------
+    Response
+
+    """
+    with timed("serialization"):
+        body = _type_adapter(response_type).dump_json(
+            content, exclude_none=exclude_none
+        )
+    return Response(content=body, media_type="application/json")
+
+
+def _parse_funding_models(snapshot: SheetSnapshot) -> List[FundingModel]:
+    """Parse every row of the funding sheet into a FundingModel."""
+    handler = snapshot.get_handler(model=FundingModel)
+    return handler.get_parsed_sheet_model(model=FundingModel)
+
+
+def _serialize_project_names(snapshot: SheetSnapshot) -> bytes:
+    """Build the sorted list of project names as json bytes."""
+    funding_models: List[FundingModel] = snapshot.derive(
+        "funding_models", _parse_funding_models
+    )
+    project_names = set()
+    for funding_model in funding_models:
+        project_name = funding_model.project_name
+        subproject_name = funding_model.subproject
+        if project_name is not None and subproject_name is None:
+            project_names.add(project_name)
+        elif project_name is not None and subproject_name is not None:
+            project_names.add(f"{project_name} - {subproject_name}")
+    with timed("serialization"):
+        return TypeAdapter(List[str]).dump_json(sorted(project_names))
+
+
+def _index_funding(
+    snapshot: SheetSnapshot,
+) -> Dict[Tuple[Optional[str], Optional[str]], bytes]:
+    """
+    Group the funding models by the (project_name, subproject) query that
+    selects them and serialize each group as json bytes. A query with only
+    project_name matches every subproject of that project, a query with
+    only subproject matches rows without a project_name, and a query with
+    neither matches all rows.
+    """
+    funding_models: List[FundingModel] = snapshot.derive(
+        "funding_models", _parse_funding_models
+    )
+    groups: Dict[Tuple[Optional[str], Optional[str]], List[FundingModel]] = (
+        defaultdict(list)
+    )
+    for funding_model in funding_models:
+        project_name = funding_model.project_name
+        subproject_name = funding_model.subproject
+        groups[(None, None)].append(funding_model)
+        if project_name is not None:
+            groups[(project_name, None)].append(funding_model)
+        if subproject_name is not None:
+            groups[(project_name, subproject_name)].append(funding_model)
+    adapter = TypeAdapter(List[FundingModel])
+    with timed("serialization"):
+        return {key: adapter.dump_json(rows) for key, rows in groups.items()}
+
+
+def _parse_protocols_models(snapshot: SheetSnapshot) -> List[ProtocolsModel]:
+    """Parse every row of the protocols sheet into a ProtocolsModel."""
+    handler = snapshot.get_handler(model=ProtocolsModel)
+    return handler.get_parsed_sheet_model(model=ProtocolsModel)
+
+
+def _index_protocol_names(snapshot: SheetSnapshot) -> SearchIndex:
+    """Build a search index over protocol and procedure names."""
+    protocols_models: List[ProtocolsModel] = snapshot.derive(
+        "protocols_models", _parse_protocols_models
+    )
+    return SearchIndex(
+        documents=[
+            [m.protocol_name, m.procedure_name] for m in protocols_models
+        ]
+    )
 
 
 @router.get(
@@ -114,27 +644,10 @@ async def get_funding(
     Returns funding information for a project_name and subproject.
     """
 
-    sheet_id = settings.funding_id
-    raw_sheet = await get_smartsheet(
-        sheet_id=sheet_id,
-        user_agent=settings.user_agent,
-        max_connections=settings.max_connections,
-        access_token=settings.access_token.get_secret_value(),
-    )
-    handler = SheetHandler(sheet_fields=SheetFields.model_validate(raw_sheet))
-    funding_models: List[FundingModel] = handler.get_parsed_sheet_model(
-        model=FundingModel
-    )
-    filtered_rows = [
-        r
-        for r in funding_models
-        if (
-            r.project_name == project_name
-            and (subproject is None or r.subproject == subproject)
-        )
-        or (project_name is None and subproject is None)
-    ]
-    return filtered_rows
+    snapshot = await get_registered_snapshot(get_registered_sheet("funding"))
+    funding_index = snapshot.derive("funding_index", _index_funding)
+    content = funding_index.get((project_name, subproject), b"[]")
+    return Response(content=content, media_type="application/json")
 
 
 @router.get(
@@ -147,27 +660,9 @@ async def get_project_names():
     ## Project Names
     Returns a list of project names.
     """
-    sheet_id = settings.funding_id
-    raw_sheet = await get_smartsheet(
-        sheet_id=sheet_id,
-        user_agent=settings.user_agent,
-        max_connections=settings.max_connections,
-        access_token=settings.access_token.get_secret_value(),
-    )
-    handler = SheetHandler(sheet_fields=SheetFields.model_validate(raw_sheet))
-    funding_models: List[FundingModel] = handler.get_parsed_sheet_model(
-        model=FundingModel
-    )
-    project_names = set()
-    for funding_model in funding_models:
-        project_name = funding_model.project_name
-        subproject_name = funding_model.subproject
-        if project_name is not None and subproject_name is None:
-            project_names.add(project_name)
-        elif project_name is not None and subproject_name is not None:
-            project_names.add(f"{project_name} - {subproject_name}")
-    sorted_names = sorted(list(set(project_names)))
-    return sorted_names
+    snapshot = await get_registered_snapshot(get_registered_sheet("funding"))
+    content = snapshot.derive("project_names", _serialize_project_names)
+    return Response(content=content, media_type="application/json")
 
 
 @router.get(
@@ -176,49 +671,103 @@ async def get_project_names():
     operation_id="get_protocols",
 )
 async def get_protocols(
-    protocol_name: Optional[str] = Query(
+    protocol_name: Optional[List[str]] = Query(
         default=None,
+        description="Match any of these protocol names.",
         openapi_examples={
             "default": Example(
                 summary="A sample protocol name",
                 description="Example protocol name",
-                value=(
+                value=[
                     "Tetrahydrofuran and Dichloromethane Delipidation of a "
                     "Whole Mouse Brain"
-                ),
+                ],
             )
         },
-    )
+    ),
+    protocol_name_prefix: Optional[List[str]] = Query(
+        default=None,
+        description="Match protocol names starting with any of these.",
+    ),
+    protocol_type: Optional[List[str]] = Query(
+        default=None, description="Match any of these protocol types."
+    ),
+    procedure_name: Optional[List[str]] = Query(
+        default=None, description="Match any of these procedure names."
+    ),
+    modified_after: Optional[datetime] = Query(
+        default=None, description="Rows modified at or after this time."
+    ),
+    modified_before: Optional[datetime] = Query(
+        default=None, description="Rows modified before this time."
+    ),
 ):
     """
     ## Protocols
-    Returns protocols given a name.
+    Returns protocols given a name. Query parameters can be repeated to
+    match several values.
     """
-    sheet_id = settings.protocols_id
-    raw_sheet = await get_smartsheet(
-        sheet_id=sheet_id,
-        user_agent=settings.user_agent,
-        max_connections=settings.max_connections,
-        access_token=settings.access_token.get_secret_value(),
-    )
-    handler = SheetHandler(
-        sheet_fields=SheetFields.model_validate(raw_sheet),
-        row_filter=lambda row: default_row_filter(
-            row=row,
-            column_id=(
-                None
-                if protocol_name is None
-                else int(
-                    ProtocolsModel.model_fields[
-                        "protocol_name"
-                    ].validation_alias
-                )
-            ),
-            column_display_value=protocol_name,
+    snapshot = await get_registered_snapshot(get_registered_sheet("protocols"))
+    protocol_name_column = snapshot.column_id(ProtocolsModel, "protocol_name")
+    handler = snapshot.get_handler(
+        model=ProtocolsModel,
+        row_filter=RowFilter(
+            values={
+                protocol_name_column: protocol_name,
+                snapshot.column_id(
+                    ProtocolsModel, "protocol_type"
+                ): protocol_type,
+                snapshot.column_id(
+                    ProtocolsModel, "procedure_name"
+                ): procedure_name,
+            },
+            prefixes={protocol_name_column: protocol_name_prefix},
+            modified_after=modified_after,
+            modified_before=modified_before,
         ),
     )
     parsed_models = handler.get_parsed_sheet_model(model=ProtocolsModel)
-    return parsed_models
+    return json_response(List[ProtocolsModel], parsed_models)
+
+
+@router.get(
+    "/protocols/search",
+    response_model=List[ProtocolsModel],
+    operation_id="search_protocols",
+)
+async def search_protocols(
+    q: str = Query(
+        ...,
+        min_length=1,
+        description="Start or approximate spelling of a name.",
+        openapi_examples={
+            "default": Example(
+                summary="A partial protocol name",
+                description="Example partial protocol name",
+                value="whole mouse deli",
+            )
+        },
+    ),
+    limit: int = Query(
+        default=10, ge=1, le=100, description="Maximum number of matches."
+    ),
+):
+    """
+    ## Protocol Search
+    Returns the protocols whose protocol_name or procedure_name best match
+    the query, ranked from best to worst. Supports prefixes of each word and
+    misspelled names.
+    """
+    snapshot = await get_registered_snapshot(get_registered_sheet("protocols"))
+    protocols_models: List[ProtocolsModel] = snapshot.derive(
+        "protocols_models", _parse_protocols_models
+    )
+    search_index = snapshot.derive("protocols_search", _index_protocol_names)
+    matches = search_index.search(query=q, limit=limit)
+    return json_response(
+        List[ProtocolsModel],
+        [protocols_models[doc_id] for doc_id, _ in matches],
+    )
 
 
 @router.get(
@@ -227,44 +776,233 @@ async def get_protocols(
     operation_id="get_perfusions",
 )
 async def get_perfusions(
-    subject_id: Optional[str] = Query(
+    subject_id: Optional[List[str]] = Query(
         default=None,
+        description="Match any of these subject ids.",
         openapi_examples={
             "default": Example(
                 summary="A sample subject id",
                 description="Example subject id",
-                value="689418",
+                value=["689418"],
             )
         },
-    )
+    ),
+    subject_id_prefix: Optional[List[str]] = Query(
+        default=None,
+        description="Match subject ids starting with any of these.",
+    ),
+    experimenter: Optional[List[str]] = Query(
+        default=None, description="Match any of these experimenters."
+    ),
+    modified_after: Optional[datetime] = Query(
+        default=None, description="Rows modified at or after this time."
+    ),
+    modified_before: Optional[datetime] = Query(
+        default=None, description="Rows modified before this time."
+    ),
 ):
     """
     ## Perfusions
-    Returns perfusions for a given subject_id.
+    Returns perfusions for a given subject_id. Query parameters can be
+    repeated to match several values.
     """
-    sheet_id = settings.perfusions_id
-    raw_sheet = await get_smartsheet(
-        sheet_id=sheet_id,
-        user_agent=settings.user_agent,
-        max_connections=settings.max_connections,
-        access_token=settings.access_token.get_secret_value(),
+    snapshot = await get_registered_snapshot(
+        get_registered_sheet("perfusions")
     )
-    handler = SheetHandler(
-        sheet_fields=SheetFields.model_validate(raw_sheet),
-        row_filter=lambda row: default_row_filter(
-            row=row,
-            column_id=(
-                None
-                if subject_id is None
-                else int(
-                    PerfusionsModel.model_fields["subject_id"].validation_alias
-                )
-            ),
-            column_display_value=subject_id,
+    subject_id_column = snapshot.column_id(PerfusionsModel, "subject_id")
+    handler = snapshot.get_handler(
+        model=PerfusionsModel,
+        row_filter=RowFilter(
+            values={
+                subject_id_column: subject_id,
+                snapshot.column_id(
+                    PerfusionsModel, "experimenter"
+                ): experimenter,
+            },
+            prefixes={subject_id_column: subject_id_prefix},
+            modified_after=modified_after,
+            modified_before=modified_before,
         ),
     )
     parsed_models = handler.get_parsed_sheet_model(model=PerfusionsModel)
-    return parsed_models
+    return json_response(List[PerfusionsModel], parsed_models)
+
+
+@router.get(
+    "/changes/{sheet_name}",
+    response_model=SheetChanges,
+    operation_id="get_changes",
+)
+async def get_changes(
+    sheet_name: str = Path(..., description="Name of the sheet"),
+    since_version: Optional[int] = Query(
+        default=None, description="Sheet version the client last synced."
+    ),
+    since: Optional[datetime] = Query(
+        default=None, description="Time the client last synced."
+    ),
+):
+    """
+    ## Changes
+    Returns rows added, updated or deleted since a sheet version or a time.
+    Exactly one of since_version or since is required. Returns 410 if the
+    service no longer remembers the sheet as it was at that point, in which
+    case the client should fetch the full sheet again.
+    """
+    if (since_version is None) == (since is None):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Provide exactly one of since_version or since.",
+        )
+    since = as_utc(since)
+    sheet = get_registered_sheet(sheet_name)
+    snapshot = await get_registered_snapshot(sheet)
+    baseline = snapshot_store.get_baseline(
+        sheet_id=sheet.sheet_id, version=since_version, since=since
+    )
+    if baseline is None:
+        raise HTTPException(
+            status_code=status.HTTP_410_GONE,
+            detail="Changes are no longer available. Fetch the full sheet.",
+        )
+    changes = _build_changes(
+        snapshot=snapshot,
+        baseline=baseline,
+        sheet=sheet,
+        since_version=since_version,
+        since=since,
+    )
+    return json_response(SheetChanges, changes)
+
+
+@router.get(
+    "/events",
+    response_class=StreamingResponse,
+    responses={200: {"content": {"text/event-stream": {}}}},
+    operation_id="get_events",
+)
+async def get_events(
+    request: Request,
+    sheet: List[str] = Query(
+        ..., description="Sheets to receive updates for. Can be repeated."
+    ),
+    include_rows: bool = Query(
+        default=False,
+        description="Include the added, updated and deleted rows.",
+    ),
+):
+    """
+    ## Sheet Events
+    Server-Sent Events stream with a sheet_updated event whenever one of the
+    subscribed sheets has a new version. The data of each event is a
+    SheetUpdate json object. Keepalive comments are sent while idle.
+    """
+    sheet_names = {get_registered_sheet(name).sheet_id: name for name in sheet}
+    subscription = event_broker.subscribe(sheet_ids=sheet_names.keys())
+    return StreamingResponse(
+        sheet_event_stream(
+            request=request,
+            subscription=subscription,
+            sheet_names=sheet_names,
+            include_rows=include_rows,
+        ),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+def _serialize_registered_rows(
+    sheet: RegisteredSheet, snapshot: SheetSnapshot, rows: List[SheetRow]
+) -> bytes:
+    """Parse rows of a registered sheet straight into json bytes."""
+    parsed_rows = parse_registered_rows(
+        sheet=sheet, snapshot=snapshot, rows=rows
+    )
+    row_type = Dict[str, Any] if sheet.model is None else sheet.model
+    with timed("serialization"):
+        return TypeAdapter(List[row_type]).dump_json(parsed_rows)
+
+
+def _index_column_ids(
+    sheet: RegisteredSheet, snapshot: SheetSnapshot
+) -> Dict[str, int]:
+    """Column ID of each index column found in this version of the sheet."""
+    if sheet.model is not None:
+        return {
+            c: snapshot.column_id(sheet.model, c) for c in sheet.index_columns
+        }
+    titles = {c.title: c.id for c in snapshot.sheet_fields.columns}
+    return {c: titles[c] for c in sheet.index_columns if c in titles}
+
+
+@router.get(
+    "/sheets/{sheet_name}",
+    response_class=Response,
+    responses={200: {"content": {"application/json": {}}}},
+    operation_id="get_sheet",
+)
+async def get_sheet(
+    request: Request,
+    sheet_name: str = Path(..., description="Name of the sheet"),
+    modified_after: Optional[datetime] = Query(
+        default=None, description="Rows modified at or after this time."
+    ),
+    modified_before: Optional[datetime] = Query(
+        default=None, description="Rows modified before this time."
+    ),
+):
+    """
+    ## Sheet
+    Returns the rows of any served sheet. Rows can be filtered on the
+    sheet's index columns with query parameters named after the column, or
+    the column name followed by _prefix to match the start of a value.
+    Query parameters can be repeated to match several values.
+    """
+    sheet = get_registered_sheet(sheet_name)
+    values, prefixes = defaultdict(list), defaultdict(list)
+    for key, value in request.query_params.multi_items():
+        if key in ("modified_after", "modified_before"):
+            continue
+        column = key.removesuffix("_prefix")
+        if column not in sheet.index_columns:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=(
+                    f"Cannot filter {sheet_name} on {key}. Index columns "
+                    f"are: {', '.join(sheet.index_columns)}."
+                ),
+            )
+        (prefixes if key != column else values)[column].append(value)
+    snapshot = await get_registered_snapshot(sheet)
+    if not (values or prefixes or modified_after or modified_before):
+        content = snapshot.derive(
+            f"sheet:{sheet_name}",
+            lambda s: _serialize_registered_rows(
+                sheet=sheet, snapshot=s, rows=s.sheet_fields.rows
+            ),
+        )
+        return Response(content=content, media_type="application/json")
+    column_ids = snapshot.derive(
+        f"index_column_ids:{sheet_name}",
+        lambda s: _index_column_ids(sheet=sheet, snapshot=s),
+    )
+    if any(c not in column_ids for c in [*values, *prefixes]):
+        # The column is missing from this version of the sheet
+        return Response(content=b"[]", media_type="application/json")
+    handler = SheetHandler(
+        sheet_fields=snapshot.sheet_fields,
+        sheet_index=snapshot.index,
+        row_filter=RowFilter(
+            values={column_ids[c]: v for c, v in values.items()},
+            prefixes={column_ids[c]: v for c, v in prefixes.items()},
+            modified_after=modified_after,
+            modified_before=modified_before,
+        ),
+    )
+    content = _serialize_registered_rows(
+        sheet=sheet, snapshot=snapshot, rows=handler.get_matched_rows()
+    )
+    return Response(content=content, media_type="application/json")
 
 
 @router.get(
@@ -274,7 +1012,6 @@ async def get_perfusions(
     operation_id="get_exaspim_info",
 )
 async def get_exaspim_info(
-    request: Request,
     specimen_id: str = Query(
         ...,
         openapi_examples={
@@ -290,110 +1027,77 @@ async def get_exaspim_info(
     ## exaSPIM Information endpoint
     Returns exaSPIM info for a given specimen_id.
     """
-    # Limit number of requests
-    semaphore = request.app.state.semaphore
-    async with semaphore:
-        # Download sheets in parallel
-        tasks = [
-            get_smartsheet(
-                sheet_id=settings.mouse_tracker_id,
-                user_agent=settings.user_agent,
-                max_connections=settings.max_connections,
-                access_token=settings.access_token_2.get_secret_value(),
-            ),
-            get_smartsheet(
-                sheet_id=settings.sample_tracking_id,
-                user_agent=settings.user_agent,
-                max_connections=settings.max_connections,
-                access_token=settings.access_token_2.get_secret_value(),
-            ),
-            get_smartsheet(
-                sheet_id=settings.imaging_queue_id,
-                user_agent=settings.user_agent,
-                max_connections=settings.max_connections,
-                access_token=settings.access_token_2.get_secret_value(),
-            ),
-            get_smartsheet(
-                sheet_id=settings.exaspim_qc_sheet_id,
-                user_agent=settings.user_agent,
-                max_connections=settings.max_connections,
-                access_token=settings.access_token_2.get_secret_value(),
-            ),
-        ]
-        (
-            mouse_tracker_sheet,
-            sample_tracker_sheet,
-            imaging_queue_sheet,
-            qc_sheet,
-        ) = await gather(*tasks)
-        mouse_tracker_handler = SheetHandler(
-            sheet_fields=SheetFields.model_validate(mouse_tracker_sheet),
-            row_filter=lambda row: default_row_filter(
-                row=row,
-                column_id=(
-                    None
-                    if specimen_id is None
-                    else int(
-                        MouseTracker.model_fields["mouse_id"].validation_alias
-                    )
-                ),
-                column_display_value=specimen_id,
-            ),
-        )
-        sample_tracker_handler = SheetHandler(
-            sheet_fields=SheetFields.model_validate(sample_tracker_sheet),
-            row_filter=lambda row: default_row_filter(
-                row=row,
-                column_id=(
-                    None
-                    if specimen_id is None
-                    else int(
-                        SampleTracking.model_fields["sample"].validation_alias
-                    )
-                ),
-                column_display_value=specimen_id,
-            ),
-        )
-        imaging_queue_handler = SheetHandler(
-            sheet_fields=SheetFields.model_validate(imaging_queue_sheet),
-            row_filter=lambda row: default_row_filter(
-                row=row,
-                column_id=(
-                    None
-                    if specimen_id is None
-                    else int(
-                        ImagingQueue.model_fields["sample"].validation_alias
-                    )
-                ),
-                column_display_value=specimen_id,
-            ),
-        )
-        qc_handler = SheetHandler(
-            sheet_fields=SheetFields.model_validate(qc_sheet),
-            row_filter=lambda row: default_row_filter(
-                row=row,
-                column_id=(
-                    None
-                    if specimen_id is None
-                    else int(QcSheet.model_fields["sample"].validation_alias)
-                ),
-                column_display_value=specimen_id,
-            ),
-        )
-        mouse_tracker_info = mouse_tracker_handler.get_parsed_sheet_model(
+    # Sheets that are not cached are downloaded in parallel
+    tasks = [
+        get_registered_snapshot(get_registered_sheet("mouse_tracker")),
+        get_registered_snapshot(get_registered_sheet("sample_tracking")),
+        get_registered_snapshot(get_registered_sheet("imaging_queue")),
+        get_registered_snapshot(get_registered_sheet("exaspim_qc_sheet")),
+    ]
+    (
+        mouse_tracker_sheet,
+        sample_tracker_sheet,
+        imaging_queue_sheet,
+        qc_sheet,
+    ) = await gather(*tasks)
+    mouse_tracker_handler = mouse_tracker_sheet.get_handler(
+        model=MouseTracker,
+        row_filter=RowFilter(
+            values={
+                mouse_tracker_sheet.column_id(MouseTracker, "mouse_id"): [
+                    specimen_id
+                ]
+            }
+        ),
+    )
+    sample_tracker_handler = sample_tracker_sheet.get_handler(
+        model=SampleTracking,
+        row_filter=RowFilter(
+            values={
+                sample_tracker_sheet.column_id(SampleTracking, "sample"): [
+                    specimen_id
+                ]
+            }
+        ),
+    )
+    imaging_queue_handler = imaging_queue_sheet.get_handler(
+        model=ImagingQueue,
+        row_filter=RowFilter(
+            values={
+                imaging_queue_sheet.column_id(ImagingQueue, "sample"): [
+                    specimen_id
+                ]
+            }
+        ),
+    )
+    qc_handler = qc_sheet.get_handler(
+        model=QcSheet,
+        row_filter=RowFilter(
+            values={qc_sheet.column_id(QcSheet, "sample"): [specimen_id]}
+        ),
+    )
+    mouse_tracker_info = (
+        await mouse_tracker_handler.get_parsed_sheet_model_chunked(
             model=MouseTracker
         )
-        sample_tracking_info = sample_tracker_handler.get_parsed_sheet_model(
+    )
+    sample_tracking_info = (
+        await sample_tracker_handler.get_parsed_sheet_model_chunked(
             model=SampleTracking
         )
-        imaging_queue_info = imaging_queue_handler.get_parsed_sheet_model(
+    )
+    imaging_queue_info = (
+        await imaging_queue_handler.get_parsed_sheet_model_chunked(
             model=ImagingQueue
         )
-        qc_sheet_info = qc_handler.get_parsed_sheet_model(model=QcSheet)
-        bundled_info = ExaSPIMInfo(
-            mouse_tracker_info=mouse_tracker_info,
-            sample_tracking_info=sample_tracking_info,
-            imaging_queue_info=imaging_queue_info,
-            qc_sheet_info=qc_sheet_info,
-        )
-    return bundled_info
+    )
+    qc_sheet_info = await qc_handler.get_parsed_sheet_model_chunked(
+        model=QcSheet
+    )
+    bundled_info = ExaSPIMInfo(
+        mouse_tracker_info=mouse_tracker_info,
+        sample_tracking_info=sample_tracking_info,
+        imaging_queue_info=imaging_queue_info,
+        qc_sheet_info=qc_sheet_info,
+    )
+    return json_response(ExaSPIMInfo, bundled_info, exclude_none=True)
@@ -0,0 +1,228 @@
+"""Module to schedule downloads of sheets from Smartsheet"""
+
+import asyncio
+from collections import deque
+from collections.abc import Awaitable, Callable
+from functools import partial
+from time import perf_counter
+from typing import Deque, Dict, Optional, Set, Tuple, TypeVar
+
+from aind_smartsheet_service_server.caching import token_fingerprint
+from aind_smartsheet_service_server.configs import settings
+from aind_smartsheet_service_server.metrics import FETCH_JOINS, observe_stage
+
+T = TypeVar("T")
+
+
+class FetchQueueFull(Exception):
+    """Raised when too many downloads are waiting for room on a token"""
+
+
+class WeightedSemaphore:
+    """A semaphore where each holder takes a number of units of capacity.
+    Waiters are served in order, so a heavy waiter is not starved by light
+    ones arriving after it."""
+
+    def __init__(self, capacity: int):
+        """
+        Class constructor
+        Parameters
+        ----------
+        capacity : int
+          Units that can be held at once.
+        """
+        self.capacity = capacity
+        self.available = capacity
+        self._waiters: Deque[Tuple[int, asyncio.Future]] = deque()
+
+    @property
+    def waiting(self) -> int:
+        """Number of waiters."""
+        return len(self._waiters)
+
+    def _wake_waiters(self) -> None:
+        """Grant capacity to the first waiters that fit."""
+        while self._waiters:
+            weight, future = self._waiters[0]
+            if future.done():
+                # Cancelled, it leaves once its task handles the cancellation
+                self._waiters.popleft()
+            elif weight <= self.available:
+                self._waiters.popleft()
+                self.available -= weight
+                future.set_result(None)
+            else:
+                break
+
+    async def acquire(self, weight: int) -> None:
+        """
+        Wait until weight units are available and take them.
+        Parameters
+        ----------
+        weight : int
+          Capped at the capacity so that every weight can be acquired.
+        """
+        weight = min(weight, self.capacity)
+        if not self._waiters and weight <= self.available:
+            self.available -= weight
+            return
+        future = asyncio.get_running_loop().create_future()
+        waiter = (weight, future)
+        self._waiters.append(waiter)
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # Capacity was granted just before the waiter was cancelled
+                self.release(weight)
+            else:
+                if waiter in self._waiters:
+                    self._waiters.remove(waiter)
+                # Waiters behind it may fit now
+                self._wake_waiters()
+            raise
+
+    def release(self, weight: int) -> None:
+        """Return weight units taken by acquire."""
+        self.available += min(weight, self.capacity)
+        self._wake_waiters()
+
+
+class FetchScheduler:
+    """
+    Runs downloads of sheets, limiting how many run at once with the same
+    token. A request for a sheet already being downloaded with the same
+    token waits for that download instead of starting another, so each
+    sheet is downloaded at most once at a time per token. A download still
+    waiting for room is cancelled once no request is waiting for it. One
+    that started is left to finish, since the thread calling Smartsheet
+    cannot be stopped, and later requests can join it. Downloads are
+    weighted by the rows of the sheet when it was last downloaded, so a few
+    large sheets take the capacity of many small ones.
+    """
+
+    def __init__(
+        self,
+        capacity: int,
+        weight_rows: int,
+        queue_limit: Optional[int] = None,
+    ):
+        """
+        Class constructor
+        Parameters
+        ----------
+        capacity : int
+          Units of weight that can be downloading at once per token.
+        weight_rows : int
+          A download weighs one unit per this many rows, and at least one.
+        queue_limit : int | None
+          Downloads that can wait for room per token. Further downloads
+          raise FetchQueueFull. No limit if None.
+        """
+        self.capacity = capacity
+        self.weight_rows = weight_rows
+        self.queue_limit = queue_limit
+        self._limits: Dict[str, WeightedSemaphore] = {}
+        self._in_flight: Dict[Tuple[int, str], asyncio.Task] = {}
+        self._waiters: Dict[Tuple[int, str], int] = {}
+        self._started: Set[asyncio.Task] = set()
+        self._rows: Dict[int, int] = {}
+
+    def weight(self, sheet_id: int) -> int:
+        """Units of capacity a download of the sheet takes."""
+        rows = self._rows.get(sheet_id, 0)
+        return min(max(-(-rows // self.weight_rows), 1), self.capacity)
+
+    def record_rows(self, sheet_id: int, rows: int) -> None:
+        """Remember the rows of a downloaded sheet to weigh its next
+        download."""
+        self._rows[sheet_id] = rows
+
+    async def _run(
+        self,
+        sheet_id: int,
+        limit: WeightedSemaphore,
+        download: Callable[[], Awaitable[T]],
+    ) -> T:
+        """Wait for capacity on the token, then download."""
+        weight = self.weight(sheet_id)
+        start = perf_counter()
+        await limit.acquire(weight)
+        observe_stage("fetch_queue", perf_counter() - start)
+        task = asyncio.current_task()
+        self._started.add(task)
+        try:
+            return await download()
+        finally:
+            self._started.discard(task)
+            limit.release(weight)
+
+    async def fetch(
+        self,
+        sheet_id: int,
+        access_token: str,
+        download: Callable[[], Awaitable[T]],
+    ) -> T:
+        """
+        Download a sheet, or wait for the download already running for the
+        same sheet and token.
+        Parameters
+        ----------
+        sheet_id : int
+        access_token : str
+        download : Callable[[], Awaitable[T]]
+          Downloads the sheet.
+
+        Returns
+        -------
+        T
+          Result of download.
+
+        Raises
+        ------
+        FetchQueueFull
+          If a download has to start while queue_limit downloads are
+          already waiting for room on the token.
+
+        """
+        key = (sheet_id, token_fingerprint(access_token))
+        task = self._in_flight.get(key)
+        if task is None:
+            limit = self._limits.setdefault(
+                key[1], WeightedSemaphore(self.capacity)
+            )
+            if self.queue_limit is not None and (
+                limit.waiting >= self.queue_limit
+            ):
+                raise FetchQueueFull(
+                    f"{limit.waiting} downloads are waiting to start."
+                )
+            task = asyncio.create_task(self._run(sheet_id, limit, download))
+            self._in_flight[key] = task
+            task.add_done_callback(partial(self._forget, key))
+        else:
+            FETCH_JOINS.labels(sheet_id=str(sheet_id)).inc()
+        self._waiters[key] = self._waiters.get(key, 0) + 1
+        try:
+            # The download is shared, so it is only cancelled once every
+            # request waiting for it is cancelled
+            return await asyncio.shield(task)
+        finally:
+            self._waiters[key] -= 1
+            if not self._waiters[key]:
+                del self._waiters[key]
+                if not task.done() and task not in self._started:
+                    task.cancel()
+                    self._forget(key, task)
+
+    def _forget(self, key: Tuple[int, str], task: asyncio.Task) -> None:
+        """Stop sharing a download that is done or cancelled."""
+        if self._in_flight.get(key) is task:
+            del self._in_flight[key]
+
+
+fetch_scheduler = FetchScheduler(
+    capacity=settings.app_concurrency_limit,
+    weight_rows=settings.fetch_weight_rows,
+    queue_limit=settings.fetch_queue_limit,
+)
@@ -0,0 +1,170 @@
+"""Module for prefix and fuzzy text search over sheet values"""
+
+import re
+from collections import Counter, defaultdict
+from heapq import nlargest
+from typing import Dict, List, Optional, Set, Tuple
+
+_TOKEN_PATTERN = re.compile(r"\w+")
+
+
+def normalize_text(text: str) -> str:
+    """Lower case text and collapse whitespace for matching."""
+    return " ".join(text.casefold().split())
+
+
+def trigrams(text: str) -> Set[str]:
+    """
+    Get the set of 3 character substrings of normalized text. The text is
+    padded so that short words still produce trigrams.
+    Parameters
+    ----------
+    text : str
+
+    Returns
+    -------
+    Set[str]
+
+    """
+    padded = f"  {normalize_text(text)} "
+    return {"".join(c) for c in zip(padded, padded[1:], padded[2:])}
+
+
+class PrefixTrie:
+    """Character trie over words. Each node keeps the ids of every document
+    with a word below it, so a prefix lookup is a walk down the trie."""
+
+    def __init__(self):
+        """Class constructor"""
+        self._root: Dict[str, dict] = {}
+        self._ids_key = ""
+
+    def insert(self, word: str, doc_id: int) -> None:
+        """Add a word for a document."""
+        node = self._root
+        for char in word:
+            node = node.setdefault(char, {})
+            node.setdefault(self._ids_key, set()).add(doc_id)
+
+    def lookup(self, prefix: str) -> Set[int]:
+        """Get the ids of documents with a word starting with prefix."""
+        node = self._root
+        for char in prefix:
+            node = node.get(char)
+            if node is None:
+                return set()
+        return node.get(self._ids_key, set())
+
+
+class SearchIndex:
+    """
+    Ranks documents against a query. Each document is a list of text
+    fields. Matches are ranked as exact field matches first, then fields
+    starting with the query, then fields with words starting with every
+    query word, then by trigram similarity for misspelled queries.
+    """
+
+    def __init__(
+        self, documents: List[List[Optional[str]]], min_similarity=0.3
+    ):
+        """
+        Class constructor
+        Parameters
+        ----------
+        documents : List[List[str | None]]
+          Text fields of each document. The position of a document in the
+          list is its id.
+        min_similarity : float
+          Trigram similarity below which fuzzy matches are dropped.
+        """
+        self.min_similarity = min_similarity
+        self._fields: List[List[str]] = []
+        self._field_docs: List[int] = []
+        self._field_sizes: List[int] = []
+        self._trie = PrefixTrie()
+        self._postings: Dict[str, List[int]] = defaultdict(list)
+        for doc_id, fields in enumerate(documents):
+            normalized = [normalize_text(f) for f in fields if f]
+            self._fields.append(normalized)
+            for field in normalized:
+                for word in _TOKEN_PATTERN.findall(field):
+                    self._trie.insert(word, doc_id)
+                field_id = len(self._field_docs)
+                field_trigrams = trigrams(field)
+                self._field_docs.append(doc_id)
+                self._field_sizes.append(len(field_trigrams))
+                for trigram in field_trigrams:
+                    self._postings[trigram].append(field_id)
+
+    def _prefix_matches(self, words: List[str]) -> Set[int]:
+        """Documents with words starting with every query word."""
+        matches: Optional[Set[int]] = None
+        for word in words:
+            word_matches = self._trie.lookup(word)
+            matches = (
+                word_matches if matches is None else matches & word_matches
+            )
+        return matches or set()
+
+    def _similarities(self, query: str) -> Dict[int, float]:
+        """Best trigram similarity of any field of each document sharing a
+        trigram with the query."""
+        query_trigrams = trigrams(query)
+        shared = Counter(
+            field_id
+            for trigram in query_trigrams
+            for field_id in self._postings.get(trigram, ())
+        )
+        similarities: Dict[int, float] = defaultdict(float)
+        for field_id, count in shared.items():
+            similarity = count / (
+                len(query_trigrams) + self._field_sizes[field_id] - count
+            )
+            doc_id = self._field_docs[field_id]
+            similarities[doc_id] = max(similarities[doc_id], similarity)
+        return similarities
+
+    def _tier(self, doc_id: int, query: str, prefix: bool) -> float:
+        """Rank of the kind of match. Higher is a better match."""
+        fields = self._fields[doc_id]
+        if query in fields:
+            return 3.0
+        if any(f.startswith(query) for f in fields):
+            return 2.0
+        return 1.0 if prefix else 0.0
+
+    def search(self, query: str, limit: int = 10) -> List[Tuple[int, float]]:
+        """
+        Get the best matching documents for a query.
+        Parameters
+        ----------
+        query : str
+        limit : int
+          Maximum number of documents to return.
+
+        Returns
+        -------
+        List[Tuple[int, float]]
+          Pairs of document id and score, best match first.
+
+        """
+        query = normalize_text(query)
+        words = _TOKEN_PATTERN.findall(query)
+        if not words:
+            return []
+        prefix_matches = self._prefix_matches(words)
+        similarities = self._similarities(query)
+        candidates = prefix_matches | {
+            doc_id
+            for doc_id, similarity in similarities.items()
+            if similarity >= self.min_similarity
+        }
+        scored = (
+            (
+                doc_id,
+                self._tier(doc_id, query, doc_id in prefix_matches)
+                + similarities.get(doc_id, 0.0),
+            )
+            for doc_id in candidates
+        )
+        return nlargest(limit, scored, key=lambda s: (s[1], -s[0]))
@@ -0,0 +1,207 @@
+"""Module to share downloaded sheets between worker processes through files"""
+
+import asyncio
+import json
+import os
+import tempfile
+from pathlib import Path
+from time import perf_counter
+from typing import BinaryIO, Dict, Optional, Tuple
+
+from fastapi import HTTPException, status
+
+from aind_smartsheet_service_server.caching import token_fingerprint
+from aind_smartsheet_service_server.configs import settings
+from aind_smartsheet_service_server.metrics import (
+    SHEET_REQUESTS,
+    observe_stage,
+    sheet_downloaded,
+    timed,
+)
+from aind_smartsheet_service_server.parsing import validate_sheet
+from aind_smartsheet_service_server.snapshot import (
+    SheetSnapshot,
+    snapshot_store,
+)
+
+
+class SharedSheets:
+    """
+    Directory of sheets written by a single publisher process and read by
+    every worker. A sheet is written to a temporary file that is renamed
+    over the previous one, so a published file is never modified and a
+    reader sees either the old or the new sheet in full. Workers only read
+    and validate a sheet when a new file was published. Otherwise a request
+    costs a stat of the file. Like the snapshots, loaded files are tracked
+    per sheet_id, whichever token they were published with.
+    """
+
+    def __init__(self, directory: Path):
+        """
+        Class constructor
+        Parameters
+        ----------
+        directory : Path
+        """
+        self.directory = directory
+        # Token fingerprint, inode and mtime of the file each snapshot was
+        # loaded from, and the version of the snapshot
+        self._loaded: Dict[int, Tuple[Tuple[str, int, int], int]] = {}
+        self._locks: Dict[int, asyncio.Lock] = {}
+
+    def path(self, sheet_id: int, access_token: str) -> Path:
+        """File of a sheet downloaded with access_token."""
+        return self.directory / (
+            f"{sheet_id}-{token_fingerprint(access_token)}.json"
+        )
+
+    def publish(
+        self, sheet_id: int, access_token: str, raw_sheet: dict
+    ) -> None:
+        """
+        Atomically replace the published file of a sheet.
+        Parameters
+        ----------
+        sheet_id : int
+        access_token : str
+        raw_sheet : dict
+          Sheet as returned by get_smartsheet.
+        """
+        self.directory.mkdir(parents=True, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(json.dumps(raw_sheet, separators=(",", ":")).encode())
+            # Readable by workers running as another user
+            os.chmod(tmp_path, 0o644)
+            os.replace(tmp_path, self.path(sheet_id, access_token))
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+    @staticmethod
+    def _publication(
+        access_token: str, stat: os.stat_result
+    ) -> Tuple[str, int, int]:
+        """Identifies the file a sheet was published to."""
+        return (token_fingerprint(access_token), stat.st_ino, stat.st_mtime_ns)
+
+    @staticmethod
+    def _read_sheet(f: BinaryIO) -> dict:
+        """Read and decode a published file."""
+        return json.loads(f.read())
+
+    def is_loaded(self, sheet_id: int, access_token: str) -> bool:
+        """
+        Whether the published file of a sheet is the one its latest snapshot
+        was loaded from, even if the snapshot was since dropped to stay
+        within the memory budget.
+        Parameters
+        ----------
+        sheet_id : int
+        access_token : str
+
+        Returns
+        -------
+        bool
+
+        """
+        try:
+            stat = os.stat(self.path(sheet_id, access_token))
+        except FileNotFoundError:
+            return False
+        loaded = self._loaded.get(sheet_id)
+        return loaded is not None and loaded[0] == self._publication(
+            access_token, stat
+        )
+
+    async def get_snapshot(
+        self, sheet_id: int, access_token: str
+    ) -> SheetSnapshot:
+        """
+        Get the snapshot of the published sheet, loading the file if it was
+        published since it was last loaded.
+        Parameters
+        ----------
+        sheet_id : int
+        access_token : str
+
+        Returns
+        -------
+        SheetSnapshot
+
+        Raises
+        ------
+        HTTPException
+          503 if the sheet has not been published yet.
+
+        """
+        start = perf_counter()
+        async with self._locks.setdefault(sheet_id, asyncio.Lock()):
+            try:
+                f = open(self.path(sheet_id, access_token), "rb")
+            except FileNotFoundError:
+                raise HTTPException(
+                    status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                    detail=f"Sheet {sheet_id} has not been published yet.",
+                    headers={"Retry-After": str(settings.retry_after_seconds)},
+                )
+            with f:
+                # The open file keeps its content even if it is replaced
+                publication = self._publication(
+                    access_token, os.fstat(f.fileno())
+                )
+                snapshot = snapshot_store.get_current(sheet_id)
+                if snapshot is not None and self._loaded.get(sheet_id) == (
+                    publication,
+                    snapshot.version,
+                ):
+                    snapshot_store.touch(sheet_id)
+                    observe_stage("cache_lookup", perf_counter() - start)
+                    SHEET_REQUESTS.labels(
+                        sheet_id=str(sheet_id), cache="hit"
+                    ).inc()
+                    return snapshot
+                sheet_downloaded.set(True)
+                SHEET_REQUESTS.labels(
+                    sheet_id=str(sheet_id), cache="miss"
+                ).inc()
+                with timed("validation"):
+                    # Decoding holds the GIL, but reading the file does not
+                    raw_sheet = await asyncio.to_thread(self._read_sheet, f)
+                    sheet_fields = await validate_sheet(raw_sheet)
+                del raw_sheet
+            self._loaded[sheet_id] = (publication, sheet_fields.version)
+            return snapshot_store.add_snapshot(
+                sheet_id=sheet_id, sheet_fields=sheet_fields
+            )
+
+
+shared_sheets: Optional[SharedSheets] = (
+    None
+    if settings.shared_sheets_dir is None
+    else SharedSheets(settings.shared_sheets_dir)
+)
+
+
+def reject_reload() -> None:
+    """
+    Reject a request to download a sheet again if the sheets are read from
+    shared_sheets_dir. Workers never download the sheets then, and the
+    publisher picks up a new version at its next check.
+
+    Raises
+    ------
+    HTTPException
+      409 if shared sheets are enabled.
+
+    """
+    if shared_sheets is not None:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=(
+                "Sheets are downloaded by the publisher of "
+                f"{shared_sheets.directory}. They are reloaded when it next "
+                "checks their versions."
+            ),
+        )
@@ -0,0 +1,372 @@
+"""Module to hold validated sheets and data derived from them per version"""
+
+from collections import OrderedDict, deque
+from collections.abc import Callable
+from datetime import datetime
+from typing import Any, Deque, Dict, List, Optional, Tuple, TypeVar
+
+from pydantic import BaseModel
+
+from aind_smartsheet_service_server.configs import settings
+from aind_smartsheet_service_server.handler import (
+    ColumnMapping,
+    RowFilter,
+    SheetHandler,
+    SheetIndex,
+)
+from aind_smartsheet_service_server.metrics import (
+    SNAPSHOT_BYTES,
+    SNAPSHOT_EVICTIONS,
+)
+from aind_smartsheet_service_server.models import SheetFields
+
+D = TypeVar("D")
+
+# Approximate memory of a validated cell, including its values, and of the
+# rest of a validated row. Measured with benchmarks.memory_benchmark.
+CELL_BYTES = 640
+ROW_BYTES = 1250
+
+
+def estimate_sheet_bytes(sheet_fields: SheetFields) -> int:
+    """Approximate memory held by a validated sheet."""
+    cells = sum(len(row.cells) for row in sheet_fields.rows)
+    return cells * CELL_BYTES + len(sheet_fields.rows) * ROW_BYTES
+
+
+class RowVersions:
+    """The id and modifiedAt of every row in one version of a sheet. Kept
+    after a snapshot is replaced so changes can be computed."""
+
+    def __init__(self, sheet_fields: SheetFields):
+        """Class constructor"""
+        self.version = sheet_fields.version
+        self.modified_at = sheet_fields.modifiedAt
+        self.rows: Dict[int, datetime] = {
+            row.id: row.modifiedAt for row in sheet_fields.rows
+        }
+
+
+class SheetSnapshot:
+    """A validated sheet for a single version along with any aggregates
+    that have been derived from it."""
+
+    def __init__(self, sheet_id: int, sheet_fields: SheetFields):
+        """Class constructor"""
+        self.sheet_id = sheet_id
+        self.sheet_fields = sheet_fields
+        self.version = sheet_fields.version
+        self.size_bytes = estimate_sheet_bytes(sheet_fields)
+        self._derived: Dict[str, Any] = {}
+
+    def derive(self, name: str, compute: Callable[["SheetSnapshot"], D]) -> D:
+        """
+        Return the aggregate stored under name, computing it the first time
+        it is requested for this version.
+        Parameters
+        ----------
+        name : str
+          Unique name of the aggregate, e.g. "project_names".
+        compute : Callable[[SheetSnapshot], D]
+          Builds the aggregate from this snapshot.
+
+        Returns
+        -------
+        D
+
+        """
+        if name not in self._derived:
+            self._derived[name] = compute(self)
+        return self._derived[name]
+
+    @property
+    def index(self) -> SheetIndex:
+        """Column indexes over the rows of this version."""
+        return self.derive("index", lambda s: SheetIndex(s.sheet_fields))
+
+    def column_mapping(self, model: type[BaseModel]) -> ColumnMapping:
+        """
+        Mapping of the fields of model to the columns of this version,
+        resolved once per version with the configured column_mapping_mode.
+        Parameters
+        ----------
+        model : type[BaseModel]
+
+        Returns
+        -------
+        ColumnMapping
+
+        """
+        return self.derive(
+            f"column_mapping:{model.__module__}.{model.__qualname__}",
+            lambda s: ColumnMapping(
+                model=model,
+                columns=s.sheet_fields.columns,
+                mode=settings.column_mapping_mode,
+            ),
+        )
+
+    def column_id(self, model: type[BaseModel], field_name: str) -> int:
+        """Column ID of this version that a model field is read from."""
+        return self.column_mapping(model).column_id(field_name)
+
+    def get_handler(
+        self,
+        model: type[BaseModel],
+        row_filter: Optional[RowFilter] = None,
+    ) -> SheetHandler:
+        """
+        Build a SheetHandler over this version that maps rows for model and
+        selects filtered rows from the index.
+        Parameters
+        ----------
+        model : type[BaseModel]
+        row_filter : RowFilter | None
+          Keep every row if None.
+
+        Returns
+        -------
+        SheetHandler
+
+        """
+        return SheetHandler(
+            sheet_fields=self.sheet_fields,
+            row_filter=row_filter or RowFilter(),
+            row_mapper=self.column_mapping(model).row_map,
+            sheet_index=self.index,
+        )
+
+    def changes_since(
+        self, baseline: RowVersions, since: Optional[datetime] = None
+    ) -> Tuple[List[int], List[int], List[int]]:
+        """
+        Compare the rows of this version with an earlier version.
+        Parameters
+        ----------
+        baseline : RowVersions
+          Rows of the earlier version. Rows missing from this version were
+          deleted.
+        since : datetime | None
+          If set, rows created after since are added and rows modified after
+          since are updated. Otherwise rows are compared with the baseline.
+
+        Returns
+        -------
+        Tuple[List[int], List[int], List[int]]
+          Positions of added rows, positions of updated rows and ids of
+          deleted rows.
+
+        """
+        added, updated = [], []
+        for position, row in enumerate(self.sheet_fields.rows):
+            if since is not None:
+                is_added = row.createdAt > since
+                is_updated = row.modifiedAt > since
+            else:
+                is_added = row.id not in baseline.rows
+                is_updated = baseline.rows.get(row.id) != row.modifiedAt
+            if is_added:
+                added.append(position)
+            elif is_updated:
+                updated.append(position)
+        current_ids = {row.id for row in self.sheet_fields.rows}
+        deleted = [i for i in baseline.rows if i not in current_ids]
+        return added, updated, deleted
+
+
+class SnapshotStore:
+    """Keeps the latest snapshot for each sheet_id. A snapshot is replaced
+    when a raw sheet with a different version is seen. The row ids and
+    modifiedAt of the last history_size versions are kept as well. If a
+    memory budget is set, the least recently used snapshots are dropped
+    once their estimated size exceeds it. The version of a dropped snapshot
+    is still reported by get_version."""
+
+    def __init__(
+        self, history_size: int = 10, memory_budget: Optional[int] = None
+    ):
+        """
+        Class constructor
+        Parameters
+        ----------
+        history_size : int
+        memory_budget : int | None
+          Bytes the snapshots may hold. No limit if None.
+        """
+        self.history_size = history_size
+        self.memory_budget = memory_budget
+        self._snapshots: "OrderedDict[int, SheetSnapshot]" = OrderedDict()
+        self._history: Dict[int, Deque[RowVersions]] = {}
+        self._versions: Dict[int, int] = {}
+        self._listeners: List[Callable[[SheetSnapshot, int], None]] = []
+
+    def add_listener(
+        self, listener: Callable[[SheetSnapshot, int], None]
+    ) -> None:
+        """
+        Register a callback run with the new snapshot and the previous
+        version whenever a sheet changes version.
+        Parameters
+        ----------
+        listener : Callable[[SheetSnapshot, int], None]
+        """
+        self._listeners.append(listener)
+
+    def get_snapshot(
+        self,
+        sheet_id: int,
+        raw_sheet: dict,
+        sheet_fields: Optional[SheetFields] = None,
+    ) -> SheetSnapshot:
+        """
+        Get the snapshot matching the version of raw_sheet. The raw sheet is
+        only validated into SheetFields when its version changes.
+        Parameters
+        ----------
+        sheet_id : int
+        raw_sheet : dict
+          Sheet as returned by get_smartsheet.
+        sheet_fields : SheetFields | None
+          raw_sheet already validated, if the caller validated it.
+
+        Returns
+        -------
+        SheetSnapshot
+
+        """
+        snapshot = self._snapshots.get(sheet_id)
+        if snapshot is None or snapshot.version != raw_sheet["version"]:
+            return self.add_snapshot(
+                sheet_id=sheet_id,
+                sheet_fields=sheet_fields
+                or SheetFields.model_validate(raw_sheet),
+            )
+        self.touch(sheet_id)
+        self._enforce_budget()
+        return snapshot
+
+    def add_snapshot(
+        self, sheet_id: int, sheet_fields: SheetFields
+    ) -> SheetSnapshot:
+        """
+        Make a validated sheet the latest snapshot of sheet_id, unless the
+        latest snapshot already has its version. Listeners are notified
+        when the version changes.
+        Parameters
+        ----------
+        sheet_id : int
+        sheet_fields : SheetFields
+
+        Returns
+        -------
+        SheetSnapshot
+
+        """
+        snapshot = self._snapshots.get(sheet_id)
+        if snapshot is None or snapshot.version != sheet_fields.version:
+            snapshot = SheetSnapshot(
+                sheet_id=sheet_id, sheet_fields=sheet_fields
+            )
+            self._snapshots[sheet_id] = snapshot
+            self._versions[sheet_id] = snapshot.version
+            SNAPSHOT_BYTES.labels(sheet_id=str(sheet_id)).set(
+                snapshot.size_bytes
+            )
+            history = self._history.setdefault(
+                sheet_id, deque(maxlen=self.history_size)
+            )
+            if not any(h.version == snapshot.version for h in history):
+                previous = history[-1] if history else None
+                history.append(RowVersions(snapshot.sheet_fields))
+                if previous is not None:
+                    for listener in self._listeners:
+                        listener(snapshot, previous.version)
+        self.touch(sheet_id)
+        self._enforce_budget()
+        return snapshot
+
+    def touch(self, sheet_id: int) -> None:
+        """Mark the snapshot of a sheet as the most recently used, so that
+        the memory budget drops it last."""
+        if sheet_id in self._snapshots:
+            self._snapshots.move_to_end(sheet_id)
+
+    @property
+    def size_bytes(self) -> int:
+        """Estimated memory of all snapshots."""
+        return sum(s.size_bytes for s in self._snapshots.values())
+
+    def _enforce_budget(self) -> None:
+        """Drop the least recently used snapshots until the others fit in
+        the budget. The most recently used snapshot is always kept."""
+        if self.memory_budget is None:
+            return
+        total = self.size_bytes
+        while total > self.memory_budget and len(self._snapshots) > 1:
+            sheet_id, snapshot = self._snapshots.popitem(last=False)
+            total -= snapshot.size_bytes
+            SNAPSHOT_BYTES.labels(sheet_id=str(sheet_id)).set(0)
+            SNAPSHOT_EVICTIONS.labels(sheet_id=str(sheet_id)).inc()
+
+    def is_current(self, sheet_id: int, raw_sheet: dict) -> bool:
+        """Whether the latest snapshot has the version of raw_sheet."""
+        snapshot = self._snapshots.get(sheet_id)
+        return (
+            snapshot is not None and snapshot.version == raw_sheet["version"]
+        )
+
+    def get_current(self, sheet_id: int) -> Optional[SheetSnapshot]:
+        """The latest snapshot of a sheet, if one has been loaded."""
+        return self._snapshots.get(sheet_id)
+
+    def get_version(self, sheet_id: int) -> Optional[int]:
+        """The version of the latest snapshot of a sheet, even if the
+        snapshot was dropped to stay within the memory budget."""
+        return self._versions.get(sheet_id)
+
+    def get_baseline(
+        self,
+        sheet_id: int,
+        version: Optional[int] = None,
+        since: Optional[datetime] = None,
+    ) -> Optional[RowVersions]:
+        """
+        Find the retained version to compare the current snapshot against.
+        Parameters
+        ----------
+        sheet_id : int
+        version : int | None
+          Return the rows of exactly this version.
+        since : datetime | None
+          Return the newest version last modified at or before since.
+
+        Returns
+        -------
+        RowVersions | None
+          None if no retained version matches.
+
+        """
+        for row_versions in reversed(self._history.get(sheet_id, ())):
+            if version is not None and row_versions.version == version:
+                return row_versions
+            if since is not None and row_versions.modified_at <= since:
+                return row_versions
+        return None
+
+    def clear(self) -> None:
+        """Remove all snapshots and history."""
+        for sheet_id in self._snapshots:
+            SNAPSHOT_BYTES.labels(sheet_id=str(sheet_id)).set(0)
+        self._snapshots.clear()
+        self._history.clear()
+        self._versions.clear()
+
+
+snapshot_store = SnapshotStore(
+    history_size=settings.changes_history_size,
+    memory_budget=(
+        None
+        if settings.snapshot_memory_budget_mb is None
+        else settings.snapshot_memory_budget_mb * 2**20
+    ),
+)
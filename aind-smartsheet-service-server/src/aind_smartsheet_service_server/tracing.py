@@ -0,0 +1,125 @@
+"""Module for optional OpenTelemetry tracing. Spans are only recorded once
+configure_tracing is called, which requires opentelemetry-api."""
+
+import logging
+from contextlib import nullcontext
+from typing import Any, ContextManager, Dict, Optional
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+try:
+    from opentelemetry import trace
+    from opentelemetry.propagate import extract
+except ImportError:  # pragma: no cover
+    trace = None
+
+# Returned by start_span while tracing is off. nullcontext can be reused.
+_NO_SPAN = nullcontext()
+_tracer: Optional["trace.Tracer"] = None
+
+
+def configure_tracing(tracer_provider: Optional[Any] = None) -> bool:
+    """
+    Start recording spans.
+    Parameters
+    ----------
+    tracer_provider : TracerProvider | None
+      Provider to record spans with. Defaults to the global provider, which
+      is set up by the OpenTelemetry SDK, e.g. with opentelemetry-instrument.
+
+    Returns
+    -------
+    bool
+      False if opentelemetry-api is not installed.
+
+    """
+    global _tracer
+    if trace is None:
+        logging.warning(
+            "Tracing is enabled but opentelemetry-api is not installed."
+        )
+        return False
+    _tracer = trace.get_tracer(__name__, tracer_provider=tracer_provider)
+    return True
+
+
+def disable_tracing() -> None:
+    """Stop recording spans."""
+    global _tracer
+    _tracer = None
+
+
+def start_span(
+    name: str,
+    attributes: Optional[Dict[str, Any]] = None,
+    client: bool = False,
+) -> ContextManager[Optional["trace.Span"]]:
+    """
+    Start a span as a child of the current span.
+    Parameters
+    ----------
+    name : str
+    attributes : Dict[str, Any] | None
+    client : bool
+      Whether the span is a call to another service.
+
+    Returns
+    -------
+    ContextManager[Span | None]
+      Yields the span, or None while tracing is off.
+
+    """
+    if _tracer is None:
+        return _NO_SPAN
+    return _tracer.start_as_current_span(
+        name,
+        attributes=attributes,
+        kind=trace.SpanKind.CLIENT if client else trace.SpanKind.INTERNAL,
+    )
+
+
+class TracingMiddleware:
+    """Records a server span for each request, continuing the trace of the
+    caller if the request has trace context headers"""
+
+    def __init__(self, app: ASGIApp):
+        """Class constructor"""
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        """Run the request inside a span named after its route."""
+        if scope["type"] != "http" or _tracer is None:
+            await self.app(scope, receive, send)
+            return
+        method = scope["method"]
+        carrier = {
+            k.decode("latin-1"): v.decode("latin-1")
+            for k, v in scope["headers"]
+        }
+        with _tracer.start_as_current_span(
+            method,
+            context=extract(carrier),
+            kind=trace.SpanKind.SERVER,
+            attributes={
+                "http.request.method": method,
+                "url.path": scope["path"],
+            },
+        ) as span:
+
+            async def send_with_status(message: Message) -> None:
+                """Record the status code of the response."""
+                if message["type"] == "http.response.start":
+                    span.set_attribute(
+                        "http.response.status_code", message["status"]
+                    )
+                    if message["status"] >= 500:
+                        span.set_status(trace.StatusCode.ERROR)
+                await send(message)
+
+            try:
+                await self.app(scope, receive, send_with_status)
+            finally:
+                route = getattr(scope.get("route"), "path", None)
+                if route is not None:
+                    span.update_name(f"{method} {route}")
+                    span.set_attribute("http.route", route)
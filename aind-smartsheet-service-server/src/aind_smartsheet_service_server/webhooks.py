@@ -0,0 +1,120 @@
+"""Module to receive Smartsheet webhook callbacks"""
+
+import hashlib
+import hmac
+import logging
+from typing import Optional
+
+from fastapi import (
+    APIRouter,
+    BackgroundTasks,
+    Header,
+    HTTPException,
+    Request,
+    Response,
+    status,
+)
+
+from aind_smartsheet_service_server.configs import settings
+from aind_smartsheet_service_server.models import (
+    WebhookCallback,
+    WebhookResponse,
+)
+from aind_smartsheet_service_server.refresh import reload_sheet
+from aind_smartsheet_service_server.registry import sheet_registry
+from aind_smartsheet_service_server.shared import reject_reload
+
+router = APIRouter()
+
+
+def sign_payload(body: bytes, shared_secret: str) -> str:
+    """Hex HMAC-SHA256 of a callback body, as sent by Smartsheet in the
+    Smartsheet-Hmac-SHA256 header."""
+    return hmac.new(
+        shared_secret.encode(), body, digestmod=hashlib.sha256
+    ).hexdigest()
+
+
+def verify_signature(body: bytes, signature: Optional[str]) -> None:
+    """
+    Check a callback was signed with the configured shared secret.
+    Parameters
+    ----------
+    body : bytes
+      Raw request body.
+    signature : str | None
+      Value of the Smartsheet-Hmac-SHA256 header.
+
+    Raises
+    ------
+    HTTPException
+      503 if no shared secret is configured and 401 if the signature is
+      missing or does not match.
+
+    """
+    if settings.webhook_shared_secret is None:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Webhooks are not configured.",
+        )
+    expected = sign_payload(
+        body, settings.webhook_shared_secret.get_secret_value()
+    )
+    if signature is None or not hmac.compare_digest(
+        expected, signature.lower()
+    ):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid webhook signature.",
+        )
+
+
+async def refresh_from_webhook(sheet_id: int, access_token: str) -> None:
+    """Reload a sheet after a webhook callback. Errors are logged because
+    Smartsheet has already been sent a response."""
+    try:
+        await reload_sheet(sheet_id=sheet_id, access_token=access_token)
+    except Exception as e:
+        logging.warning(f"Unable to refresh sheet {sheet_id}: {e}")
+
+
+@router.post(
+    "/webhooks/smartsheet",
+    response_model=WebhookResponse,
+    response_model_exclude_none=True,
+    include_in_schema=False,
+)
+async def receive_smartsheet_webhook(
+    request: Request,
+    response: Response,
+    background_tasks: BackgroundTasks,
+    smartsheet_hmac_sha256: Optional[str] = Header(default=None),
+):
+    """
+    ## Smartsheet Webhook
+    Callback url for Smartsheet webhooks. Verification challenges are echoed
+    back. When a watched sheet changes, its cached copies are evicted and it
+    is downloaded again after the response is sent. With shared sheets,
+    changes are rejected since only the publisher downloads the sheets.
+    """
+    body = await request.body()
+    verify_signature(body=body, signature=smartsheet_hmac_sha256)
+    callback = WebhookCallback.model_validate_json(body)
+    if callback.challenge is not None:
+        response.headers["Smartsheet-Hook-Response"] = callback.challenge
+        return WebhookResponse(smartsheetHookResponse=callback.challenge)
+    if callback.newWebhookStatus is not None:
+        logging.warning(
+            f"Webhook {callback.webhookId} is now "
+            f"{callback.newWebhookStatus}."
+        )
+        return WebhookResponse()
+    sheet = sheet_registry.get_by_id(callback.scopeObjectId)
+    if callback.events and sheet is not None:
+        reject_reload()
+        background_tasks.add_task(
+            refresh_from_webhook,
+            sheet_id=sheet.sheet_id,
+            access_token=sheet.access_token,
+        )
+    return WebhookResponse()
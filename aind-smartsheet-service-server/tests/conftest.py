@@ -4,14 +4,18 @@ import json
 import os
 from pathlib import Path
 from typing import Any, Generator
-from unittest.mock import patch
+from unittest.mock import AsyncMock, MagicMock, patch
 
 import pytest
 from fastapi.testclient import TestClient
+from fastapi_cache import FastAPICache
 from pydantic import RedisDsn
 
+from aind_smartsheet_service_server.backends import LRUMemoryBackend
+from aind_smartsheet_service_server.caching import sheet_error_cache
 from aind_smartsheet_service_server.configs import settings
 from aind_smartsheet_service_server.models import SheetFields
+from aind_smartsheet_service_server.snapshot import snapshot_store
 
 RESOURCES_DIR = Path(os.path.dirname(os.path.realpath(__file__))) / "resources"
 
@@ -20,60 +24,94 @@ patch(
 ).start()
 
 
+@pytest.fixture(autouse=True)
+def clear_snapshot_store() -> Generator[None, Any, None]:
+    """Start each test without any sheet snapshots or cached errors."""
+    snapshot_store.clear()
+    sheet_error_cache.clear()
+    yield
+    snapshot_store.clear()
+    sheet_error_cache.clear()
+
+
 @pytest.fixture()
-def mock_raw_funding_sheet() -> SheetFields:
+def mock_raw_funding_sheet() -> dict:
     """Raw funding sheet."""
     with open(RESOURCES_DIR / "funding.json") as f:
         contents = json.load(f)
-    return SheetFields.model_validate(contents)
+    return SheetFields.model_validate(contents).model_dump(
+        mode="json", exclude_none=True
+    )
 
 
 @pytest.fixture()
-def mock_raw_protocols_sheet() -> SheetFields:
+def mock_raw_protocols_sheet() -> dict:
     """Expected raw protocols sheet."""
     with open(RESOURCES_DIR / "protocols.json") as f:
         contents = json.load(f)
-    return SheetFields.model_validate(contents)
+    return SheetFields.model_validate(contents).model_dump(
+        mode="json", exclude_none=True
+    )
 
 
 @pytest.fixture()
-def mock_raw_perfusions_sheet() -> SheetFields:
+def mock_raw_perfusions_sheet() -> dict:
     """Expected raw protocols sheet."""
     with open(RESOURCES_DIR / "perfusions.json") as f:
         contents = json.load(f)
-    return SheetFields.model_validate(contents)
+    return SheetFields.model_validate(contents).model_dump(
+        mode="json", exclude_none=True
+    )
 
 
 @pytest.fixture()
-def mock_raw_mouse_tracking_sheet() -> SheetFields:
+def mock_raw_mouse_tracking_sheet() -> dict:
     """Raw mouse tracking sheet."""
     with open(RESOURCES_DIR / "mouse_tracker_example.json") as f:
         contents = json.load(f)
-    return SheetFields.model_validate(contents)
+    return SheetFields.model_validate(contents).model_dump(
+        mode="json", exclude_none=True
+    )
 
 
 @pytest.fixture()
-def mock_raw_imaging_queue_sheet() -> SheetFields:
+def mock_raw_imaging_queue_sheet() -> dict:
     """Expected raw imaging queue sheet."""
     with open(RESOURCES_DIR / "imq_sheet_example.json") as f:
         contents = json.load(f)
-    return SheetFields.model_validate(contents)
+    return SheetFields.model_validate(contents).model_dump(
+        mode="json", exclude_none=True
+    )
 
 
 @pytest.fixture()
-def mock_raw_qc_sheet() -> SheetFields:
+def mock_raw_qc_sheet() -> dict:
     """Expected raw qc sheet."""
     with open(RESOURCES_DIR / "qc_sheet_example.json") as f:
         contents = json.load(f)
-    return SheetFields.model_validate(contents)
+    return SheetFields.model_validate(contents).model_dump(
+        mode="json", exclude_none=True
+    )
 
 
 @pytest.fixture()
-def mock_raw_sample_tracking_sheet() -> SheetFields:
+def mock_raw_sample_tracking_sheet() -> dict:
     """Expected raw status tracking sheet."""
     with open(RESOURCES_DIR / "st_sheet_example.json") as f:
         contents = json.load(f)
-    return SheetFields.model_validate(contents)
+    return SheetFields.model_validate(contents).model_dump(
+        mode="json", exclude_none=True
+    )
+
+
+@pytest.fixture()
+def mock_raw_example_sheet() -> dict:
+    """Raw example sheet."""
+    with open(RESOURCES_DIR / "example_sheet.json") as f:
+        contents = json.load(f)
+    return SheetFields.model_validate(contents).model_dump(
+        mode="json", exclude_none=True
+    )
 
 
 @pytest.fixture(scope="session")
@@ -103,17 +141,20 @@ def client_with_redis() -> Generator[TestClient, Any, None]:
             "aind_smartsheet_service_server.main.settings",
             return_value=settings_with_redis,
         ),
+        patch("redis.asyncio.from_url", return_value=None),
+        patch("fastapi_cache.backends.redis.RedisBackend", return_value=None),
         patch(
-            "aind_smartsheet_service_server.main.from_url", return_value=None
-        ),
-        patch(
-            "aind_smartsheet_service_server.main.RedisBackend",
-            return_value=None,
+            "aind_smartsheet_service_server.main.LoopLagMonitor",
+            return_value=MagicMock(stop=AsyncMock()),
         ),
+        patch("aind_smartsheet_service_server.main.configure_tracing"),
         patch(
-            "aind_smartsheet_service_server.main.Semaphore",
-            return_value=None,
+            "aind_smartsheet_service_server.main.SheetRefresher",
+            return_value=MagicMock(run=AsyncMock()),
         ),
     ):
         with TestClient(app) as c:
             yield c
+    # Restore the lifespan state of the session client
+    FastAPICache.reset()
+    FastAPICache.init(LRUMemoryBackend(), prefix="fastapi-cache")
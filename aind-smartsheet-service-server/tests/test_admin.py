@@ -0,0 +1,186 @@
+"""Tests admin module"""
+
+from pathlib import Path
+from unittest.mock import AsyncMock, patch
+
+import pytest
+from fastapi_cache import FastAPICache
+from pydantic import SecretStr
+from starlette.testclient import TestClient
+
+from aind_smartsheet_service_server.backends import LRUMemoryBackend
+from aind_smartsheet_service_server.caching import sheet_cache_key
+from aind_smartsheet_service_server.configs import settings
+from aind_smartsheet_service_server.shared import SharedSheets
+from aind_smartsheet_service_server.snapshot import snapshot_store
+
+ADMIN_TOKEN = "admin-token"
+HEADERS = {"Authorization": f"Bearer {ADMIN_TOKEN}"}
+
+
+@pytest.fixture()
+def admin_token():
+    """Configure the admin token and start with an empty cache."""
+    FastAPICache.reset()
+    FastAPICache.init(LRUMemoryBackend(), prefix="fastapi-cache")
+    with patch.object(settings, "admin_token", SecretStr(ADMIN_TOKEN)):
+        yield
+    FastAPICache.reset()
+    FastAPICache.init(LRUMemoryBackend(), prefix="fastapi-cache")
+
+
+@pytest.mark.asyncio
+class TestAdmin:
+    """Test responses in admin module."""
+
+    @patch("aind_smartsheet_service_server.route.get_smartsheet")
+    async def test_list_cached_sheets(
+        self,
+        mock_get_sheet: AsyncMock,
+        client: TestClient,
+        admin_token,
+        mock_raw_funding_sheet: dict,
+    ):
+        """Tests cached sheets are listed with version, age and size"""
+        mock_get_sheet.return_value = mock_raw_funding_sheet
+        client.get("/project_names")
+        await FastAPICache.get_backend().set(
+            sheet_cache_key(100, "abcdef2"), b"0123456789", expire=590
+        )
+        response = client.get("/admin/sheets", headers=HEADERS)
+        assert 200 == response.status_code
+        sheets = {s["sheet_name"]: s for s in response.json()}
+        assert 7 == len(sheets)
+        # The in-memory backend counts whole seconds
+        assert sheets["funding"].pop("age_seconds") in (10, 11)
+        assert {
+            "sheet_name": "funding",
+            "sheet_id": 100,
+            "cached": True,
+            "version": 105,
+            "size_bytes": 10,
+        } == sheets["funding"]
+        assert {
+            "sheet_name": "protocols",
+            "sheet_id": 101,
+            "cached": False,
+            "version": None,
+            "age_seconds": None,
+            "size_bytes": None,
+        } == sheets["protocols"]
+
+    @patch("aind_smartsheet_service_server.route.get_smartsheet")
+    async def test_list_dropped_snapshot(
+        self,
+        mock_get_sheet: AsyncMock,
+        client: TestClient,
+        admin_token,
+        mock_raw_funding_sheet: dict,
+    ):
+        """Tests the version of a cached sheet is listed after the memory
+        budget dropped its snapshot"""
+        mock_get_sheet.return_value = mock_raw_funding_sheet
+        client.get("/project_names")
+        await FastAPICache.get_backend().set(
+            sheet_cache_key(100, "abcdef2"), b"{}", expire=600
+        )
+        with patch.object(snapshot_store, "memory_budget", 1):
+            snapshot_store.get_snapshot(
+                sheet_id=1, raw_sheet=mock_raw_funding_sheet
+            )
+        assert snapshot_store.get_current(100) is None
+        response = client.get("/admin/sheets", headers=HEADERS)
+        sheets = {s["sheet_name"]: s for s in response.json()}
+        assert 105 == sheets["funding"]["version"]
+
+    async def test_evict_cached_sheet(self, client: TestClient, admin_token):
+        """Tests a single sheet is evicted"""
+        backend = FastAPICache.get_backend()
+        await backend.set(sheet_cache_key(100, "abcdef2"), b"{}", expire=600)
+        await backend.set(sheet_cache_key(101, "abcdef2"), b"{}", expire=600)
+        response = client.post("/admin/sheets/100/evict", headers=HEADERS)
+        assert 200 == response.status_code
+        assert {"sheet_id": 100, "evicted": 1} == response.json()
+        assert await backend.get(sheet_cache_key(100, "abcdef2")) is None
+        assert b"{}" == await backend.get(sheet_cache_key(101, "abcdef2"))
+        response = client.post("/admin/sheets/1/evict", headers=HEADERS)
+        assert 404 == response.status_code
+
+    @patch("aind_smartsheet_service_server.route.get_smartsheet")
+    async def test_refresh_cached_sheet(
+        self,
+        mock_get_sheet: AsyncMock,
+        client: TestClient,
+        admin_token,
+        mock_raw_funding_sheet: dict,
+    ):
+        """Tests a single sheet is downloaded again"""
+        backend = FastAPICache.get_backend()
+        key = sheet_cache_key(100, "abcdef2")
+        await backend.set(key, b"stale", expire=600)
+
+        async def download(**_) -> dict:
+            """Cache the sheet like the cache decorator would."""
+            assert await backend.get(key) is None
+            await backend.set(key, b"fresh", expire=600)
+            return mock_raw_funding_sheet
+
+        mock_get_sheet.side_effect = download
+        response = client.post("/admin/sheets/100/refresh", headers=HEADERS)
+        assert 200 == response.status_code
+        assert response.json().pop("age_seconds") in (0, 1)
+        assert {
+            "sheet_name": "funding",
+            "sheet_id": 100,
+            "cached": True,
+            "version": 105,
+            "size_bytes": 5,
+        } == {k: v for k, v in response.json().items() if k != "age_seconds"}
+
+    @patch("aind_smartsheet_service_server.route.get_smartsheet")
+    async def test_refresh_shared_sheets(
+        self, mock_get_sheet: AsyncMock, client: TestClient, admin_token
+    ):
+        """Tests sheets are not downloaded again when shared"""
+        with patch(
+            "aind_smartsheet_service_server.shared.shared_sheets",
+            SharedSheets(Path("sheets")),
+        ):
+            response = client.post(
+                "/admin/sheets/100/refresh", headers=HEADERS
+            )
+        assert 409 == response.status_code
+        assert (
+            "Sheets are downloaded by the publisher of sheets. They are "
+            "reloaded when it next checks their versions."
+        ) == response.json()["detail"]
+        mock_get_sheet.assert_not_called()
+
+    async def test_profile(self, client: TestClient, admin_token):
+        """Tests the service is sampled and returned as folded stacks"""
+        response = client.post(
+            "/admin/profile?seconds=0.05&interval_ms=1", headers=HEADERS
+        )
+        assert 200 == response.status_code
+        assert response.headers["content-type"].startswith("text/plain")
+        assert "MainThread;" in response.text
+        with patch(
+            "aind_smartsheet_service_server.admin.profile",
+            side_effect=RuntimeError("A profile is already being recorded."),
+        ):
+            response = client.post("/admin/profile", headers=HEADERS)
+        assert 409 == response.status_code
+
+    async def test_unauthorized(self, client: TestClient, admin_token):
+        """Tests requests without the admin token are rejected"""
+        response = client.get("/admin/sheets")
+        assert 401 == response.status_code
+        response = client.get(
+            "/admin/sheets", headers={"Authorization": "Bearer wrong"}
+        )
+        assert 401 == response.status_code
+
+    async def test_not_configured(self, client: TestClient):
+        """Tests admin endpoints are disabled without an admin token"""
+        response = client.get("/admin/sheets", headers=HEADERS)
+        assert 503 == response.status_code
@@ -0,0 +1,249 @@
+"""Tests admission module"""
+
+import asyncio
+import json
+import unittest
+from typing import List
+from unittest.mock import AsyncMock, patch
+
+from prometheus_client import REGISTRY
+from starlette.types import Message, Receive, Scope, Send
+
+from aind_smartsheet_service_server.admission import (
+    AdmissionMiddleware,
+    request_timeout,
+)
+from aind_smartsheet_service_server.configs import settings
+
+
+def counted(name: str, reason: str) -> float:
+    """Current value of a counter by reason."""
+    return REGISTRY.get_sample_value(name, {"reason": reason}) or 0
+
+
+class Client:
+    """Sends one request through an ASGI app and keeps the response"""
+
+    def __init__(self, path: str = "/funding"):
+        """
+        Class constructor
+        Parameters
+        ----------
+        path : str
+        """
+        self.scope = {"type": "http", "method": "GET", "path": path}
+        self.sent: List[Message] = []
+        self.disconnect = asyncio.Event()
+
+    async def receive(self) -> Message:
+        """The request, then a disconnect once the client leaves."""
+        if not hasattr(self, "_requested"):
+            self._requested = True
+            return {"type": "http.request", "body": b"", "more_body": False}
+        await self.disconnect.wait()
+        return {"type": "http.disconnect"}
+
+    async def send(self, message: Message) -> None:
+        """Keep the message."""
+        self.sent.append(message)
+
+    @property
+    def status(self) -> int:
+        """Status code of the response."""
+        return self.sent[0]["status"]
+
+    @property
+    def headers(self) -> dict:
+        """Headers of the response."""
+        return {k.decode(): v.decode() for k, v in self.sent[0]["headers"]}
+
+    @property
+    def body(self) -> dict:
+        """Json body of the response."""
+        return json.loads(self.sent[1]["body"])
+
+    async def request(self, app: AdmissionMiddleware) -> None:
+        """Send the request through the app in its own task."""
+        await asyncio.create_task(app(self.scope, self.receive, self.send))
+
+
+async def ok_app(scope: Scope, receive: Receive, send: Send) -> None:
+    """App that reads the request and responds right away."""
+    await receive()
+    await send({"type": "http.response.start", "status": 200, "headers": []})
+    await send({"type": "http.response.body", "body": b"ok"})
+
+
+class SlowApp:
+    """App that waits until it is released or cancelled"""
+
+    def __init__(self):
+        """Class constructor"""
+        self.release = asyncio.Event()
+        self.started = asyncio.Event()
+        self.cancelled = False
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        """Respond once released."""
+        self.started.set()
+        try:
+            await self.release.wait()
+        except asyncio.CancelledError:
+            self.cancelled = True
+            raise
+        await ok_app(scope, receive, send)
+
+
+class TestRequestTimeout(unittest.TestCase):
+    """Test request_timeout method"""
+
+    def test_request_timeout(self):
+        """Tests the longest matching route timeout is used"""
+        timeouts = {"/sheets": 5.0, "/sheets/funding": 10.0}
+        with (
+            patch.object(settings, "request_timeout_seconds", 1.0),
+            patch.object(settings, "route_timeout_seconds", timeouts),
+        ):
+            self.assertEqual(1.0, request_timeout("/funding"))
+            self.assertEqual(1.0, request_timeout("/sheetsx"))
+            self.assertEqual(5.0, request_timeout("/sheets"))
+            self.assertEqual(5.0, request_timeout("/sheets/perfusions"))
+            self.assertEqual(10.0, request_timeout("/sheets/funding"))
+        self.assertIsNone(request_timeout("/funding"))
+
+
+class TestAdmissionMiddleware(unittest.IsolatedAsyncioTestCase):
+    """Test methods in AdmissionMiddleware class"""
+
+    async def test_request_served(self):
+        """Tests requests are passed through with their messages"""
+        middleware = AdmissionMiddleware(ok_app)
+        client = Client()
+        await client.request(middleware)
+        self.assertEqual(200, client.status)
+        self.assertEqual(0, middleware.pending)
+
+    async def test_unlimited_paths(self):
+        """Tests streams and other scopes are not limited"""
+        app = AsyncMock()
+        middleware = AdmissionMiddleware(app)
+        with patch.object(settings, "max_pending_requests", 0):
+            await Client(path="/events").request(middleware)
+            await middleware({"type": "lifespan"}, None, None)
+        self.assertEqual(2, app.await_count)
+
+    async def test_shed_pending_requests(self):
+        """Tests requests past max_pending_requests are rejected"""
+        app = SlowApp()
+        middleware = AdmissionMiddleware(app)
+        before = counted(
+            "smartsheet_service_shed_requests_total", "pending_requests"
+        )
+        with (
+            patch.object(settings, "max_pending_requests", 1),
+            patch.object(settings, "retry_after_seconds", 7),
+        ):
+            first = Client()
+            task = asyncio.create_task(first.request(middleware))
+            await app.started.wait()
+            second = Client()
+            await second.request(middleware)
+            self.assertEqual(503, second.status)
+            self.assertEqual("7", second.headers["retry-after"])
+            self.assertEqual(
+                {"detail": "1 requests are being served."}, second.body
+            )
+            app.release.set()
+            await task
+        self.assertEqual(200, first.status)
+        self.assertEqual(
+            before + 1,
+            counted(
+                "smartsheet_service_shed_requests_total", "pending_requests"
+            ),
+        )
+
+    async def test_timeout(self):
+        """Tests requests that run out of time are cancelled with a 504"""
+        app = SlowApp()
+        middleware = AdmissionMiddleware(app)
+        before = counted(
+            "smartsheet_service_cancelled_requests_total", "timeout"
+        )
+        with patch.object(settings, "request_timeout_seconds", 0.01):
+            client = Client()
+            await client.request(middleware)
+        self.assertTrue(app.cancelled)
+        self.assertEqual(504, client.status)
+        self.assertEqual({"detail": "Request timed out."}, client.body)
+        self.assertEqual(
+            before + 1,
+            counted("smartsheet_service_cancelled_requests_total", "timeout"),
+        )
+
+    async def test_timeout_after_response_started(self):
+        """Tests no second response is sent once one has started"""
+
+        async def stalled_app(scope: Scope, receive: Receive, send: Send):
+            """App that stalls in the middle of the response."""
+            await send(
+                {"type": "http.response.start", "status": 200, "headers": []}
+            )
+            await send(
+                {"type": "http.response.body", "body": b"", "more_body": True}
+            )
+            await asyncio.sleep(1)
+
+        middleware = AdmissionMiddleware(stalled_app)
+        with patch.object(settings, "request_timeout_seconds", 0.01):
+            client = Client()
+            await client.request(middleware)
+        self.assertEqual(2, len(client.sent))
+
+    async def test_disconnect(self):
+        """Tests requests are cancelled once the client disconnects"""
+        app = SlowApp()
+        middleware = AdmissionMiddleware(app)
+        before = counted(
+            "smartsheet_service_cancelled_requests_total", "disconnect"
+        )
+        client = Client()
+        task = asyncio.create_task(client.request(middleware))
+        await app.started.wait()
+        client.disconnect.set()
+        await task
+        self.assertTrue(app.cancelled)
+        self.assertEqual([], client.sent)
+        self.assertEqual(
+            before + 1,
+            counted(
+                "smartsheet_service_cancelled_requests_total", "disconnect"
+            ),
+        )
+
+    async def test_disconnect_after_response(self):
+        """Tests a disconnect after the response does not cancel"""
+
+        async def app(scope: Scope, receive: Receive, send: Send):
+            """App that waits for the disconnect after responding."""
+            await ok_app(scope, receive, send)
+            client.disconnect.set()
+            self.assertEqual("http.disconnect", (await receive())["type"])
+
+        client = Client()
+        await client.request(AdmissionMiddleware(app))
+        self.assertEqual(200, client.status)
+
+    async def test_other_timeout_errors(self):
+        """Tests timeouts raised by the app are not taken as the deadline"""
+
+        async def app(scope: Scope, receive: Receive, send: Send):
+            """App that times out on its own."""
+            raise TimeoutError("upstream")
+
+        with self.assertRaises(TimeoutError):
+            await Client().request(AdmissionMiddleware(app))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,100 @@
+"""Tests backends module"""
+
+import unittest
+from unittest.mock import patch
+
+from prometheus_client import REGISTRY
+
+from aind_smartsheet_service_server.backends import LRUMemoryBackend
+
+
+def evictions(reason: str) -> float:
+    """Current count of evictions for a reason."""
+    return (
+        REGISTRY.get_sample_value(
+            "smartsheet_service_cache_evictions_total", {"reason": reason}
+        )
+        or 0
+    )
+
+
+class TestLRUMemoryBackend(unittest.IsolatedAsyncioTestCase):
+    """Test methods in LRUMemoryBackend class"""
+
+    async def test_set_and_get(self):
+        """Tests values are stored with their ttl and size"""
+        backend = LRUMemoryBackend(max_bytes=100)
+        await backend.set("a", b"12345", expire=60)
+        await backend.set("b", b"1")
+        self.assertEqual(b"12345", await backend.get("a"))
+        self.assertEqual((60, b"12345"), await backend.get_with_ttl("a"))
+        self.assertEqual((-1, b"1"), await backend.get_with_ttl("b"))
+        self.assertEqual((0, None), await backend.get_with_ttl("c"))
+        self.assertEqual(8, backend.size_bytes)
+        self.assertEqual(
+            8, REGISTRY.get_sample_value("smartsheet_service_cache_size_bytes")
+        )
+        # Replacing a value updates the size
+        await backend.set("a", b"1")
+        self.assertEqual(4, backend.size_bytes)
+
+    async def test_evicts_least_recently_used(self):
+        """Tests least recently used entries are dropped past max_bytes"""
+        backend = LRUMemoryBackend(max_bytes=30)
+        before = evictions("size")
+        await backend.set("a", b"0123456789")
+        await backend.set("b", b"0123456789")
+        # Reading a makes b the least recently used
+        await backend.get("a")
+        await backend.set("c", b"0123456789")
+        self.assertIsNone(await backend.get("b"))
+        self.assertIsNotNone(await backend.get("a"))
+        self.assertIsNotNone(await backend.get("c"))
+        self.assertEqual(22, backend.size_bytes)
+        self.assertEqual(before + 1, evictions("size"))
+
+    async def test_value_too_large(self):
+        """Tests a value larger than max_bytes is not stored"""
+        backend = LRUMemoryBackend(max_bytes=5)
+        before = evictions("size")
+        await backend.set("a", b"0123456789")
+        self.assertIsNone(await backend.get("a"))
+        self.assertEqual(0, backend.size_bytes)
+        self.assertEqual(before + 1, evictions("size"))
+
+    async def test_peek(self):
+        """Tests peek does not mark an entry as used"""
+        backend = LRUMemoryBackend(max_bytes=30)
+        await backend.set("a", b"0123456789")
+        await backend.set("b", b"0123456789")
+        self.assertEqual((-1, b"0123456789"), backend.peek("a"))
+        await backend.set("c", b"0123456789")
+        self.assertEqual((0, None), backend.peek("a"))
+
+    async def test_expired(self):
+        """Tests expired entries are dropped when looked up"""
+        backend = LRUMemoryBackend(max_bytes=100)
+        before = evictions("expired")
+        with patch(
+            "aind_smartsheet_service_server.backends.monotonic",
+            side_effect=[0, 10],
+        ):
+            await backend.set("a", b"1", expire=5)
+            self.assertIsNone(await backend.get("a"))
+        self.assertEqual(0, backend.size_bytes)
+        self.assertEqual(before + 1, evictions("expired"))
+
+    async def test_clear(self):
+        """Tests keys are cleared by key or namespace"""
+        backend = LRUMemoryBackend(max_bytes=100)
+        await backend.set("ns:a", b"1")
+        await backend.set("ns:b", b"1")
+        await backend.set("other", b"1")
+        self.assertEqual(1, await backend.clear(key="other"))
+        self.assertEqual(0, await backend.clear(key="missing"))
+        self.assertEqual(2, await backend.clear(namespace="ns:"))
+        self.assertEqual(0, backend.size_bytes)
+
+
+if __name__ == "__main__":
+    unittest.main()
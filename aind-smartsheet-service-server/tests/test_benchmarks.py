@@ -0,0 +1,189 @@
+"""Tests the sheet generator, benchmarks and load test helpers run against
+the current models"""
+
+import json
+import unittest
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from unittest.mock import MagicMock, patch
+
+from fastapi.testclient import TestClient
+
+from aind_smartsheet_service_server.handler import SheetHandler
+from aind_smartsheet_service_server.models import SheetFields
+from aind_smartsheet_service_server.registry import sheet_registry
+from benchmarks.fake_smartsheet import (
+    FakeSmartsheet,
+    FakeSmartsheetConfig,
+    generate_sheets,
+)
+from benchmarks.handler_benchmark import main
+from benchmarks.load_test import default_mix, parse_mix, summarize
+from benchmarks.memory_benchmark import main as memory_main
+from benchmarks.sheet_generator import generate_registered_sheet
+from benchmarks.startup_benchmark import (
+    DEFAULT_BUDGET_SECONDS,
+    StartupResult,
+)
+from benchmarks.startup_benchmark import main as startup_main
+
+
+class TestBenchmarks(unittest.TestCase):
+    """Test generated sheets parse into each model"""
+
+    def test_generate_sheets(self):
+        """Tests every registered model can be parsed from generated rows"""
+        for sheet in sheet_registry:
+            raw_sheet = generate_registered_sheet(sheet, rows=20, columns=150)
+            sheet_fields = SheetFields.model_validate(raw_sheet)
+            self.assertEqual(150, len(sheet_fields.columns))
+            handler = SheetHandler(sheet_fields=sheet_fields)
+            parsed = handler.get_parsed_sheet_model(model=sheet.model)
+            self.assertEqual(20, len(parsed))
+
+    def test_handler_benchmark(self):
+        """Tests the benchmark runs and compares with a baseline"""
+        with TemporaryDirectory() as directory:
+            output = str(Path(directory) / "results.json")
+            args = ["--sheets", "funding", "--rows", "20", "--repeat", "1"]
+            with patch("builtins.print"):
+                self.assertEqual(0, main([*args, "--output", output]))
+                with open(output) as f:
+                    results = json.load(f)
+                self.assertEqual(7, len(results))
+                for result in results:
+                    result["seconds"] = 0
+                with open(output, "w") as f:
+                    json.dump(results, f)
+                self.assertEqual(1, main([*args, "--baseline", output]))
+
+    def test_memory_benchmark(self):
+        """Tests the memory benchmark measures each representation"""
+        with TemporaryDirectory() as directory:
+            output = str(Path(directory) / "results.json")
+            args = ["--sheets", "funding", "--rows", "20", "--output", output]
+            with patch("builtins.print"):
+                self.assertEqual(0, memory_main(args))
+            with open(output) as f:
+                results = json.load(f)
+        self.assertEqual(
+            ["cached", "decoded", "snapshot", "parsed", "response"],
+            [r["representation"] for r in results],
+        )
+        self.assertEqual(
+            ["sheet", "load", "sheet", "request", "request"],
+            [r["scope"] for r in results],
+        )
+        self.assertGreater(results[2]["estimated_mib"], 0)
+
+    def test_startup_benchmark(self):
+        """Tests startup is timed without importing deferred packages and
+        compared with a budget"""
+        with TemporaryDirectory() as directory:
+            output = str(Path(directory) / "results.json")
+            args = ["--runs", "1", "--top", "3", "--output", output]
+            with patch("builtins.print") as mock_print:
+                self.assertEqual(1, startup_main([*args, "--budget", "0"]))
+            with open(output) as f:
+                results = json.load(f)
+        self.assertEqual(1, len(results))
+        self.assertGreater(results[0]["ready_seconds"], 0)
+        self.assertEqual([], results[0]["deferred_packages_loaded"])
+        # Header, run, package header, 3 packages, median and budget
+        self.assertEqual(8, mock_print.call_count)
+
+    @patch("benchmarks.startup_benchmark.slowest_packages", return_value={})
+    @patch("benchmarks.startup_benchmark.measure_startup")
+    def test_startup_benchmark_default_budget(
+        self, mock_measure: MagicMock, _: MagicMock
+    ):
+        """Tests startup slower than the default budget fails the benchmark"""
+
+        def startup(ready_seconds: float):
+            """Startup result of a run taking ready_seconds"""
+            return lambda run: StartupResult(
+                run=run,
+                import_seconds=ready_seconds / 2,
+                ready_seconds=ready_seconds,
+                deferred_packages_loaded=[],
+            )
+
+        mock_measure.side_effect = startup(DEFAULT_BUDGET_SECONDS + 0.5)
+        with patch("builtins.print") as mock_print:
+            self.assertEqual(1, startup_main(["--runs", "3"]))
+        mock_print.assert_called_with(
+            f"Startup is over the budget of {DEFAULT_BUDGET_SECONDS:.3f} "
+            "seconds"
+        )
+        mock_measure.side_effect = startup(DEFAULT_BUDGET_SECONDS - 0.5)
+        with patch("builtins.print"):
+            self.assertEqual(0, startup_main(["--runs", "3"]))
+
+
+class TestLoadTest(unittest.TestCase):
+    """Test the fake Smartsheet API and load test helpers"""
+
+    @classmethod
+    def setUpClass(cls):
+        """Generate small sheets once"""
+        cls.sheets = generate_sheets(rows=20, columns=50)
+
+    def test_fake_smartsheet(self):
+        """Tests sheets, versions and errors are served and counted"""
+        fake = FakeSmartsheet(sheets=self.sheets)
+        sheet_id = fake.sheet_ids[0]
+        with TestClient(fake.app) as client:
+            sheet = client.get(f"/2.0/sheets/{sheet_id}")
+            version = client.get(f"/2.0/sheets/{sheet_id}/version")
+            missing = client.get("/2.0/sheets/0/version")
+            fake.config = FakeSmartsheetConfig(rate_limit_rate=1)
+            limited = client.get(f"/2.0/sheets/{sheet_id}")
+            fake.config = FakeSmartsheetConfig(error_rate=1)
+            failed = client.get(f"/2.0/sheets/{sheet_id}/version")
+        self.assertEqual(self.sheets[sheet_id], sheet.json())
+        self.assertEqual({"version": 1}, version.json())
+        self.assertEqual(1006, missing.json()["errorCode"])
+        self.assertEqual(4003, limited.json()["errorCode"])
+        self.assertEqual(4004, failed.json()["errorCode"])
+        self.assertEqual(
+            {
+                ("sheet", 200): 1,
+                ("version", 200): 1,
+                ("version", 404): 1,
+                ("sheet", 429): 1,
+                ("version", 500): 1,
+            },
+            dict(fake.calls),
+        )
+
+    def test_default_mix(self):
+        """Tests the default mix filters on values in the sheets"""
+        mix = default_mix(self.sheets)
+        self.assertEqual(7, len(mix))
+        self.assertIn("/project_names", mix)
+        self.assertTrue(
+            any(p.startswith("/get_exaspim_info?specimen_id=") for p in mix)
+        )
+
+    def test_parse_mix(self):
+        """Tests PATH=WEIGHT arguments are parsed"""
+        self.assertEqual(
+            {"/funding?project_name=a": 3, "/project_names": 1},
+            parse_mix(["/funding?project_name=a=3", "/project_names=1"]),
+        )
+
+    def test_summarize(self):
+        """Tests percentiles, errors and throughput of a scenario"""
+        results = [(i / 1000, 200) for i in range(1, 101)] + [(0.2, 500)]
+        result = summarize("fast", results, 2.0, {"sheet 200": 1})
+        self.assertEqual(101, result.requests)
+        self.assertEqual(1, result.errors)
+        self.assertEqual(50.5, result.throughput)
+        self.assertAlmostEqual(51, result.p50_ms)
+        self.assertLess(result.p90_ms, result.p99_ms)
+        single = summarize("fast", [(0.01, 200)], 1.0, {})
+        self.assertEqual(10, single.p99_ms)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,220 @@
+"""Tests caching module"""
+
+import unittest
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from fastapi_cache import FastAPICache
+
+from aind_smartsheet_service_server.backends import LRUMemoryBackend
+from aind_smartsheet_service_server.caching import (
+    SheetErrorCache,
+    evict_sheet,
+    get_cached_sheet_entry,
+    get_cached_sheet_ttl,
+    get_cached_sheet_version,
+    set_cached_sheet_version,
+    sheet_cache_key,
+    sheet_error_cache,
+    sheet_key_builder,
+    sheet_version_key,
+    token_fingerprint,
+)
+from aind_smartsheet_service_server.route import get_smartsheet
+
+
+class TestCaching(unittest.IsolatedAsyncioTestCase):
+    """Test methods in caching module"""
+
+    def setUp(self):
+        """Use a fresh in-memory cache for each test."""
+        FastAPICache.reset()
+        FastAPICache.init(LRUMemoryBackend(), prefix="fastapi-cache")
+
+    def test_token_fingerprint(self):
+        """Tests token is hashed into a short stable string"""
+        fingerprint = token_fingerprint("abc")
+        self.assertEqual(16, len(fingerprint))
+        self.assertEqual(fingerprint, token_fingerprint("abc"))
+        self.assertNotIn("abc", token_fingerprint("abcdef"))
+
+    def test_sheet_key_builder(self):
+        """Tests key builder matches sheet_cache_key for args and kwargs"""
+        expected = sheet_cache_key(sheet_id=1, access_token="abc")
+        self.assertEqual(
+            f"fastapi-cache:smartsheet:1:{token_fingerprint('abc')}",
+            expected,
+        )
+        self.assertEqual(
+            expected,
+            sheet_key_builder(
+                get_smartsheet,
+                "fastapi-cache:smartsheet",
+                args=(1, "user", 4),
+                kwargs={"access_token": "abc"},
+            ),
+        )
+        self.assertEqual(
+            expected,
+            sheet_key_builder(
+                get_smartsheet,
+                "fastapi-cache:smartsheet",
+                kwargs={
+                    "sheet_id": 1,
+                    "user_agent": "user",
+                    "max_connections": 4,
+                    "access_token": "abc",
+                },
+            ),
+        )
+
+    async def test_evict_sheet(self):
+        """Tests only the entries of the requested sheet are removed"""
+        backend = FastAPICache.get_backend()
+        await backend.set(sheet_cache_key(1, "abc"), b"1", expire=60)
+        await backend.set(sheet_cache_key(2, "abc"), b"2", expire=60)
+        count = await evict_sheet(sheet_id=1, access_tokens=["abc", "def"])
+        self.assertEqual(1, count)
+        self.assertIsNone(await backend.get(sheet_cache_key(1, "abc")))
+        self.assertEqual(b"2", await backend.get(sheet_cache_key(2, "abc")))
+
+    async def test_get_cached_sheet_entry(self):
+        """Tests ttl and size of a cached sheet are read without decoding"""
+        backend = FastAPICache.get_backend()
+        await backend.set(sheet_cache_key(1, "abc"), b"12345", expire=60)
+        self.assertEqual(
+            (60, 5),
+            await get_cached_sheet_entry(sheet_id=1, access_token="abc"),
+        )
+        self.assertIsNone(
+            await get_cached_sheet_entry(sheet_id=2, access_token="abc")
+        )
+
+    async def test_evict_sheet_error(self):
+        """Tests evicting a sheet forgets its cached error"""
+        sheet_error_cache.add(1, "abc", 404, "Not Found", ttl_seconds=60)
+        await evict_sheet(sheet_id=1, access_tokens=["abc"])
+        self.assertIsNone(sheet_error_cache.get(1, "abc"))
+
+    def test_sheet_error_cache(self):
+        """Tests errors are kept by sheet and token until they expire"""
+        cache = SheetErrorCache()
+        with patch(
+            "aind_smartsheet_service_server.caching.monotonic",
+            side_effect=[0, 0, 0, 5, 10],
+        ):
+            cache.add(1, "abc", 403, "Forbidden", ttl_seconds=10)
+            cache.add(2, "abc", 404, "Not Found", ttl_seconds=10)
+            self.assertEqual((403, "Forbidden"), cache.get(1, "abc"))
+            self.assertIsNone(cache.get(1, "other"))
+            self.assertEqual((404, "Not Found"), cache.get(2, "abc"))
+            self.assertIsNone(cache.get(2, "abc"))
+        cache.discard(1, "abc")
+        self.assertIsNone(cache.get(1, "abc"))
+        cache.add(1, "abc", 403, "Forbidden", ttl_seconds=10)
+        cache.clear()
+        self.assertIsNone(cache.get(1, "abc"))
+
+    async def test_get_cached_sheet_entry_peeks(self):
+        """Tests looking up a sheet does not mark it as recently used"""
+        backend = LRUMemoryBackend(
+            max_bytes=2 * (len(sheet_cache_key(1, "abc")) + 1)
+        )
+        await backend.set(sheet_cache_key(1, "abc"), b"1")
+        await backend.set(sheet_cache_key(2, "abc"), b"1")
+        with patch.object(FastAPICache, "get_backend", return_value=backend):
+            self.assertEqual(
+                (-1, 1),
+                await get_cached_sheet_entry(sheet_id=1, access_token="abc"),
+            )
+        await backend.set(sheet_cache_key(3, "abc"), b"1")
+        self.assertEqual((0, None), backend.peek(sheet_cache_key(1, "abc")))
+        self.assertEqual((-1, b"1"), backend.peek(sheet_cache_key(2, "abc")))
+
+    async def test_get_cached_sheet_entry_redis(self):
+        """Tests a missing key in redis, which reports a ttl of -2"""
+        backend = MagicMock(get_with_ttl=AsyncMock(return_value=(-2, None)))
+        with patch.object(FastAPICache, "get_backend", return_value=backend):
+            self.assertIsNone(
+                await get_cached_sheet_entry(sheet_id=1, access_token="abc")
+            )
+
+    async def test_cached_sheet_version(self):
+        """Tests the version of a cached copy is stored next to it and
+        expires with it"""
+        backend = FastAPICache.get_backend()
+        await set_cached_sheet_version(1, "abc", version=5)
+        self.assertIsNone(await get_cached_sheet_version(1, "abc"))
+        await backend.set(sheet_cache_key(1, "abc"), b"{}", expire=60)
+        self.assertIsNone(await get_cached_sheet_version(1, "abc"))
+        await set_cached_sheet_version(1, "abc", version=5)
+        self.assertEqual(5, await get_cached_sheet_version(1, "abc"))
+        self.assertEqual(60, backend.peek(sheet_version_key(1, "abc"))[0])
+        self.assertIsNone(await get_cached_sheet_version(1, "other"))
+        # A copy downloaded again right away stores its own version
+        await set_cached_sheet_version(1, "abc", version=None)
+        self.assertIsNone(await get_cached_sheet_version(1, "abc"))
+        await set_cached_sheet_version(1, "abc", version=6)
+        self.assertEqual(6, await get_cached_sheet_version(1, "abc"))
+        # The version is not read once the copy is gone
+        await backend.clear(key=sheet_cache_key(1, "abc"))
+        self.assertIsNone(await get_cached_sheet_version(1, "abc"))
+
+    async def test_cached_sheet_version_never_expires(self):
+        """Tests the version of a copy that never expires never expires"""
+        backend = FastAPICache.get_backend()
+        await backend.set(sheet_cache_key(1, "abc"), b"{}")
+        await set_cached_sheet_version(1, "abc", version=5)
+        self.assertEqual(-1, backend.peek(sheet_version_key(1, "abc"))[0])
+
+    async def test_evict_sheet_versions(self):
+        """Tests evicting a sheet removes the version of its cached copy"""
+        backend = FastAPICache.get_backend()
+        await backend.set(sheet_cache_key(1, "abc"), b"{}", expire=60)
+        await set_cached_sheet_version(1, "abc", version=5)
+        self.assertEqual(
+            1, await evict_sheet(sheet_id=1, access_tokens=["abc"])
+        )
+        self.assertEqual((0, None), backend.peek(sheet_version_key(1, "abc")))
+
+    async def test_get_cached_sheet_ttl(self):
+        """Tests the ttl of a cached sheet is read without its value"""
+        backend = FastAPICache.get_backend()
+        await backend.set(sheet_cache_key(1, "abc"), b"12345", expire=60)
+        self.assertEqual(
+            60, await get_cached_sheet_ttl(sheet_id=1, access_token="abc")
+        )
+        self.assertIsNone(
+            await get_cached_sheet_ttl(sheet_id=2, access_token="abc")
+        )
+
+    async def test_get_cached_sheet_ttl_redis(self):
+        """Tests redis is only asked for the ttl, which is -2 if missing"""
+        backend = MagicMock(
+            redis=MagicMock(ttl=AsyncMock(side_effect=[30, -2]))
+        )
+        with patch.object(FastAPICache, "get_backend", return_value=backend):
+            self.assertEqual(
+                30, await get_cached_sheet_ttl(sheet_id=1, access_token="abc")
+            )
+            self.assertIsNone(
+                await get_cached_sheet_ttl(sheet_id=1, access_token="abc")
+            )
+        backend.get_with_ttl.assert_not_called()
+
+    async def test_get_cached_sheet_ttl_other_backend(self):
+        """Tests other backends are asked for the entry with its ttl"""
+        backend = MagicMock(
+            spec=["get_with_ttl"],
+            get_with_ttl=AsyncMock(side_effect=[(30, b"1"), (0, None)]),
+        )
+        with patch.object(FastAPICache, "get_backend", return_value=backend):
+            self.assertEqual(
+                30, await get_cached_sheet_ttl(sheet_id=1, access_token="abc")
+            )
+            self.assertIsNone(
+                await get_cached_sheet_ttl(sheet_id=1, access_token="abc")
+            )
+
+
+if __name__ == "__main__":
+    unittest.main()
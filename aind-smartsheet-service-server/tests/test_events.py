@@ -0,0 +1,85 @@
+"""Tests events module"""
+
+import json
+import os
+import unittest
+from pathlib import Path
+
+from aind_smartsheet_service_server.events import (
+    SheetEventBroker,
+    Subscription,
+    format_sse,
+)
+from aind_smartsheet_service_server.snapshot import SnapshotStore
+
+RESOURCES_DIR = Path(os.path.dirname(os.path.realpath(__file__))) / "resources"
+
+
+class TestEvents(unittest.IsolatedAsyncioTestCase):
+    """Test methods in SheetEventBroker and Subscription classes"""
+
+    @classmethod
+    def setUpClass(cls) -> None:
+        """Set up class with loaded json."""
+
+        with open(RESOURCES_DIR / "example_sheet.json", "r") as f:
+            cls.example_sheet = json.load(f)
+
+    def _store_with_broker(self, broker: SheetEventBroker) -> SnapshotStore:
+        """Snapshot store that publishes to broker."""
+        store = SnapshotStore()
+        store.add_listener(broker.publish)
+        store.get_snapshot(sheet_id=1, raw_sheet=self.example_sheet)
+        return store
+
+    async def test_publish(self):
+        """Tests version changes reach only matching subscriptions"""
+        broker = SheetEventBroker()
+        store = self._store_with_broker(broker)
+        subscription1 = broker.subscribe(sheet_ids=[1])
+        subscription2 = broker.subscribe(sheet_ids=[2])
+        store.get_snapshot(
+            sheet_id=1, raw_sheet=dict(self.example_sheet, version=41)
+        )
+        event = await subscription1.get(timeout=1)
+        self.assertEqual(41, event.snapshot.version)
+        self.assertEqual(40, event.previous_version)
+        self.assertIsNone(await subscription2.get(timeout=0.01))
+
+        broker.unsubscribe(subscription1)
+        store.get_snapshot(
+            sheet_id=1, raw_sheet=dict(self.example_sheet, version=42)
+        )
+        self.assertTrue(subscription1.queue.empty())
+
+    async def test_publish_queue_full(self):
+        """Tests events are dropped for a full subscriber queue"""
+        broker = SheetEventBroker()
+        store = self._store_with_broker(broker)
+        subscription = broker.subscribe(sheet_ids=[1])
+        subscription.queue = Subscription(sheet_ids=[1], maxsize=1).queue
+        with self.assertLogs(level="WARNING") as captured:
+            store.get_snapshot(
+                sheet_id=1, raw_sheet=dict(self.example_sheet, version=41)
+            )
+            store.get_snapshot(
+                sheet_id=1, raw_sheet=dict(self.example_sheet, version=42)
+            )
+        self.assertIn("Dropped event for sheet 1", captured.output[0])
+        event = await subscription.get(timeout=1)
+        self.assertEqual(41, event.snapshot.version)
+
+    def test_format_sse(self):
+        """Tests Server-Sent Events wire format"""
+        self.assertEqual(
+            "event: sheet_updated\ndata: {}\n\n",
+            format_sse(event="sheet_updated", data="{}"),
+        )
+        self.assertEqual(
+            "event: sheet_updated\nid: 1:41\ndata: {}\n\n",
+            format_sse(event="sheet_updated", data="{}", event_id="1:41"),
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
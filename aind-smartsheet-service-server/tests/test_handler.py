@@ -3,15 +3,20 @@
 import json
 import os
 import unittest
+from datetime import datetime, timezone
 from pathlib import Path
 from typing import Optional
 
 from pydantic import BaseModel, ConfigDict, Field, ValidationError
 
 from aind_smartsheet_service_server.handler import (
+    ColumnMapping,
+    RowFilter,
     SheetHandler,
+    SheetIndex,
     default_row_filter,
     default_row_map,
+    get_column_id,
 )
 from aind_smartsheet_service_server.models import (
     SheetFields,
@@ -122,6 +127,144 @@ class TestSessionHandler(unittest.TestCase):
             )
         )
 
+    def test_get_column_id(self):
+        """Tests get_column_id returns the validation alias as an int"""
+        self.assertEqual(
+            3981351074090884,
+            get_column_id(self.MockSheetModel1, "project_name"),
+        )
+
+    def _rebuilt_sheet(self) -> SheetFields:
+        """Example sheet with new column IDs and a renamed Grant Number
+        column, as if the sheet had been rebuilt."""
+        sheet = self.example_sheet_response.model_copy(deep=True)
+        for column in sheet.columns:
+            column.id += 1
+            if column.title == "Grant Number":
+                column.title = "Grant #"
+        for row in sheet.rows:
+            for cell in row.cells:
+                cell.columnId += 1
+        return sheet
+
+    def test_column_mapping_id_mode(self):
+        """Tests fields are read from their column IDs in id mode"""
+        sheet = self._rebuilt_sheet()
+        mapping = ColumnMapping(
+            model=self.MockSheetModel1, columns=sheet.columns, mode="id"
+        )
+        self.assertEqual(3981351074090884, mapping.column_id("project_name"))
+        row = sheet.rows[0]
+        self.assertEqual(default_row_map(row), mapping.row_map(row))
+
+    def test_column_mapping_title_mode(self):
+        """Tests fields are matched to columns by title in title mode"""
+        unchanged_mapping = ColumnMapping(
+            model=self.MockSheetModel2,
+            columns=self.example_sheet_response.columns,
+            mode="title",
+        )
+        row = self.example_sheet_response.rows[0]
+        self.assertEqual(default_row_map(row), unchanged_mapping.row_map(row))
+
+        sheet = self._rebuilt_sheet()
+        mapping = ColumnMapping(
+            model=self.MockSheetModel1, columns=sheet.columns, mode="title"
+        )
+        self.assertEqual(3981351074090885, mapping.column_id("project_name"))
+        # No column is titled Grant Number, so the old column ID is kept
+        self.assertEqual(3446515788894084, mapping.column_id("grant_number"))
+        handler = SheetHandler(sheet_fields=sheet, row_mapper=mapping.row_map)
+        expected_handler = SheetHandler(
+            sheet_fields=self.example_sheet_response
+        )
+        self.assertEqual(
+            expected_handler.get_parsed_sheet_model(self.MockSheetModel1),
+            handler.get_parsed_sheet_model(self.MockSheetModel1),
+        )
+
+    def test_sheet_index_column(self):
+        """Tests SheetIndex groups rows by display value"""
+        sheet_index = SheetIndex(self.example_sheet_response)
+        self.assertEqual(
+            {
+                "AIND Scientific Activities": [0],
+                None: [1],
+                "v1omFISH": [2],
+            },
+            sheet_index.column(3981351074090884),
+        )
+        self.assertEqual({}, sheet_index.column(1))
+
+    def test_row_filter(self):
+        """Tests RowFilter on rows and with a SheetIndex agree"""
+        project_name = 3981351074090884
+        project_code = 1729551260405636
+        sheet_index = SheetIndex(self.example_sheet_response)
+        modified = datetime(2023, 12, 20, 18, 33, 23, tzinfo=timezone.utc)
+        cases = [
+            (RowFilter(), [0, 1, 2]),
+            (
+                RowFilter(values={project_name: ["v1omFISH", "ABC"]}),
+                [2],
+            ),
+            (RowFilter(values={project_name: None}), [0, 1, 2]),
+            (RowFilter(prefixes={project_name: ["AIND", "v1"]}), [0, 2]),
+            (RowFilter(prefixes={project_name: ["Z"]}), []),
+            (
+                RowFilter(
+                    values={project_name: ["v1omFISH"]},
+                    prefixes={project_name: ["AIND"]},
+                ),
+                [0, 2],
+            ),
+            (
+                RowFilter(
+                    values={project_code: ["122-01-001-10"]},
+                    prefixes={project_name: ["AIND", "v1"]},
+                ),
+                [0],
+            ),
+            (RowFilter(modified_after=modified), [2]),
+            (RowFilter(modified_before=modified), [0, 1]),
+            (
+                RowFilter(
+                    modified_after=datetime(2023, 12, 20, 18, 32, 10),
+                    modified_before=datetime(2023, 12, 20, 18, 33, 23),
+                ),
+                [0, 1],
+            ),
+            (
+                RowFilter(
+                    values={project_code: ["122-01-001-10"]},
+                    modified_after=modified,
+                ),
+                [],
+            ),
+        ]
+        rows = self.example_sheet_response.rows
+        for row_filter, expected_positions in cases:
+            self.assertEqual(
+                expected_positions, row_filter.select(sheet_index)
+            )
+            self.assertEqual(
+                expected_positions,
+                [p for p, row in enumerate(rows) if row_filter(row)],
+            )
+
+    def test_get_matched_rows_with_index(self):
+        """Tests SheetHandler selects rows from the index"""
+        row_filter = RowFilter(values={3981351074090884: ["v1omFISH"]})
+        handler = SheetHandler(
+            sheet_fields=self.example_sheet_response,
+            row_filter=row_filter,
+            sheet_index=SheetIndex(self.example_sheet_response),
+        )
+        parsed_sheet = handler.get_parsed_sheet_model(
+            model=self.MockSheetModel1
+        )
+        self.assertEqual(["v1omFISH"], [m.project_name for m in parsed_sheet])
+
     def test_get_parsed_sheet_model_case_1(self):
         """Tests get_parsed_sheet_model method with validate set to True and
         no validation errors"""
@@ -0,0 +1,32 @@
+"""Tests log_format module"""
+
+import logging
+import unittest
+
+import aind_smartsheet_service_server
+from aind_smartsheet_service_server.log_format import CustomJsonFormatter
+
+
+class TestCustomJsonFormatter(unittest.TestCase):
+    """Test methods in CustomJsonFormatter class"""
+
+    def test_format_time(self):
+        """Tests timestamps are formatted as ISO-8601 UTC"""
+        record = logging.makeLogRecord({"created": 0.5})
+        self.assertEqual(
+            "1970-01-01T00:00:00.500000Z",
+            CustomJsonFormatter().formatTime(record),
+        )
+
+    def test_package_attribute(self):
+        """Tests the formatter is found where log configs refer to it"""
+        self.assertIs(
+            CustomJsonFormatter,
+            aind_smartsheet_service_server.CustomJsonFormatter,
+        )
+        with self.assertRaises(AttributeError):
+            getattr(aind_smartsheet_service_server, "JsonFormatter")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,8 +1,14 @@
 """Module to test main app"""
 
+import asyncio
+from unittest.mock import patch
+
 import pytest
 from fastapi.testclient import TestClient
 
+from aind_smartsheet_service_server.backends import LRUMemoryBackend
+from aind_smartsheet_service_server.configs import settings
+
 
 class TestMain:
     """Tests app endpoints"""
@@ -17,6 +23,34 @@ class TestMain:
         response = client.get("/healthcheck")
         assert 200 == response.status_code
 
+    @pytest.mark.parametrize(
+        "cache_max_mb, max_bytes", [(2, 2 * 2**20), (None, None)]
+    )
+    def test_app_with_lru_cache(
+        self, client: TestClient, cache_max_mb, max_bytes
+    ):
+        """Tests the in-process cache is bounded if cache_max_mb is set."""
+        from aind_smartsheet_service_server.main import app, lifespan
+
+        async def start_app() -> None:
+            """Run the lifespan of the app."""
+            async with lifespan(app):
+                pass
+
+        with (
+            patch(
+                "aind_smartsheet_service_server.main.settings",
+                settings.model_copy(update={"cache_max_mb": cache_max_mb}),
+            ),
+            patch(
+                "aind_smartsheet_service_server.main.FastAPICache"
+            ) as mock_cache,
+        ):
+            asyncio.run(start_app())
+        backend = mock_cache.init.call_args.args[0]
+        assert isinstance(backend, LRUMemoryBackend)
+        assert max_bytes == backend.max_bytes
+
 
 if __name__ == "__main__":
     pytest.main([__file__])
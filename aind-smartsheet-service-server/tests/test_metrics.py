@@ -0,0 +1,142 @@
+"""Tests metrics module"""
+
+import re
+from unittest.mock import AsyncMock, patch
+
+import pytest
+from fastapi_cache import FastAPICache
+from prometheus_client import REGISTRY
+from starlette.testclient import TestClient
+
+from aind_smartsheet_service_server.backends import LRUMemoryBackend
+from aind_smartsheet_service_server.caching import sheet_cache_key
+from aind_smartsheet_service_server.metrics import (
+    StageTimings,
+    observe_stage,
+    sheet_downloaded,
+)
+
+
+def sample_value(name: str, **labels: str) -> float:
+    """Current value of a metric sample, or 0 if it was never recorded."""
+    return REGISTRY.get_sample_value(name, labels) or 0.0
+
+
+@pytest.mark.asyncio
+class TestMetrics:
+    """Test metrics endpoint and the metrics recorded by routes."""
+
+    @patch("aind_smartsheet_service_server.route.get_smartsheet")
+    async def test_get_metrics(
+        self,
+        mock_get_sheet: AsyncMock,
+        client: TestClient,
+        mock_raw_funding_sheet: dict,
+    ):
+        """Tests cache hits, stages, route latency and cached bytes are
+        exposed"""
+        mock_get_sheet.return_value = mock_raw_funding_sheet
+        hits = sample_value(
+            "smartsheet_service_sheet_requests_total",
+            sheet_id="100",
+            cache="hit",
+        )
+        lookups = sample_value(
+            "smartsheet_service_stage_seconds_count", stage="cache_lookup"
+        )
+        requests = sample_value(
+            "smartsheet_service_request_seconds_count",
+            method="GET",
+            route="/project_names",
+            status="200",
+        )
+        server_timing = client.get("/project_names").headers["Server-Timing"]
+        FastAPICache.reset()
+        FastAPICache.init(LRUMemoryBackend(), prefix="fastapi-cache")
+        await FastAPICache.get_backend().set(
+            sheet_cache_key(100, "abcdef2"), b"0123456789", expire=600
+        )
+        response = client.get("/metrics")
+        FastAPICache.reset()
+        FastAPICache.init(LRUMemoryBackend(), prefix="fastapi-cache")
+        assert 200 == response.status_code
+        assert re.fullmatch(
+            r"cache_lookup;dur=[\d.]+, validation;dur=[\d.]+, "
+            r"filtering;dur=[\d.]+, parsing;dur=[\d.]+, "
+            r"serialization;dur=[\d.]+, total;dur=[\d.]+",
+            server_timing,
+        )
+        assert response.headers["Server-Timing"].startswith("total;dur=")
+        assert "*" == response.headers["Timing-Allow-Origin"]
+        assert response.headers["content-type"].startswith("text/plain")
+        assert (
+            'smartsheet_service_cached_bytes{sheet_id="100"} 10.0'
+            in response.text
+        )
+        assert (
+            'smartsheet_service_cached_bytes{sheet_id="101"} 0.0'
+            in response.text
+        )
+        assert hits + 1 == sample_value(
+            "smartsheet_service_sheet_requests_total",
+            sheet_id="100",
+            cache="hit",
+        )
+        assert lookups + 1 == sample_value(
+            "smartsheet_service_stage_seconds_count", stage="cache_lookup"
+        )
+        assert requests + 1 == sample_value(
+            "smartsheet_service_request_seconds_count",
+            method="GET",
+            route="/project_names",
+            status="200",
+        )
+
+    async def test_stage_timings_outside_request(self):
+        """Tests stages outside of a request are only recorded as metrics"""
+        timings = StageTimings()
+        observe_stage("parsing", 0.001)
+        timings.add("parsing", 0.001)
+        timings.add("parsing", 0.002)
+        assert "parsing;dur=3.0, total;dur=5.0" == timings.server_timing(0.005)
+
+    @patch("aind_smartsheet_service_server.route.get_smartsheet")
+    async def test_cache_miss(
+        self,
+        mock_get_sheet: AsyncMock,
+        client: TestClient,
+        mock_raw_funding_sheet: dict,
+    ):
+        """Tests a downloaded sheet is counted as a cache miss"""
+
+        async def download(**_) -> dict:
+            """Mark the sheet as downloaded like get_smartsheet does."""
+            sheet_downloaded.set(True)
+            return mock_raw_funding_sheet
+
+        mock_get_sheet.side_effect = download
+        misses = sample_value(
+            "smartsheet_service_sheet_requests_total",
+            sheet_id="100",
+            cache="miss",
+        )
+        unmatched = sample_value(
+            "smartsheet_service_request_seconds_count",
+            method="GET",
+            route="unmatched",
+            status="404",
+        )
+        client.get("/funding")
+        client.get("/unknown")
+        assert misses + 1 == sample_value(
+            "smartsheet_service_sheet_requests_total",
+            sheet_id="100",
+            cache="miss",
+        )
+        assert unmatched + 1 == sample_value(
+            "smartsheet_service_request_seconds_count",
+            method="GET",
+            route="unmatched",
+            status="404",
+        )
+        assert not sheet_downloaded.get()
@@ -0,0 +1,97 @@
+"""Tests monitoring module"""
+
+import asyncio
+import time
+import unittest
+from unittest.mock import AsyncMock, patch
+
+from prometheus_client import REGISTRY
+
+from aind_smartsheet_service_server.monitoring import (
+    LoopLagMonitor,
+    TaskRouteMiddleware,
+    task_routes,
+)
+
+
+def block_loop(seconds: float) -> None:
+    """Stand in for slow synchronous code called from a route."""
+    time.sleep(seconds)
+
+
+class TestLoopLagMonitor(unittest.IsolatedAsyncioTestCase):
+    """Test methods in LoopLagMonitor and TaskRouteMiddleware classes"""
+
+    async def test_middleware(self):
+        """Tests request tasks are tagged with their route"""
+        app = AsyncMock()
+        middleware = TaskRouteMiddleware(app)
+        scope = {"type": "http", "method": "GET", "path": "/funding"}
+        await middleware(scope, None, None)
+        self.assertEqual("GET /funding", task_routes[asyncio.current_task()])
+        await middleware({"type": "lifespan"}, None, None)
+        self.assertEqual(2, app.await_count)
+
+    async def test_blocked_loop_is_reported(self):
+        """Tests a blocking call is logged with its route and stack"""
+        stalls = REGISTRY.get_sample_value(
+            "smartsheet_service_event_loop_stalls_total"
+        )
+        lag_count = REGISTRY.get_sample_value(
+            "smartsheet_service_event_loop_lag_seconds_count"
+        )
+        slow_count = lag_count - REGISTRY.get_sample_value(
+            "smartsheet_service_event_loop_lag_seconds_bucket", {"le": "0.1"}
+        )
+        monitor = LoopLagMonitor(threshold=0.05, interval=0.01)
+        monitor.start()
+        await asyncio.sleep(0.03)
+
+        async def request():
+            """A request that blocks the loop."""
+            task_routes[asyncio.current_task()] = "GET /get_exaspim_info"
+            block_loop(0.3)
+
+        with self.assertLogs(level="WARNING") as captured:
+            await asyncio.create_task(request())
+            await asyncio.sleep(0.03)
+        self.assertEqual(1, monitor.blocked_count)
+        self.assertIn("GET /get_exaspim_info", captured.output[0])
+        self.assertIn("block_loop", captured.output[0])
+        self.assertGreater(monitor.max_lag, 0.2)
+        self.assertEqual(
+            stalls + 1,
+            REGISTRY.get_sample_value(
+                "smartsheet_service_event_loop_stalls_total"
+            ),
+        )
+        lag_count = REGISTRY.get_sample_value(
+            "smartsheet_service_event_loop_lag_seconds_count"
+        )
+        # The stalled measurement is in the buckets above 0.1 seconds
+        self.assertEqual(
+            slow_count + 1,
+            lag_count
+            - REGISTRY.get_sample_value(
+                "smartsheet_service_event_loop_lag_seconds_bucket",
+                {"le": "0.1"},
+            ),
+        )
+        await monitor.stop()
+
+    async def test_report_outside_request(self):
+        """Tests blocking outside of a request or task is still reported"""
+        monitor = LoopLagMonitor(threshold=0.05)
+        with self.assertLogs(level="WARNING") as captured:
+            monitor.report_blocked(0.1)
+            with patch("asyncio.current_task", return_value=None):
+                monitor.report_blocked(0.1)
+        self.assertIn(
+            "blocked for 100 ms while serving no request", captured.output[0]
+        )
+        self.assertIn("while serving no task", captured.output[1])
+        await LoopLagMonitor(threshold=0.05).stop()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,134 @@
+"""Tests parsing module"""
+
+import asyncio
+import json
+import os
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+
+from aind_smartsheet_service_server.configs import settings
+from aind_smartsheet_service_server.handler import SheetHandler
+from aind_smartsheet_service_server.models import FundingModel, SheetFields
+from aind_smartsheet_service_server.parsing import (
+    parse_rows_in_chunks,
+    shutdown_process_pool,
+    validate_sheet,
+)
+
+RESOURCES_DIR = Path(os.path.dirname(os.path.realpath(__file__))) / "resources"
+
+
+class TestParsing(unittest.IsolatedAsyncioTestCase):
+    """Test methods in parsing module"""
+
+    @classmethod
+    def setUpClass(cls) -> None:
+        """Set up class with loaded json."""
+
+        with open(RESOURCES_DIR / "funding.json", "r") as f:
+            cls.raw_sheet = json.load(f)
+        cls.sheet_fields = SheetFields.model_validate(cls.raw_sheet)
+        cls.expected = SheetHandler(
+            sheet_fields=cls.sheet_fields
+        ).get_parsed_sheet_model(model=FundingModel)
+
+    def setUp(self):
+        """Offload every sheet in small chunks."""
+        patcher = patch.multiple(
+            settings, parse_offload_min_rows=1, parse_chunk_size=2
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    async def _parse(self):
+        """Parse the funding sheet with the chunked parser."""
+        handler = SheetHandler(sheet_fields=self.sheet_fields)
+        return await handler.get_parsed_sheet_model_chunked(model=FundingModel)
+
+    async def test_parse_rows_inline(self):
+        """Tests other tasks run between chunks parsed on the event loop"""
+        ticks = 0
+
+        async def ticker():
+            """Count how often the event loop runs this task."""
+            nonlocal ticks
+            while True:
+                ticks += 1
+                await asyncio.sleep(0)
+
+        task = asyncio.create_task(ticker())
+        await asyncio.sleep(0)
+        parsed = await self._parse()
+        task.cancel()
+        self.assertEqual(self.expected, parsed)
+        self.assertGreater(ticks, len(parsed) // 2)
+
+    async def test_validate_sheet_inline(self):
+        """Tests other tasks run between chunks of rows validated on the
+        event loop"""
+        ticks = 0
+
+        async def ticker():
+            """Count how often the event loop runs this task."""
+            nonlocal ticks
+            while True:
+                ticks += 1
+                await asyncio.sleep(0)
+
+        task = asyncio.create_task(ticker())
+        await asyncio.sleep(0)
+        sheet_fields = await validate_sheet(self.raw_sheet)
+        task.cancel()
+        self.assertEqual(self.sheet_fields, sheet_fields)
+        self.assertGreater(ticks, len(sheet_fields.rows) // 2)
+
+    async def test_parse_rows_small_sheet(self):
+        """Tests sheets below the threshold are parsed directly"""
+        with patch.object(settings, "parse_offload_min_rows", 10000):
+            self.assertEqual(self.expected, await self._parse())
+            self.assertEqual(
+                self.sheet_fields, await validate_sheet(self.raw_sheet)
+            )
+
+    async def test_parse_rows_thread(self):
+        """Tests chunks are parsed in a thread"""
+        with patch.object(settings, "parse_executor", "thread"):
+            self.assertEqual(self.expected, await self._parse())
+            self.assertEqual(
+                self.sheet_fields, await validate_sheet(self.raw_sheet)
+            )
+
+    async def test_parse_rows_process(self):
+        """Tests chunks are parsed in a process pool"""
+        self.addCleanup(shutdown_process_pool)
+        with patch.multiple(
+            settings, parse_executor="process", parse_workers=1
+        ):
+            self.assertEqual(self.expected, await self._parse())
+            self.assertEqual(
+                self.sheet_fields, await validate_sheet(self.raw_sheet)
+            )
+        shutdown_process_pool()
+        shutdown_process_pool()
+
+    async def test_parse_rows_invalid(self):
+        """Tests invalid rows raise or are constructed"""
+        rows = self.sheet_fields.rows[:3]
+        with self.assertRaises(Exception):
+            await parse_rows_in_chunks(
+                rows=rows,
+                row_mapper=lambda r: {"project_name": 1},
+                model=FundingModel,
+            )
+        parsed = await parse_rows_in_chunks(
+            rows=rows,
+            row_mapper=lambda r: {"project_name": 1},
+            model=FundingModel,
+            validate=False,
+        )
+        self.assertEqual([1, 1, 1], [p.project_name for p in parsed])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,124 @@
+"""Tests profiling module"""
+
+import asyncio
+import sys
+import threading
+import time
+import unittest
+from unittest.mock import AsyncMock, patch
+
+from aind_smartsheet_service_server.profiling import (
+    ProfileMiddleware,
+    SamplingProfiler,
+    fold_stack,
+    profile,
+)
+
+
+def busy(seconds: float) -> None:
+    """Keep the current thread busy."""
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        pass
+
+
+class TestProfiling(unittest.IsolatedAsyncioTestCase):
+    """Test methods in profiling module"""
+
+    def test_fold_stack(self):
+        """Tests a stack is folded outermost frame first"""
+
+        def inner():
+            """Fold the stack of this function."""
+            return fold_stack(sys._getframe())
+
+        folded = inner()
+        self.assertTrue(
+            folded.endswith(
+                f"{__name__}:TestProfiling.test_fold_stack;"
+                f"{__name__}:TestProfiling.test_fold_stack.<locals>.inner"
+            )
+        )
+        self.assertEqual("", fold_stack(None))
+
+    async def test_profile_flagged_requests(self):
+        """Tests only flagged request tasks are sampled"""
+
+        async def request(name: str):
+            """A request that keeps the loop busy."""
+            busy(0.1)
+
+        async def app(scope, receive, send):
+            """App serving a single request."""
+            await request(scope["path"])
+
+        middleware = ProfileMiddleware(app)
+        profiling = asyncio.create_task(
+            profile(seconds=0.4, interval=0.001, flagged_only=True)
+        )
+        await asyncio.sleep(0.01)
+        await middleware(
+            {"type": "http", "path": "/a", "headers": [(b"x-profile", b"")]},
+            None,
+            None,
+        )
+        await middleware(
+            {"type": "http", "path": "/b", "headers": []}, None, None
+        )
+        with self.assertRaises(RuntimeError):
+            await profile(seconds=0.1)
+        profiler = await profiling
+        self.assertGreater(profiler.sample_count, 0)
+        self.assertTrue(profiler.samples)
+        # The flagged task is also sampled in the middleware around the app
+        self.assertTrue(
+            all(
+                "ProfileMiddleware.__call__" in stack
+                for stack in profiler.samples
+            )
+        )
+        self.assertTrue(
+            any(
+                "test_profile_flagged_requests.<locals>.request" in stack
+                for stack in profiler.samples
+            )
+        )
+        self.assertEqual(0, len(profiler._tasks))
+
+    async def test_middleware_without_profile(self):
+        """Tests requests pass straight through while no profile is
+        recorded"""
+        app = AsyncMock()
+        middleware = ProfileMiddleware(app)
+        await middleware({"type": "http", "headers": []}, None, None)
+        app.assert_awaited_once()
+
+    def test_profile_process(self):
+        """Tests every other thread is sampled and written as folded
+        stacks"""
+        profiler = SamplingProfiler(interval=0.001)
+        profiler.start()
+        busy(0.1)
+        profiler.stop()
+        folded = profiler.folded()
+        self.assertIn("MainThread;", folded)
+        self.assertIn(f"{__name__}:busy 1", folded)
+        self.assertNotIn("sampling-profiler", folded)
+        sampler = threading.Thread(target=profiler.sample)
+        with patch("threading.enumerate", return_value=[]):
+            sampler.start()
+            sampler.join()
+        self.assertIn(str(profiler._loop_thread_id), profiler.folded())
+
+    def test_flagged_without_request(self):
+        """Tests nothing is sampled while no flagged request runs"""
+        profiler = SamplingProfiler(flagged_only=True)
+        with patch("asyncio.current_task", return_value=None):
+            profiler.sample()
+        self.assertEqual({}, profiler.samples)
+        self.assertEqual(1, profiler.sample_count)
+        profiler.stop()
+
+
+if __name__ == "__main__":
+    unittest.main()
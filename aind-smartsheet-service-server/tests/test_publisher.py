@@ -0,0 +1,110 @@
+"""Tests publisher module"""
+
+import json
+import os
+import tempfile
+import unittest
+from pathlib import Path
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from smartsheet.models import Version
+from smartsheet.models.error import Error as SmartsheetError
+
+from aind_smartsheet_service_server.configs import settings
+from aind_smartsheet_service_server.publisher import SheetPublisher, main
+from aind_smartsheet_service_server.registry import (
+    RegisteredSheet,
+    SheetRegistry,
+)
+from aind_smartsheet_service_server.shared import SharedSheets
+
+RESOURCES_DIR = Path(os.path.dirname(os.path.realpath(__file__))) / "resources"
+
+
+@patch(
+    "aind_smartsheet_service_server.refresh.sheet_registry",
+    SheetRegistry(
+        [RegisteredSheet(name="example", sheet_id=1, access_token="abc")]
+    ),
+)
+@patch("aind_smartsheet_service_server.publisher.fetch_sheet")
+@patch("smartsheet.sheets.Sheets.get_sheet_version")
+class TestSheetPublisher(unittest.IsolatedAsyncioTestCase):
+    """Test methods in SheetPublisher class"""
+
+    @classmethod
+    def setUpClass(cls) -> None:
+        """Set up class with loaded json."""
+
+        with open(RESOURCES_DIR / "example_sheet.json", "r") as f:
+            cls.example_sheet = json.load(f)
+
+    def setUp(self):
+        """Publish to a fresh directory for each test."""
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.shared_sheets = SharedSheets(Path(self.tmp_dir.name))
+
+    def tearDown(self):
+        """Remove the published files."""
+        self.tmp_dir.cleanup()
+
+    async def test_refresh_once(
+        self, mock_get_sheet_version: MagicMock, mock_fetch_sheet: AsyncMock
+    ):
+        """Tests sheets are published only when the version changes"""
+        mock_get_sheet_version.return_value = Version({"version": 40})
+        mock_fetch_sheet.return_value = self.example_sheet
+        publisher = SheetPublisher(
+            interval_seconds=60, shared_sheets=self.shared_sheets
+        )
+        with self.assertLogs(level="INFO") as captured:
+            self.assertEqual({1}, await publisher.refresh_once())
+        self.assertIn("Published version 40 of sheet 1", captured.output[0])
+        self.assertEqual(
+            self.example_sheet,
+            json.loads(self.shared_sheets.path(1, "abc").read_bytes()),
+        )
+        self.assertEqual(set(), await publisher.refresh_once())
+        mock_fetch_sheet.assert_awaited_once()
+
+    async def test_refresh_error(
+        self, mock_get_sheet_version: MagicMock, mock_fetch_sheet: AsyncMock
+    ):
+        """Tests download errors are logged and nothing is published"""
+        mock_get_sheet_version.return_value = Version({"version": 40})
+        error = SmartsheetError(MagicMock())
+        error.result = MagicMock(message="Not Found")
+        mock_fetch_sheet.return_value = error
+        publisher = SheetPublisher(
+            interval_seconds=60, shared_sheets=self.shared_sheets
+        )
+        with self.assertLogs(level="WARNING") as captured:
+            self.assertEqual(set(), await publisher.refresh_once())
+        self.assertIn(
+            "Unable to download sheet 1: Not Found", captured.output[0]
+        )
+        self.assertFalse(self.shared_sheets.path(1, "abc").exists())
+
+    def test_main(
+        self, mock_get_sheet_version: MagicMock, mock_fetch_sheet: AsyncMock
+    ):
+        """Tests the command line publishes once or runs until stopped"""
+        mock_get_sheet_version.return_value = Version({"version": 40})
+        mock_fetch_sheet.return_value = self.example_sheet
+        with patch.object(
+            settings, "shared_sheets_dir", Path(self.tmp_dir.name)
+        ):
+            self.assertEqual(0, main(["--once"]))
+            with patch(
+                "aind_smartsheet_service_server.publisher.SheetPublisher.run",
+                new_callable=AsyncMock,
+            ) as mock_run:
+                self.assertEqual(0, main(["--interval", "5"]))
+            mock_run.assert_awaited_once()
+        self.assertTrue(self.shared_sheets.path(1, "abc").exists())
+        with self.assertRaises(SystemExit):
+            main(["--once"])
+
+
+if __name__ == "__main__":
+    unittest.main()
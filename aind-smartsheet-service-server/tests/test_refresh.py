@@ -0,0 +1,185 @@
+"""Tests refresh module"""
+
+import asyncio
+import json
+import os
+import tempfile
+import unittest
+from pathlib import Path
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from fastapi_cache import FastAPICache
+from smartsheet.models import Version
+from smartsheet.models.error import Error as SmartsheetError
+
+from aind_smartsheet_service_server.backends import LRUMemoryBackend
+from aind_smartsheet_service_server.caching import sheet_cache_key
+from aind_smartsheet_service_server.refresh import (
+    SheetRefresher,
+    get_sheet_version,
+)
+from aind_smartsheet_service_server.registry import (
+    RegisteredSheet,
+    SheetRegistry,
+)
+from aind_smartsheet_service_server.shared import SharedSheets
+from aind_smartsheet_service_server.snapshot import snapshot_store
+
+RESOURCES_DIR = Path(os.path.dirname(os.path.realpath(__file__))) / "resources"
+
+
+@patch(
+    "aind_smartsheet_service_server.refresh.sheet_registry",
+    SheetRegistry(
+        [RegisteredSheet(name="example", sheet_id=1, access_token="abc")]
+    ),
+)
+@patch("aind_smartsheet_service_server.route.get_smartsheet")
+@patch("smartsheet.sheets.Sheets.get_sheet_version")
+class TestSheetRefresher(unittest.IsolatedAsyncioTestCase):
+    """Test methods in SheetRefresher class"""
+
+    @classmethod
+    def setUpClass(cls) -> None:
+        """Set up class with loaded json."""
+
+        with open(RESOURCES_DIR / "example_sheet.json", "r") as f:
+            cls.example_sheet = json.load(f)
+
+    def setUp(self):
+        """Use a fresh in-memory cache and snapshot store for each test."""
+        FastAPICache.reset()
+        FastAPICache.init(LRUMemoryBackend(), prefix="fastapi-cache")
+        snapshot_store.clear()
+
+    async def test_get_sheet_version_error(
+        self,
+        mock_get_sheet_version: MagicMock,
+        mock_get_smartsheet: AsyncMock,
+    ):
+        """Tests an error from Smartsheet is raised"""
+        mock_get_sheet_version.return_value = SmartsheetError(
+            {"result": {"message": "Not Found"}}
+        )
+        with self.assertRaises(RuntimeError) as e:
+            await get_sheet_version(sheet_id=1, access_token="abc")
+        self.assertIn("Not Found", str(e.exception))
+
+    async def test_refresh_once(
+        self,
+        mock_get_sheet_version: MagicMock,
+        mock_get_smartsheet: AsyncMock,
+    ):
+        """Tests sheets are reloaded only when the version changes"""
+        mock_get_sheet_version.return_value = Version({"version": 40})
+        mock_get_smartsheet.return_value = self.example_sheet
+        refresher = SheetRefresher(interval_seconds=60)
+        self.assertEqual({1}, await refresher.refresh_once())
+        self.assertEqual(40, snapshot_store.get_current(1).version)
+        self.assertEqual(set(), await refresher.refresh_once())
+        mock_get_smartsheet.assert_awaited_once()
+
+        backend = FastAPICache.get_backend()
+        await backend.set(sheet_cache_key(1, "abc"), b"{}", expire=60)
+        mock_get_sheet_version.return_value = Version({"version": 41})
+        mock_get_smartsheet.return_value = dict(self.example_sheet, version=41)
+        self.assertEqual({1}, await refresher.refresh_once())
+        self.assertIsNone(await backend.get(sheet_cache_key(1, "abc")))
+        self.assertEqual(41, snapshot_store.get_current(1).version)
+
+    async def test_refresh_once_dropped_snapshot(
+        self,
+        mock_get_sheet_version: MagicMock,
+        mock_get_smartsheet: AsyncMock,
+    ):
+        """Tests a snapshot dropped to stay within the memory budget is not
+        reloaded while its version is unchanged"""
+        mock_get_sheet_version.return_value = Version({"version": 40})
+        mock_get_smartsheet.return_value = self.example_sheet
+        refresher = SheetRefresher(interval_seconds=60)
+        with patch.object(snapshot_store, "memory_budget", 1):
+            self.assertEqual({1}, await refresher.refresh_once())
+            snapshot_store.get_snapshot(
+                sheet_id=2, raw_sheet=self.example_sheet
+            )
+            self.assertIsNone(snapshot_store.get_current(1))
+            self.assertEqual(set(), await refresher.refresh_once())
+        mock_get_smartsheet.assert_awaited_once()
+
+    async def test_refresh_once_error(
+        self,
+        mock_get_sheet_version: MagicMock,
+        mock_get_smartsheet: AsyncMock,
+    ):
+        """Tests errors are logged"""
+        mock_get_sheet_version.return_value = SmartsheetError(
+            {"result": {"message": "Not Found"}}
+        )
+        refresher = SheetRefresher(interval_seconds=60)
+        with self.assertLogs(level="WARNING") as captured:
+            self.assertEqual(set(), await refresher.refresh_once())
+        self.assertIn("Unable to refresh sheet 1", captured.output[0])
+        mock_get_smartsheet.assert_not_called()
+
+    async def test_run(
+        self,
+        mock_get_sheet_version: MagicMock,
+        mock_get_smartsheet: AsyncMock,
+    ):
+        """Tests run polls every interval until stopped"""
+        mock_get_sheet_version.return_value = Version({"version": 40})
+        mock_get_smartsheet.return_value = self.example_sheet
+        refresher = SheetRefresher(interval_seconds=0.01)
+        stop = asyncio.Event()
+        task = asyncio.create_task(refresher.run(stop=stop))
+        while mock_get_sheet_version.call_count < 2:
+            await asyncio.sleep(0.01)
+        stop.set()
+        await asyncio.wait_for(task, timeout=1)
+        mock_get_smartsheet.assert_awaited_once()
+
+    async def test_refresh_shared_sheets(
+        self,
+        mock_get_sheet_version: MagicMock,
+        mock_get_smartsheet: AsyncMock,
+    ):
+        """Tests published files are checked instead of Smartsheet"""
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            shared_sheets = SharedSheets(Path(tmp_dir))
+            shared_sheets.publish(1, "abc", self.example_sheet)
+            refresher = SheetRefresher(interval_seconds=60)
+            with (
+                patch(
+                    "aind_smartsheet_service_server.refresh.shared_sheets",
+                    shared_sheets,
+                ),
+                patch(
+                    "aind_smartsheet_service_server.route.shared_sheets",
+                    shared_sheets,
+                ),
+                patch.object(
+                    shared_sheets,
+                    "get_snapshot",
+                    wraps=shared_sheets.get_snapshot,
+                ) as mock_get_snapshot,
+            ):
+                self.assertEqual({1}, await refresher.refresh_once())
+                self.assertEqual(set(), await refresher.refresh_once())
+                # A snapshot dropped by the budget is not loaded again
+                with patch.object(snapshot_store, "memory_budget", 1):
+                    snapshot_store.get_snapshot(
+                        sheet_id=2, raw_sheet=self.example_sheet
+                    )
+                self.assertEqual(set(), await refresher.refresh_once())
+                self.assertEqual(1, mock_get_snapshot.call_count)
+                shared_sheets.publish(
+                    1, "abc", {**self.example_sheet, "version": 41}
+                )
+                self.assertEqual({1}, await refresher.refresh_once())
+        self.assertEqual(41, snapshot_store.get_current(1).version)
+        mock_get_sheet_version.assert_not_called()
+        mock_get_smartsheet.assert_not_called()
+
+
+if __name__ == "__main__":
+    unittest.main()
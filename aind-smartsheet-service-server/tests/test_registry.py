@@ -0,0 +1,109 @@
+"""Tests registry module"""
+
+import unittest
+
+from pydantic import SecretStr
+
+from aind_smartsheet_service_server.configs import SheetConfig, settings
+from aind_smartsheet_service_server.models import FundingModel
+from aind_smartsheet_service_server.registry import (
+    RegisteredSheet,
+    SheetRegistry,
+    import_model,
+)
+
+
+class TestSheetRegistry(unittest.TestCase):
+    """Test methods in SheetRegistry class"""
+
+    def test_from_settings(self):
+        """Tests built-in sheets are registered with their tokens"""
+        registry = SheetRegistry.from_settings(settings)
+        self.assertEqual(
+            [
+                "funding",
+                "protocols",
+                "perfusions",
+                "mouse_tracker",
+                "sample_tracking",
+                "imaging_queue",
+                "exaspim_qc_sheet",
+            ],
+            registry.names(),
+        )
+        funding = registry.get("funding")
+        self.assertEqual(100, funding.sheet_id)
+        self.assertEqual("abcdef2", funding.access_token)
+        self.assertIs(FundingModel, funding.model)
+        self.assertEqual("uvwxyz3", registry.get_by_id(103).access_token)
+        self.assertIsNone(registry.get_by_id(1))
+        self.assertEqual(
+            "RegisteredSheet(name='funding', sheet_id=100)", repr(funding)
+        )
+
+    def test_from_settings_with_sheets(self):
+        """Tests configured sheets are added or replace built-in sheets"""
+        app_settings = settings.model_copy(
+            update={
+                "access_token_2": SecretStr("other"),
+                "sheets": {
+                    "funding": SheetConfig(
+                        sheet_id=300,
+                        model="aind_smartsheet_service_server.models."
+                        "FundingModel",
+                    ),
+                    "example": SheetConfig(
+                        sheet_id=200,
+                        access_token="access_token_2",
+                        index_columns=["Project Name"],
+                        ttl_seconds=60,
+                    ),
+                },
+            }
+        )
+        registry = SheetRegistry.from_settings(app_settings)
+        self.assertEqual(300, registry.get("funding").sheet_id)
+        example = registry.get("example")
+        self.assertEqual("other", example.access_token)
+        self.assertIsNone(example.model)
+        self.assertEqual(["Project Name"], example.index_columns)
+        self.assertEqual(60, example.ttl_seconds)
+        registry.unregister("example")
+        self.assertIsNone(registry.get("example"))
+
+    def test_configured_sheet_unknown_index_columns(self):
+        """Tests index columns that are not fields read from a column are
+        rejected when the settings are loaded"""
+        config = SheetConfig(
+            sheet_id=300,
+            model="aind_smartsheet_service_server.models.FundingModel",
+            index_columns=["project_name", "project_nmae"],
+        )
+        with self.assertRaises(ValueError) as e:
+            SheetRegistry.configured_sheet("funding", config, settings)
+        self.assertIn("['project_nmae']", str(e.exception))
+
+    def test_import_model(self):
+        """Tests models are imported by path"""
+        self.assertIs(
+            FundingModel,
+            import_model("aind_smartsheet_service_server.models.FundingModel"),
+        )
+        with self.assertRaises(TypeError):
+            import_model("aind_smartsheet_service_server.configs.settings")
+        with self.assertRaises(AttributeError):
+            import_model("aind_smartsheet_service_server.models.Missing")
+
+    def test_register(self):
+        """Tests sheets are replaced by name"""
+        registry = SheetRegistry(
+            [RegisteredSheet(name="a", sheet_id=1, access_token="abc")]
+        )
+        registry.register(
+            RegisteredSheet(name="a", sheet_id=2, access_token="abc")
+        )
+        self.assertEqual([2], [s.sheet_id for s in registry])
+
+
+if __name__ == "__main__":
+    unittest.main()
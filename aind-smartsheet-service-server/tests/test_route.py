@@ -1,13 +1,34 @@
 """Test routes"""
 
+import copy
+import json
 from unittest.mock import AsyncMock, MagicMock, call, patch
 
 import pytest
 from fastapi import HTTPException
+from fastapi_cache import FastAPICache
 from smartsheet.models.error import Error as SmartsheetError
 from starlette.testclient import TestClient
 
-from aind_smartsheet_service_server.route import get_smartsheet
+from aind_smartsheet_service_server.caching import (
+    evict_sheet,
+    sheet_cache_key,
+    sheet_version_key,
+)
+from aind_smartsheet_service_server.configs import settings
+from aind_smartsheet_service_server.events import event_broker
+from aind_smartsheet_service_server.metrics import sheet_downloaded
+from aind_smartsheet_service_server.registry import (
+    RegisteredSheet,
+    sheet_registry,
+)
+from aind_smartsheet_service_server.route import (
+    get_events,
+    get_sheet_snapshot,
+    get_smartsheet,
+)
+from aind_smartsheet_service_server.scheduler import FetchQueueFull
+from aind_smartsheet_service_server.snapshot import snapshot_store
 
 
 @pytest.mark.asyncio
@@ -87,6 +108,74 @@ class TestRoutes:
         assert e.value.status_code == 404
         assert "Not Found" in str(e.value.detail)
 
+    @patch("smartsheet.sheets.Sheets.get_sheet")
+    async def test_get_smartsheet_error_cached(
+        self, mock_get_sheet: MagicMock
+    ):
+        """Tests an upstream error is returned again without a download"""
+        error_obj = SmartsheetError(MagicMock())
+        error_obj.result = MagicMock(status_code=403, message="Forbidden")
+        mock_get_sheet.return_value = error_obj
+        for _ in range(3):
+            with pytest.raises(HTTPException) as e:
+                await get_smartsheet(
+                    sheet_id=0,
+                    user_agent="user",
+                    max_connections=1,
+                    access_token="token",
+                )
+            assert 403 == e.value.status_code
+            assert "Forbidden" == e.value.detail
+        assert 1 == mock_get_sheet.call_count
+        # Another token may have access
+        with pytest.raises(HTTPException):
+            await get_smartsheet(
+                sheet_id=0,
+                user_agent="user",
+                max_connections=1,
+                access_token="token_2",
+            )
+        assert 2 == mock_get_sheet.call_count
+
+    @patch("smartsheet.sheets.Sheets.get_sheet")
+    async def test_get_smartsheet_error_not_cached(
+        self, mock_get_sheet: MagicMock
+    ):
+        """Tests errors are not cached when error_cache_seconds is 0"""
+        error_obj = SmartsheetError(MagicMock())
+        error_obj.result = MagicMock(status_code=404, message="Not Found")
+        mock_get_sheet.return_value = error_obj
+        with patch.object(settings, "error_cache_seconds", 0):
+            for _ in range(2):
+                with pytest.raises(HTTPException):
+                    await get_smartsheet(
+                        sheet_id=0,
+                        user_agent="user",
+                        max_connections=1,
+                        access_token="token",
+                    )
+        assert 2 == mock_get_sheet.call_count
+
+    async def test_get_smartsheet_fetch_queue_full(self):
+        """Tests a 503 error is raised when too many downloads wait"""
+        with (
+            patch(
+                "aind_smartsheet_service_server.route.fetch_scheduler.fetch",
+                side_effect=FetchQueueFull("2 downloads are waiting."),
+            ),
+            patch.object(settings, "retry_after_seconds", 3),
+        ):
+            with pytest.raises(HTTPException) as e:
+                await get_smartsheet(
+                    sheet_id=0,
+                    user_agent="user",
+                    max_connections=1,
+                    access_token="token",
+                )
+        assert 503 == e.value.status_code
+        assert "2 downloads are waiting." == e.value.detail
+        assert {"Retry-After": "3"} == e.value.headers
+
     @patch("aind_smartsheet_service_server.route.get_smartsheet")
     async def test_get_funding(
         self,
@@ -133,6 +222,55 @@ class TestRoutes:
         assert 200 == response.status_code
         assert expected_response == response.json()
 
+    @patch("aind_smartsheet_service_server.route.get_smartsheet")
+    async def test_get_funding_filters(
+        self,
+        mock_get_sheet: AsyncMock,
+        client: TestClient,
+        mock_raw_funding_sheet: dict,
+    ):
+        """Tests the funding index matches filtering every parsed row"""
+
+        mock_get_sheet.return_value = mock_raw_funding_sheet
+        project_name = (
+            "Discovery-Neuromodulator circuit dynamics during foraging"
+        )
+        subproject = "Subproject 2 Molecular Anatomy Cell Types"
+        all_rows = client.get("/funding").json()
+        queries = [
+            (None, None),
+            (project_name, None),
+            (project_name, subproject),
+            ("Ephys Platform", None),
+            ("Ephys Platform", subproject),
+            (None, subproject),
+            ("Unknown", None),
+        ]
+        for query_project_name, query_subproject in queries:
+            params = {
+                "project_name": query_project_name,
+                "subproject": query_subproject,
+            }
+            response = client.get(
+                "/funding",
+                params={k: v for k, v in params.items() if v is not None},
+            )
+            expected_response = [
+                r
+                for r in all_rows
+                if (
+                    r["project_name"] == query_project_name
+                    and (
+                        query_subproject is None
+                        or r["subproject"] == query_subproject
+                    )
+                )
+                or (query_project_name is None and query_subproject is None)
+            ]
+            assert 200 == response.status_code
+            assert expected_response == response.json()
+        assert 9 == len(all_rows)
+
     @patch("aind_smartsheet_service_server.route.get_smartsheet")
     async def test_get_project_names(
         self,
@@ -167,6 +305,35 @@ class TestRoutes:
         assert 200 == response.status_code
         assert expected_response == response.json()
 
+    @patch("aind_smartsheet_service_server.route.get_smartsheet")
+    async def test_get_project_names_registered(
+        self,
+        mock_get_sheet: AsyncMock,
+        client: TestClient,
+        mock_raw_funding_sheet: str,
+    ):
+        """Tests built-in routes read the sheet registered under their name"""
+        mock_get_sheet.return_value = mock_raw_funding_sheet
+        funding = sheet_registry.get("funding")
+        sheet_registry.register(
+            RegisteredSheet(
+                name="funding",
+                sheet_id=999,
+                access_token="replaced",
+                model=funding.model,
+            )
+        )
+        try:
+            response = client.get("/project_names")
+            sheet_registry.unregister("funding")
+            missing_response = client.get("/project_names")
+        finally:
+            sheet_registry.register(funding)
+        assert 200 == response.status_code
+        assert 999 == mock_get_sheet.call_args.kwargs["sheet_id"]
+        assert "replaced" == mock_get_sheet.call_args.kwargs["access_token"]
+        assert 404 == missing_response.status_code
+
     @patch("aind_smartsheet_service_server.route.get_smartsheet")
     async def test_get_protocols(
         self,
@@ -196,6 +363,69 @@ class TestRoutes:
         assert 200 == response.status_code
         assert expected_response == response.json()
 
+    @patch("aind_smartsheet_service_server.route.get_smartsheet")
+    async def test_get_protocols_multiple_filters(
+        self,
+        mock_get_sheet: AsyncMock,
+        client: TestClient,
+        mock_raw_protocols_sheet: dict,
+    ):
+        """Tests repeated and prefix query parameters for protocols"""
+
+        mock_get_sheet.return_value = mock_raw_protocols_sheet
+        response = client.get(
+            "/protocols",
+            params={
+                "procedure_name": ["Delipidation", "Perfusion"],
+                "protocol_name_prefix": ["Aqueous", "Mouse"],
+            },
+        )
+        assert 200 == response.status_code
+        assert [
+            "Aqueous (SBiP) Delipidation of a Whole Mouse Brain",
+            "Mouse Cardiac Perfusion Fixation and Brain Collection V.5",
+        ] == [r["protocol_name"] for r in response.json()]
+
+        response = client.get(
+            "/protocols",
+            params={
+                "protocol_type": "Imaging Techniques",
+                "modified_after": "2023-12-05T20:00:00Z",
+            },
+        )
+        assert 200 == response.status_code
+        assert ["SmartSPIM setup and alignment"] == [
+            r["protocol_name"] for r in response.json()
+        ]
+
+    @patch("aind_smartsheet_service_server.route.get_smartsheet")
+    async def test_search_protocols(
+        self,
+        mock_get_sheet: AsyncMock,
+        client: TestClient,
+        mock_raw_protocols_sheet: dict,
+    ):
+        """Tests searching protocols by partial and misspelled names"""
+
+        mock_get_sheet.return_value = mock_raw_protocols_sheet
+        response = client.get(
+            "/protocols/search", params={"q": "smartspim", "limit": 2}
+        )
+        assert 200 == response.status_code
+        assert [
+            "SmartSPIM setup and alignment",
+            "Imaging cleared mouse brains on SmartSPIM",
+        ] == [r["protocol_name"] for r in response.json()]
+
+        response = client.get(
+            "/protocols/search", params={"q": "iontophoresys"}
+        )
+        assert 200 == response.status_code
+        assert (
+            "Stereotaxic Surgery for Delivery of Tracers by Iontophoresis V.3"
+            == response.json()[0]["protocol_name"]
+        )
+
     @patch("aind_smartsheet_service_server.route.get_smartsheet")
     async def test_get_perfusions(
         self,
@@ -226,6 +456,293 @@ class TestRoutes:
         assert 200 == response.status_code
         assert expected_response == response.json()
 
+    @patch("aind_smartsheet_service_server.route.get_smartsheet")
+    async def test_get_perfusions_multiple_filters(
+        self,
+        mock_get_sheet: AsyncMock,
+        client: TestClient,
+        mock_raw_perfusions_sheet: dict,
+    ):
+        """Tests repeated and prefix query parameters for perfusions"""
+
+        mock_get_sheet.return_value = mock_raw_perfusions_sheet
+
+        response = client.get(
+            "/perfusions",
+            params={
+                "subject_id": ["000000", "689418"],
+                "experimenter": "Person S",
+            },
+        )
+        assert 200 == response.status_code
+        assert ["689418"] == [r["subject_id"] for r in response.json()]
+
+        response = client.get(
+            "/perfusions",
+            params={
+                "subject_id_prefix": "6894",
+                "modified_before": "2000-01-01T00:00:00",
+            },
+        )
+        assert 200 == response.status_code
+        assert [] == response.json()
+
+    @patch("aind_smartsheet_service_server.route.get_smartsheet")
+    async def test_get_changes(
+        self,
+        mock_get_sheet: AsyncMock,
+        client: TestClient,
+        mock_raw_funding_sheet: dict,
+    ):
+        """Tests the changes feed between two versions of a sheet"""
+
+        mock_get_sheet.return_value = mock_raw_funding_sheet
+        response = client.get(
+            "/changes/funding", params={"since_version": 105}
+        )
+        assert 200 == response.status_code
+        assert {
+            "sheet_id": 100,
+            "version": 105,
+            "since_version": 105,
+            "since": None,
+            "added": [],
+            "updated": [],
+            "deleted": [],
+        } == response.json()
+
+        new_sheet = copy.deepcopy(mock_raw_funding_sheet)
+        new_sheet["version"] = 106
+        new_sheet["modifiedAt"] = "2030-01-02T00:00:00Z"
+        deleted_row = new_sheet["rows"].pop(0)
+        new_sheet["rows"][0]["modifiedAt"] = "2030-01-01T00:00:00Z"
+        mock_get_sheet.return_value = new_sheet
+        response = client.get(
+            "/changes/funding", params={"since_version": 105}
+        )
+        assert 200 == response.status_code
+        assert [] == response.json()["added"]
+        assert [new_sheet["rows"][0]["id"]] == [
+            r["id"] for r in response.json()["updated"]
+        ]
+        assert (
+            "Ephys Platform"
+            == response.json()["updated"][0]["data"]["project_name"]
+        )
+        assert [deleted_row["id"]] == response.json()["deleted"]
+
+        response = client.get(
+            "/changes/funding", params={"since": "2029-12-31T00:00:00"}
+        )
+        assert 200 == response.status_code
+        assert 1 == len(response.json()["updated"])
+        assert [deleted_row["id"]] == response.json()["deleted"]
+
+    @patch("aind_smartsheet_service_server.route.get_smartsheet")
+    async def test_get_changes_errors(
+        self,
+        mock_get_sheet: AsyncMock,
+        client: TestClient,
+        mock_raw_funding_sheet: dict,
+    ):
+        """Tests the changes feed rejects bad or expired requests"""
+
+        mock_get_sheet.return_value = mock_raw_funding_sheet
+        response = client.get("/changes/funding")
+        assert 400 == response.status_code
+        response = client.get("/changes/funding", params={"since_version": 1})
+        assert 410 == response.status_code
+        response = client.get("/changes/unknown", params={"since_version": 1})
+        assert 404 == response.status_code
+
+    @patch("aind_smartsheet_service_server.route.get_smartsheet")
+    async def test_get_events(
+        self,
+        mock_get_sheet: AsyncMock,
+        mock_raw_funding_sheet: dict,
+    ):
+        """Tests the event stream pushes sheet updates and keepalives"""
+
+        mock_get_sheet.return_value = mock_raw_funding_sheet
+        await get_sheet_snapshot(sheet_id=100, access_token="abc")
+        request = MagicMock()
+        request.is_disconnected = AsyncMock(side_effect=[False, False, True])
+        response = await get_events(
+            request=request, sheet=["funding"], include_rows=True
+        )
+        summary_request = MagicMock()
+        summary_request.is_disconnected = AsyncMock(side_effect=[False, True])
+        summary_response = await get_events(
+            request=summary_request, sheet=["funding"], include_rows=False
+        )
+        assert "text/event-stream" == response.media_type
+        stream = response.body_iterator
+        summary_stream = summary_response.body_iterator
+        assert ": connected\n\n" == await anext(stream)
+        assert ": connected\n\n" == await anext(summary_stream)
+
+        new_sheet = copy.deepcopy(mock_raw_funding_sheet)
+        new_sheet["version"] = 106
+        new_sheet["rows"][0]["modifiedAt"] = "2030-01-01T00:00:00Z"
+        snapshot_store.get_snapshot(sheet_id=100, raw_sheet=new_sheet)
+
+        lines = (await anext(stream)).splitlines()
+        assert ["event: sheet_updated", "id: 100:106"] == lines[:2]
+        data = json.loads(lines[2].removeprefix("data: "))
+        assert 106 == data["version"]
+        assert 105 == data["previous_version"]
+        assert [new_sheet["rows"][0]["id"]] == [
+            r["id"] for r in data["changes"]["updated"]
+        ]
+        lines = (await anext(summary_stream)).splitlines()
+        data = json.loads(lines[2].removeprefix("data: "))
+        assert "funding" == data["sheet_name"]
+        assert "changes" not in data
+
+        with patch.object(settings, "sse_keepalive_seconds", 0.01):
+            assert ": keepalive\n\n" == await anext(stream)
+        with pytest.raises(StopAsyncIteration):
+            await anext(stream)
+        with pytest.raises(StopAsyncIteration):
+            await anext(summary_stream)
+        assert set() == event_broker._subscriptions
+
+    @patch("aind_smartsheet_service_server.route.get_smartsheet")
+    async def test_get_sheet_snapshot_unchanged(
+        self,
+        mock_get_sheet: AsyncMock,
+        client: TestClient,
+        mock_raw_funding_sheet: dict,
+    ):
+        """Tests the cached sheet is only decoded again once the version of
+        its cached copy changes or the copy is evicted"""
+
+        async def download(**kwargs) -> dict:
+            """Cache the sheet as the cache decorator does."""
+            sheet_downloaded.set(True)
+            await backend.set(key, b"{}", expire=600)
+            return mock_raw_funding_sheet
+
+        mock_get_sheet.side_effect = download
+        backend = FastAPICache.get_backend()
+        key = sheet_cache_key(100, "abc")
+        snapshot = await get_sheet_snapshot(sheet_id=100, access_token="abc")
+        assert snapshot is await get_sheet_snapshot(
+            sheet_id=100, access_token="abc"
+        )
+        assert 1 == mock_get_sheet.await_count
+
+        # Another worker cached a new version right away
+        await backend.set(sheet_version_key(100, "abc"), b"41", expire=600)
+        assert snapshot is await get_sheet_snapshot(
+            sheet_id=100, access_token="abc"
+        )
+        assert 2 == mock_get_sheet.await_count
+        assert snapshot is await get_sheet_snapshot(
+            sheet_id=100, access_token="abc"
+        )
+        assert 2 == mock_get_sheet.await_count
+
+        await evict_sheet(sheet_id=100, access_tokens=["abc"])
+        await get_sheet_snapshot(sheet_id=100, access_token="abc")
+        assert 3 == mock_get_sheet.await_count
+
+    @patch("aind_smartsheet_service_server.route.get_smartsheet")
+    async def test_get_sheet(
+        self,
+        mock_get_sheet: AsyncMock,
+        client: TestClient,
+        mock_raw_funding_sheet: dict,
+    ):
+        """Tests a built-in sheet served through the generic endpoint"""
+
+        mock_get_sheet.return_value = mock_raw_funding_sheet
+        project_name = (
+            "Discovery-Neuromodulator circuit dynamics during foraging"
+        )
+        params = {
+            "project_name": project_name,
+            "subproject": "Subproject 2 Molecular Anatomy Cell Types",
+        }
+        response = client.get("/sheets/funding", params=params)
+        assert 200 == response.status_code
+        assert client.get("/funding", params=params).json() == response.json()
+        assert 2 == len(response.json())
+        response = client.get(
+            "/sheets/funding",
+            params={"project_name_prefix": "Discovery-Neuromodulator"},
+        )
+        assert {project_name} == {r["project_name"] for r in response.json()}
+        response = client.get(
+            "/sheets/funding", params={"modified_before": "2000-01-01"}
+        )
+        assert [] == response.json()
+        response = client.get("/sheets/funding")
+        assert len(mock_raw_funding_sheet["rows"]) == len(response.json())
+
+    async def test_get_sheet_errors(self, client: TestClient):
+        """Tests unknown sheets and filters on other columns are rejected"""
+
+        response = client.get("/sheets/unknown")
+        assert 404 == response.status_code
+        response = client.get("/sheets/funding", params={"fundees": "a"})
+        assert 400 == response.status_code
+        assert "project_name, subproject" in response.json()["detail"]
+        response = client.get("/events", params={"sheet": "unknown"})
+        assert 404 == response.status_code
+
+    @patch("aind_smartsheet_service_server.route.get_smartsheet")
+    async def test_get_sheet_without_model(
+        self,
+        mock_get_sheet: AsyncMock,
+        client: TestClient,
+        mock_raw_example_sheet: dict,
+    ):
+        """Tests a configured sheet without a model is mapped by title"""
+
+        mock_get_sheet.return_value = mock_raw_example_sheet
+        sheet_registry.register(
+            RegisteredSheet(
+                name="example",
+                sheet_id=200,
+                access_token="abcdef2",
+                index_columns=["Funding Institution", "Renamed Column"],
+                ttl_seconds=60,
+            )
+        )
+        backend = FastAPICache.get_backend()
+        key = sheet_cache_key(200, "abcdef2")
+        await backend.set(key, b"{}", expire=500)
+        try:
+            response = client.get("/sheets/example")
+            assert await backend.get(key) is None
+            assert 200 == response.status_code
+            assert 3 == len(response.json())
+            assert {
+                "Project Name": "AIND Scientific Activities",
+                "Project Code": "122-01-001-10",
+                "Funding Institution": "Allen Institute",
+                "Grant Number": None,
+                "Investigators": "person.two@acme.org, J Smith, Mary Smith",
+            } == response.json()[0]
+            response = client.get(
+                "/sheets/example",
+                params={"Funding Institution": "Allen Institute"},
+            )
+            assert {"Allen Institute"} == {
+                r["Funding Institution"] for r in response.json()
+            }
+            response = client.get(
+                "/sheets/example", params={"Renamed Column": "a"}
+            )
+            assert [] == response.json()
+            response = client.get(
+                "/changes/example", params={"since_version": 40}
+            )
+            assert 200 == response.status_code
+        finally:
+            sheet_registry.unregister("example")
+
     @patch("aind_smartsheet_service_server.route.get_smartsheet")
     async def test_get_exaspim_info(
         self,
@@ -249,6 +766,11 @@ class TestRoutes:
         assert len(response.json()["sample_tracking_info"]) == 1
         assert len(response.json()["imaging_queue_info"]) == 1
         assert len(response.json()["qc_sheet_info"]) == 1
+        server_timing = response.headers["Server-Timing"]
+        assert server_timing.startswith("cache_lookup;dur=")
+        assert "filtering;dur=" in server_timing
+        assert "parsing;dur=" in server_timing
+        assert "serialization;dur=" in server_timing
 
 
 if __name__ == "__main__":
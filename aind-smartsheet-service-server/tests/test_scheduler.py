@@ -0,0 +1,248 @@
+"""Tests scheduler module"""
+
+import asyncio
+import unittest
+
+from prometheus_client import REGISTRY
+
+from aind_smartsheet_service_server.scheduler import (
+    FetchQueueFull,
+    FetchScheduler,
+    WeightedSemaphore,
+)
+
+
+class TestWeightedSemaphore(unittest.IsolatedAsyncioTestCase):
+    """Test methods in WeightedSemaphore class"""
+
+    async def test_waiters_served_in_order(self):
+        """Tests a light waiter does not overtake a heavy one"""
+        semaphore = WeightedSemaphore(capacity=2)
+        await semaphore.acquire(1)
+        order = []
+
+        async def acquire(name: str, weight: int) -> None:
+            """Acquire and record the order."""
+            await semaphore.acquire(weight)
+            order.append(name)
+
+        heavy = asyncio.create_task(acquire("heavy", 2))
+        light = asyncio.create_task(acquire("light", 1))
+        await asyncio.sleep(0)
+        # One unit is free, but the heavy waiter is first in line
+        self.assertEqual([], order)
+        semaphore.release(1)
+        await heavy
+        self.assertEqual(["heavy"], order)
+        semaphore.release(2)
+        await light
+        self.assertEqual(["heavy", "light"], order)
+        self.assertEqual(1, semaphore.available)
+
+    async def test_weight_capped(self):
+        """Tests a weight above the capacity can still be acquired"""
+        semaphore = WeightedSemaphore(capacity=2)
+        await semaphore.acquire(5)
+        self.assertEqual(0, semaphore.available)
+        semaphore.release(5)
+        self.assertEqual(2, semaphore.available)
+
+    async def test_cancelled_waiter(self):
+        """Tests a cancelled waiter lets the next one through"""
+        semaphore = WeightedSemaphore(capacity=2)
+        await semaphore.acquire(1)
+        heavy = asyncio.create_task(semaphore.acquire(2))
+        light = asyncio.create_task(semaphore.acquire(1))
+        await asyncio.sleep(0)
+        heavy.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await heavy
+        await light
+        self.assertEqual(0, semaphore.available)
+
+    async def test_released_before_cancel_handled(self):
+        """Tests a cancelled waiter is skipped before its task handles it"""
+        semaphore = WeightedSemaphore(capacity=1)
+        await semaphore.acquire(1)
+        waiter = asyncio.create_task(semaphore.acquire(1))
+        await asyncio.sleep(0)
+        # Cancelling the task cancels its future right away
+        waiter.cancel()
+        semaphore.release(1)
+        with self.assertRaises(asyncio.CancelledError):
+            await waiter
+        self.assertEqual(0, semaphore.waiting)
+        self.assertEqual(1, semaphore.available)
+
+    async def test_cancelled_after_grant(self):
+        """Tests capacity granted to a cancelled waiter is returned"""
+        semaphore = WeightedSemaphore(capacity=1)
+        await semaphore.acquire(1)
+        waiter = asyncio.create_task(semaphore.acquire(1))
+        await asyncio.sleep(0)
+        semaphore.release(1)
+        waiter.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await waiter
+        self.assertEqual(1, semaphore.available)
+
+
+class TestFetchScheduler(unittest.IsolatedAsyncioTestCase):
+    """Test methods in FetchScheduler class"""
+
+    async def test_fetch_joins_running_download(self):
+        """Tests concurrent fetches of a sheet share one download"""
+        scheduler = FetchScheduler(capacity=2, weight_rows=10)
+        started = asyncio.Event()
+        finish = asyncio.Event()
+        calls = []
+
+        async def download() -> str:
+            """Download that waits to be finished."""
+            calls.append(1)
+            started.set()
+            await finish.wait()
+            return "sheet"
+
+        before = (
+            REGISTRY.get_sample_value(
+                "smartsheet_service_fetch_joins_total", {"sheet_id": "1"}
+            )
+            or 0
+        )
+        first = asyncio.create_task(scheduler.fetch(1, "token", download))
+        await started.wait()
+        second = asyncio.create_task(scheduler.fetch(1, "token", download))
+        await asyncio.sleep(0)
+        finish.set()
+        self.assertEqual(
+            ["sheet", "sheet"], await asyncio.gather(first, second)
+        )
+        self.assertEqual(1, len(calls))
+        self.assertEqual(
+            before + 1,
+            REGISTRY.get_sample_value(
+                "smartsheet_service_fetch_joins_total", {"sheet_id": "1"}
+            ),
+        )
+        # Once finished, the next fetch downloads again
+        finish.set()
+        await scheduler.fetch(1, "token", download)
+        self.assertEqual(2, len(calls))
+
+    async def test_fetch_shares_errors(self):
+        """Tests an error of a download is raised to every waiter"""
+        scheduler = FetchScheduler(capacity=2, weight_rows=10)
+
+        async def download() -> str:
+            """Failing download."""
+            await asyncio.sleep(0)
+            raise ValueError("boom")
+
+        results = await asyncio.gather(
+            scheduler.fetch(1, "token", download),
+            scheduler.fetch(1, "token", download),
+            return_exceptions=True,
+        )
+        self.assertTrue(all(isinstance(r, ValueError) for r in results))
+
+    async def test_fetch_limited_per_token(self):
+        """Tests heavy downloads queue per token, not across tokens"""
+        scheduler = FetchScheduler(capacity=2, weight_rows=10)
+        scheduler.record_rows(1, 15)
+        scheduler.record_rows(2, 5)
+        running = []
+        finish = asyncio.Event()
+
+        async def download(name: str) -> str:
+            """Download that records it is running."""
+            running.append(name)
+            await finish.wait()
+            return name
+
+        def fetch(sheet_id: int, token: str) -> asyncio.Task:
+            """Start a fetch."""
+            return asyncio.create_task(
+                scheduler.fetch(
+                    sheet_id, token, lambda: download(f"{sheet_id}{token}")
+                )
+            )
+
+        tasks = [fetch(1, "a"), fetch(2, "a"), fetch(1, "b")]
+        await asyncio.sleep(0.01)
+        # Sheet 1 takes all the capacity of token a
+        self.assertEqual(["1a", "1b"], running)
+        finish.set()
+        self.assertEqual(["1a", "2a", "1b"], await asyncio.gather(*tasks))
+
+    async def test_fetch_cancelled_with_last_waiter(self):
+        """Tests a queued download is cancelled once nobody waits for it"""
+        scheduler = FetchScheduler(capacity=1, weight_rows=10)
+        finish = asyncio.Event()
+        calls = []
+
+        async def download() -> str:
+            """Download that waits to be finished."""
+            calls.append(1)
+            await finish.wait()
+            return "sheet"
+
+        running = asyncio.create_task(scheduler.fetch(1, "token", download))
+        first = asyncio.create_task(scheduler.fetch(2, "token", download))
+        second = asyncio.create_task(scheduler.fetch(2, "token", download))
+        await asyncio.sleep(0.01)
+        (limit,) = scheduler._limits.values()
+        first.cancel()
+        await asyncio.sleep(0)
+        # The second request still waits for the download
+        self.assertEqual(1, limit.waiting)
+        second.cancel()
+        await asyncio.sleep(0.01)
+        self.assertEqual(0, limit.waiting)
+        # A download that started is left to finish without waiters
+        running.cancel()
+        await asyncio.sleep(0.01)
+        self.assertEqual(1, len(scheduler._in_flight))
+        finish.set()
+        self.assertEqual("sheet", await scheduler.fetch(1, "token", download))
+        self.assertEqual(1, len(calls))
+        self.assertEqual({}, scheduler._in_flight)
+        self.assertEqual(1, limit.available)
+
+    async def test_fetch_queue_limit(self):
+        """Tests downloads past the queue limit are rejected"""
+        scheduler = FetchScheduler(capacity=1, weight_rows=10, queue_limit=1)
+        finish = asyncio.Event()
+
+        async def download() -> str:
+            """Download that waits to be finished."""
+            await finish.wait()
+            return "sheet"
+
+        running = asyncio.create_task(scheduler.fetch(1, "token", download))
+        queued = asyncio.create_task(scheduler.fetch(2, "token", download))
+        await asyncio.sleep(0.01)
+        with self.assertRaises(FetchQueueFull):
+            await scheduler.fetch(3, "token", download)
+        # Joining a download and other tokens are not limited
+        joined = asyncio.create_task(scheduler.fetch(2, "token", download))
+        other = asyncio.create_task(scheduler.fetch(3, "other", download))
+        finish.set()
+        self.assertEqual(
+            ["sheet"] * 4, await asyncio.gather(running, queued, joined, other)
+        )
+
+    def test_weight(self):
+        """Tests weights follow the rows of the last download"""
+        scheduler = FetchScheduler(capacity=3, weight_rows=10)
+        self.assertEqual(1, scheduler.weight(1))
+        scheduler.record_rows(1, 0)
+        self.assertEqual(1, scheduler.weight(1))
+        scheduler.record_rows(1, 11)
+        self.assertEqual(2, scheduler.weight(1))
+        scheduler.record_rows(1, 1000)
+        self.assertEqual(3, scheduler.weight(1))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,73 @@
+"""Tests search module"""
+
+import unittest
+
+from aind_smartsheet_service_server.search import (
+    PrefixTrie,
+    SearchIndex,
+    normalize_text,
+    trigrams,
+)
+
+
+class TestSearch(unittest.TestCase):
+    """Test methods in search module"""
+
+    @classmethod
+    def setUpClass(cls) -> None:
+        """Set up class with an example index."""
+        cls.search_index = SearchIndex(
+            documents=[
+                ["Immunolabeling of a Whole Mouse Brain", "Immunolabeling"],
+                [
+                    "Aqueous (SBiP) Delipidation of a Whole Mouse Brain",
+                    "Aqueous Delipidation",
+                ],
+                ["Delipidation", None],
+                [None, None],
+                ["Mouse Cardiac Perfusion Fixation", "Perfusion"],
+            ]
+        )
+
+    def test_normalize_text(self):
+        """Tests normalize_text lower cases and collapses whitespace"""
+        self.assertEqual("whole mouse", normalize_text("  Whole\tMOUSE "))
+
+    def test_trigrams(self):
+        """Tests trigrams pads the text"""
+        self.assertEqual({"  a", " ab", "ab "}, trigrams("AB"))
+
+    def test_prefix_trie(self):
+        """Tests PrefixTrie lookups"""
+        trie = PrefixTrie()
+        trie.insert("mouse", 1)
+        trie.insert("mount", 2)
+        self.assertEqual({1, 2}, trie.lookup("mou"))
+        self.assertEqual({1}, trie.lookup("mous"))
+        self.assertEqual(set(), trie.lookup("rat"))
+
+    def test_search_exact_before_prefix(self):
+        """Tests exact matches rank above prefix matches"""
+        results = self.search_index.search("delipidation")
+        self.assertEqual([2, 1], [doc_id for doc_id, _ in results])
+
+    def test_search_word_prefixes(self):
+        """Tests every query word must prefix a word of the document"""
+        results = self.search_index.search("whole mou deli")
+        self.assertEqual([1], [doc_id for doc_id, _ in results])
+
+    def test_search_fuzzy(self):
+        """Tests misspelled queries match by trigram similarity"""
+        results = self.search_index.search("perfsion")
+        self.assertEqual(4, results[0][0])
+        self.assertLess(results[0][1], 1.0)
+
+    def test_search_limit(self):
+        """Tests limit and empty queries"""
+        self.assertEqual(1, len(self.search_index.search("mouse", limit=1)))
+        self.assertEqual([], self.search_index.search(" ?! "))
+        self.assertEqual([], self.search_index.search("zzzzzz"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,132 @@
+"""Tests shared module"""
+
+import json
+import os
+import tempfile
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+
+from fastapi import HTTPException
+
+from aind_smartsheet_service_server.shared import SharedSheets
+from aind_smartsheet_service_server.snapshot import snapshot_store
+
+RESOURCES_DIR = Path(os.path.dirname(os.path.realpath(__file__))) / "resources"
+
+
+class TestSharedSheets(unittest.IsolatedAsyncioTestCase):
+    """Test methods in SharedSheets class"""
+
+    @classmethod
+    def setUpClass(cls) -> None:
+        """Set up class with loaded json."""
+
+        with open(RESOURCES_DIR / "example_sheet.json", "r") as f:
+            cls.example_sheet = json.load(f)
+
+    def setUp(self):
+        """Publish to a fresh directory for each test."""
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.shared_sheets = SharedSheets(Path(self.tmp_dir.name) / "sheets")
+        snapshot_store.clear()
+
+    def tearDown(self):
+        """Remove the published files."""
+        self.tmp_dir.cleanup()
+        snapshot_store.clear()
+
+    def test_publish(self):
+        """Tests a sheet is written to its file without temporary files"""
+        self.shared_sheets.publish(1, "abc", self.example_sheet)
+        path = self.shared_sheets.path(1, "abc")
+        self.assertNotIn("abc", path.name)
+        self.assertEqual(self.example_sheet, json.loads(path.read_bytes()))
+        self.assertEqual([path], list(self.shared_sheets.directory.iterdir()))
+        self.assertEqual(0o644, path.stat().st_mode & 0o777)
+
+    def test_publish_error(self):
+        """Tests the temporary file is removed if writing fails"""
+        with (
+            patch(
+                "aind_smartsheet_service_server.shared.os.replace",
+                side_effect=OSError("disk full"),
+            ),
+            self.assertRaises(OSError),
+        ):
+            self.shared_sheets.publish(1, "abc", self.example_sheet)
+        self.assertEqual([], list(self.shared_sheets.directory.iterdir()))
+
+    async def test_get_snapshot_not_published(self):
+        """Tests a 503 error is raised until a sheet is published"""
+        with self.assertRaises(HTTPException) as e:
+            await self.shared_sheets.get_snapshot(1, "abc")
+        self.assertEqual(503, e.exception.status_code)
+        self.assertIn("Retry-After", e.exception.headers)
+
+    async def test_get_snapshot(self):
+        """Tests published files are loaded once per publication"""
+        self.shared_sheets.publish(1, "abc", self.example_sheet)
+        snapshot = await self.shared_sheets.get_snapshot(1, "abc")
+        self.assertEqual(self.example_sheet["version"], snapshot.version)
+        with patch(
+            "aind_smartsheet_service_server.shared.validate_sheet"
+        ) as mock_validate:
+            self.assertIs(
+                snapshot, await self.shared_sheets.get_snapshot(1, "abc")
+            )
+        mock_validate.assert_not_called()
+
+        # A new version is loaded once it is published
+        self.shared_sheets.publish(
+            1, "abc", {**self.example_sheet, "version": 100}
+        )
+        new_snapshot = await self.shared_sheets.get_snapshot(1, "abc")
+        self.assertEqual(100, new_snapshot.version)
+
+        # A dropped snapshot is loaded again
+        snapshot_store.clear()
+        self.assertEqual(
+            100, (await self.shared_sheets.get_snapshot(1, "abc")).version
+        )
+
+    async def test_get_snapshot_tokens(self):
+        """Tests a sheet published with two tokens is loaded from the file
+        of the requested token"""
+        self.shared_sheets.publish(1, "abc", self.example_sheet)
+        self.shared_sheets.publish(
+            1, "def", {**self.example_sheet, "version": 100}
+        )
+        snapshot = await self.shared_sheets.get_snapshot(1, "abc")
+        self.assertEqual(self.example_sheet["version"], snapshot.version)
+        self.assertEqual(
+            100, (await self.shared_sheets.get_snapshot(1, "def")).version
+        )
+        self.assertEqual(
+            self.example_sheet["version"],
+            (await self.shared_sheets.get_snapshot(1, "abc")).version,
+        )
+
+    async def test_is_loaded(self):
+        """Tests whether the published file is the one last loaded"""
+        self.assertFalse(self.shared_sheets.is_loaded(1, "abc"))
+        self.shared_sheets.publish(1, "abc", self.example_sheet)
+        self.assertFalse(self.shared_sheets.is_loaded(1, "abc"))
+        await self.shared_sheets.get_snapshot(1, "abc")
+        self.assertTrue(self.shared_sheets.is_loaded(1, "abc"))
+        # Still loaded once the snapshot is dropped
+        with patch.object(snapshot_store, "memory_budget", 1):
+            snapshot_store.get_snapshot(
+                sheet_id=2, raw_sheet=self.example_sheet
+            )
+        self.assertIsNone(snapshot_store.get_current(1))
+        self.assertTrue(self.shared_sheets.is_loaded(1, "abc"))
+        self.assertFalse(self.shared_sheets.is_loaded(1, "def"))
+        self.shared_sheets.publish(
+            1, "abc", {**self.example_sheet, "version": 100}
+        )
+        self.assertFalse(self.shared_sheets.is_loaded(1, "abc"))
+
+
+if __name__ == "__main__":
+    unittest.main()
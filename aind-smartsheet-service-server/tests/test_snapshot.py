@@ -0,0 +1,265 @@
+"""Tests snapshot module"""
+
+import copy
+import json
+import os
+import unittest
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Optional
+from unittest.mock import MagicMock, patch
+
+from prometheus_client import REGISTRY
+from pydantic import BaseModel, Field
+
+from aind_smartsheet_service_server.configs import settings
+from aind_smartsheet_service_server.models import SheetFields
+from aind_smartsheet_service_server.snapshot import (
+    CELL_BYTES,
+    ROW_BYTES,
+    SnapshotStore,
+)
+
+RESOURCES_DIR = Path(os.path.dirname(os.path.realpath(__file__))) / "resources"
+
+
+class ExampleModel(BaseModel):
+    """Model of the project name column of the example sheet"""
+
+    project_name: Optional[str] = Field(
+        None, title="Project Name", validation_alias="3981351074090884"
+    )
+
+
+class TestSnapshotStore(unittest.TestCase):
+    """Test methods in SnapshotStore and SheetSnapshot classes"""
+
+    @classmethod
+    def setUpClass(cls) -> None:
+        """Set up class with loaded json."""
+
+        with open(RESOURCES_DIR / "example_sheet.json", "r") as f:
+            cls.example_sheet = json.load(f)
+
+    def test_get_snapshot_same_version(self):
+        """Tests snapshot is reused while the version is unchanged"""
+        store = SnapshotStore()
+        snapshot1 = store.get_snapshot(
+            sheet_id=1, raw_sheet=self.example_sheet
+        )
+        snapshot2 = store.get_snapshot(
+            sheet_id=1, raw_sheet=self.example_sheet
+        )
+        self.assertIs(snapshot1, snapshot2)
+        self.assertEqual(40, snapshot1.version)
+        self.assertEqual(3, len(snapshot1.sheet_fields.rows))
+
+    def test_get_snapshot_new_version(self):
+        """Tests snapshot is rebuilt when the version changes"""
+        store = SnapshotStore()
+        snapshot1 = store.get_snapshot(
+            sheet_id=1, raw_sheet=self.example_sheet
+        )
+        new_sheet = dict(self.example_sheet, version=41)
+        snapshot2 = store.get_snapshot(sheet_id=1, raw_sheet=new_sheet)
+        self.assertIsNot(snapshot1, snapshot2)
+        self.assertEqual(41, snapshot2.version)
+
+    def test_derive(self):
+        """Tests derived aggregates are computed once per version"""
+        store = SnapshotStore()
+        compute = MagicMock(return_value=b"[]")
+        snapshot = store.get_snapshot(sheet_id=1, raw_sheet=self.example_sheet)
+        self.assertEqual(b"[]", snapshot.derive("names", compute))
+        self.assertEqual(b"[]", snapshot.derive("names", compute))
+        compute.assert_called_once_with(snapshot)
+
+        new_sheet = dict(self.example_sheet, version=41)
+        new_snapshot = store.get_snapshot(sheet_id=1, raw_sheet=new_sheet)
+        new_snapshot.derive("names", compute)
+        self.assertEqual(2, compute.call_count)
+
+    def test_column_mapping(self):
+        """Tests column mappings are resolved once per version and used by
+        the handler"""
+        store = SnapshotStore()
+        snapshot = store.get_snapshot(sheet_id=1, raw_sheet=self.example_sheet)
+        mapping = snapshot.column_mapping(ExampleModel)
+        self.assertIs(mapping, snapshot.column_mapping(ExampleModel))
+        self.assertEqual(
+            3981351074090884, snapshot.column_id(ExampleModel, "project_name")
+        )
+        with patch.object(settings, "column_mapping_mode", "title"):
+            new_sheet = copy.deepcopy(self.example_sheet)
+            new_sheet["version"] = 41
+            for column in new_sheet["columns"]:
+                column["id"] += 1
+            for row in new_sheet["rows"]:
+                for cell in row["cells"]:
+                    cell["columnId"] += 1
+            new_snapshot = store.get_snapshot(sheet_id=1, raw_sheet=new_sheet)
+            handler = new_snapshot.get_handler(model=ExampleModel)
+            parsed = handler.get_parsed_sheet_model(model=ExampleModel)
+        self.assertEqual(
+            ["AIND Scientific Activities", None, "v1omFISH"],
+            [p.project_name for p in parsed],
+        )
+
+    def _next_version(self) -> dict:
+        """Copy of the example sheet with a deleted, an updated and an added
+        row."""
+        new_sheet = copy.deepcopy(self.example_sheet)
+        new_sheet["version"] = 41
+        new_sheet["modifiedAt"] = "2024-01-02T00:00:00Z"
+        deleted_row = new_sheet["rows"].pop(0)
+        new_sheet["rows"][0]["modifiedAt"] = "2024-01-01T00:00:00Z"
+        added_row = copy.deepcopy(new_sheet["rows"][1])
+        added_row["id"] = 1
+        added_row["createdAt"] = "2024-01-02T00:00:00Z"
+        added_row["modifiedAt"] = "2024-01-02T00:00:00Z"
+        new_sheet["rows"].append(added_row)
+        return new_sheet, deleted_row["id"]
+
+    def test_changes_since_version(self):
+        """Tests changes between two retained versions"""
+        store = SnapshotStore()
+        store.get_snapshot(sheet_id=1, raw_sheet=self.example_sheet)
+        new_sheet, deleted_id = self._next_version()
+        snapshot = store.get_snapshot(sheet_id=1, raw_sheet=new_sheet)
+        baseline = store.get_baseline(sheet_id=1, version=40)
+        self.assertEqual(40, baseline.version)
+        added, updated, deleted = snapshot.changes_since(baseline=baseline)
+        self.assertEqual(([2], [0], [deleted_id]), (added, updated, deleted))
+        self.assertIsNone(store.get_baseline(sheet_id=1, version=39))
+        self.assertIsNone(store.get_baseline(sheet_id=2, version=40))
+
+    def test_changes_since_time(self):
+        """Tests changes since a timestamp"""
+        store = SnapshotStore()
+        store.get_snapshot(sheet_id=1, raw_sheet=self.example_sheet)
+        new_sheet, deleted_id = self._next_version()
+        snapshot = store.get_snapshot(sheet_id=1, raw_sheet=new_sheet)
+        since = datetime(2023, 12, 31, tzinfo=timezone.utc)
+        baseline = store.get_baseline(sheet_id=1, since=since)
+        self.assertEqual(40, baseline.version)
+        added, updated, deleted = snapshot.changes_since(
+            baseline=baseline, since=since
+        )
+        self.assertEqual(([2], [0], [deleted_id]), (added, updated, deleted))
+        self.assertIsNone(
+            store.get_baseline(
+                sheet_id=1, since=datetime(2020, 1, 1, tzinfo=timezone.utc)
+            )
+        )
+
+    def test_history_size(self):
+        """Tests only history_size versions are retained"""
+        store = SnapshotStore(history_size=1)
+        store.get_snapshot(sheet_id=1, raw_sheet=self.example_sheet)
+        new_sheet, _ = self._next_version()
+        store.get_snapshot(sheet_id=1, raw_sheet=new_sheet)
+        store.get_snapshot(sheet_id=1, raw_sheet=self.example_sheet)
+        self.assertIsNone(store.get_baseline(sheet_id=1, version=41))
+        self.assertEqual(
+            40, store.get_baseline(sheet_id=1, version=40).version
+        )
+
+    def test_clear(self):
+        """Tests clear removes all snapshots"""
+        store = SnapshotStore()
+        snapshot1 = store.get_snapshot(
+            sheet_id=1, raw_sheet=self.example_sheet
+        )
+        store.clear()
+        snapshot2 = store.get_snapshot(
+            sheet_id=1, raw_sheet=self.example_sheet
+        )
+        self.assertIsNot(snapshot1, snapshot2)
+
+    def test_size_bytes(self):
+        """Tests the memory of a snapshot is estimated from its cells"""
+        store = SnapshotStore()
+        snapshot = store.get_snapshot(sheet_id=1, raw_sheet=self.example_sheet)
+        cells = sum(len(r.cells) for r in snapshot.sheet_fields.rows)
+        self.assertEqual(
+            cells * CELL_BYTES + 3 * ROW_BYTES, snapshot.size_bytes
+        )
+        self.assertEqual(snapshot.size_bytes, store.size_bytes)
+
+    def test_memory_budget(self):
+        """Tests least recently used snapshots are dropped past the budget"""
+        size = (
+            SnapshotStore()
+            .get_snapshot(sheet_id=1, raw_sheet=self.example_sheet)
+            .size_bytes
+        )
+        store = SnapshotStore(memory_budget=2 * size)
+        evictions = REGISTRY.get_sample_value(
+            "smartsheet_service_snapshot_evictions_total", {"sheet_id": "2"}
+        )
+        snapshot1 = store.get_snapshot(
+            sheet_id=1, raw_sheet=self.example_sheet
+        )
+        store.get_snapshot(sheet_id=2, raw_sheet=self.example_sheet)
+        # Sheet 1 becomes the most recently used
+        store.get_snapshot(sheet_id=1, raw_sheet=self.example_sheet)
+        store.get_snapshot(sheet_id=3, raw_sheet=self.example_sheet)
+        self.assertIs(snapshot1, store.get_current(1))
+        self.assertIsNone(store.get_current(2))
+        self.assertIsNotNone(store.get_current(3))
+        self.assertEqual(2 * size, store.size_bytes)
+        self.assertEqual(
+            0,
+            REGISTRY.get_sample_value(
+                "smartsheet_service_snapshot_bytes", {"sheet_id": "2"}
+            ),
+        )
+        self.assertEqual(
+            (evictions or 0) + 1,
+            REGISTRY.get_sample_value(
+                "smartsheet_service_snapshot_evictions_total",
+                {"sheet_id": "2"},
+            ),
+        )
+
+    def test_memory_budget_keeps_latest(self):
+        """Tests the latest snapshot is kept even if it exceeds the budget"""
+        store = SnapshotStore(memory_budget=1)
+        store.get_snapshot(sheet_id=1, raw_sheet=self.example_sheet)
+        store.get_snapshot(sheet_id=2, raw_sheet=self.example_sheet)
+        self.assertIsNone(store.get_current(1))
+        self.assertIsNotNone(store.get_current(2))
+
+    def test_touch(self):
+        """Tests a touched snapshot is dropped last without notifying
+        listeners"""
+        store = SnapshotStore()
+        listener = MagicMock()
+        store.add_listener(listener)
+        snapshot = store.add_snapshot(
+            sheet_id=1,
+            sheet_fields=SheetFields.model_validate(self.example_sheet),
+        )
+        store.get_snapshot(sheet_id=2, raw_sheet=self.example_sheet)
+        store.touch(1)
+        store.touch(3)
+        store.memory_budget = 2 * snapshot.size_bytes
+        store.get_snapshot(sheet_id=3, raw_sheet=self.example_sheet)
+        self.assertIs(snapshot, store.get_current(1))
+        self.assertIsNone(store.get_current(2))
+        listener.assert_not_called()
+
+    def test_get_version(self):
+        """Tests the version of a dropped snapshot is still reported"""
+        store = SnapshotStore(memory_budget=1)
+        self.assertIsNone(store.get_version(1))
+        store.get_snapshot(sheet_id=1, raw_sheet=self.example_sheet)
+        store.get_snapshot(sheet_id=2, raw_sheet=self.example_sheet)
+        self.assertIsNone(store.get_current(1))
+        self.assertEqual(40, store.get_version(1))
+        store.clear()
+        self.assertIsNone(store.get_version(1))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,175 @@
+"""Tests tracing module"""
+
+import json
+import tempfile
+from pathlib import Path
+from typing import Any, Generator
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+from fastapi import HTTPException
+from fastapi_cache import FastAPICache
+from opentelemetry.sdk.trace import TracerProvider
+from opentelemetry.sdk.trace.export import SimpleSpanProcessor
+from opentelemetry.sdk.trace.export.in_memory_span_exporter import (
+    InMemorySpanExporter,
+)
+from opentelemetry.trace import SpanKind, StatusCode
+from starlette.testclient import TestClient
+
+from aind_smartsheet_service_server.caching import sheet_cache_key
+from aind_smartsheet_service_server.route import get_sheet_snapshot
+from aind_smartsheet_service_server.shared import SharedSheets
+from aind_smartsheet_service_server.tracing import (
+    configure_tracing,
+    disable_tracing,
+    start_span,
+)
+
+TRACE_ID = "0af7651916cd43dd8448eb211c80319c"
+PARENT_ID = "b7ad6b7169203331"
+
+
+@pytest.fixture()
+def span_exporter() -> Generator[InMemorySpanExporter, Any, None]:
+    """Record spans in memory while the test runs."""
+    exporter = InMemorySpanExporter()
+    provider = TracerProvider()
+    provider.add_span_processor(SimpleSpanProcessor(exporter))
+    assert configure_tracing(tracer_provider=provider)
+    yield exporter
+    disable_tracing()
+
+
+@pytest.mark.asyncio
+class TestTracing:
+    """Test spans recorded by the middleware, routes and handler."""
+
+    @patch("smartsheet.sheets.Sheets.get_sheet")
+    async def test_request_spans(
+        self,
+        mock_get_sheet: MagicMock,
+        client: TestClient,
+        span_exporter: InMemorySpanExporter,
+        mock_raw_funding_sheet: dict,
+    ):
+        """Tests a request continues the caller's trace with spans for the
+        route, the sheet read, the Smartsheet call and parsing"""
+        mock_get_sheet.return_value.to_json.return_value = json.dumps(
+            mock_raw_funding_sheet
+        )
+        response = client.get(
+            "/funding",
+            headers={"traceparent": f"00-{TRACE_ID}-{PARENT_ID}-01"},
+        )
+        assert 200 == response.status_code
+        spans = {s.name: s for s in span_exporter.get_finished_spans()}
+        assert [
+            "smartsheet get_sheet",
+            "get_smartsheet",
+            "SheetHandler.parse_rows",
+            "GET /funding",
+        ] == list(spans)
+        assert {TRACE_ID} == {
+            format(s.context.trace_id, "032x") for s in spans.values()
+        }
+        server_span = spans["GET /funding"]
+        assert SpanKind.SERVER == server_span.kind
+        assert PARENT_ID == format(server_span.parent.span_id, "016x")
+        assert {
+            "http.request.method": "GET",
+            "url.path": "/funding",
+            "http.route": "/funding",
+            "http.response.status_code": 200,
+        } == dict(server_span.attributes)
+        assert SpanKind.CLIENT == spans["smartsheet get_sheet"].kind
+        assert {
+            "smartsheet.sheet_id": 100,
+            "smartsheet.cache_hit": False,
+        } == dict(spans["get_smartsheet"].attributes)
+        assert {"sheet.model": "FundingModel", "sheet.rows": 9} == dict(
+            spans["SheetHandler.parse_rows"].attributes
+        )
+
+    @patch("smartsheet.sheets.Sheets.get_sheet")
+    async def test_cache_hit_spans(
+        self,
+        mock_get_sheet: MagicMock,
+        client: TestClient,
+        span_exporter: InMemorySpanExporter,
+        mock_raw_funding_sheet: dict,
+    ):
+        """Tests a request served from the cache records a sheet read span
+        that is a cache hit"""
+        mock_get_sheet.return_value.to_json.return_value = json.dumps(
+            mock_raw_funding_sheet
+        )
+        # The cache decorator is disabled in tests, so the copy is cached here
+        await FastAPICache.get_backend().set(
+            sheet_cache_key(100, "abcdef2"), b"{}", expire=600
+        )
+        assert 200 == client.get("/project_names").status_code
+        assert 200 == client.get("/project_names").status_code
+        spans = [
+            s
+            for s in span_exporter.get_finished_spans()
+            if s.name == "get_smartsheet"
+        ]
+        assert [False, True] == [
+            s.attributes["smartsheet.cache_hit"] for s in spans
+        ]
+        mock_get_sheet.assert_called_once()
+
+    async def test_shared_sheet_spans(
+        self, span_exporter: InMemorySpanExporter, mock_raw_funding_sheet
+    ):
+        """Tests reading a shared sheet records whether its file was loaded
+        or already loaded"""
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            shared_sheets = SharedSheets(Path(tmp_dir))
+            shared_sheets.publish(100, "abc", mock_raw_funding_sheet)
+            with patch(
+                "aind_smartsheet_service_server.route.shared_sheets",
+                shared_sheets,
+            ):
+                await get_sheet_snapshot(sheet_id=100, access_token="abc")
+                await get_sheet_snapshot(sheet_id=100, access_token="abc")
+        assert [
+            {"smartsheet.sheet_id": 100, "smartsheet.cache_hit": False},
+            {"smartsheet.sheet_id": 100, "smartsheet.cache_hit": True},
+        ] == [dict(s.attributes) for s in span_exporter.get_finished_spans()]
+
+    @patch("aind_smartsheet_service_server.route.get_smartsheet")
+    async def test_error_spans(
+        self,
+        mock_get_smartsheet: AsyncMock,
+        client: TestClient,
+        span_exporter: InMemorySpanExporter,
+    ):
+        """Tests server errors and unmatched routes are recorded"""
+        mock_get_smartsheet.side_effect = HTTPException(status_code=502)
+        client.get("/project_names")
+        client.get("/unknown")
+        spans = span_exporter.get_finished_spans()
+        assert ["get_smartsheet", "GET /project_names", "GET"] == [
+            s.name for s in spans
+        ]
+        assert StatusCode.ERROR == spans[1].status.status_code
+        assert 404 == spans[2].attributes["http.response.status_code"]
+        assert StatusCode.UNSET == spans[2].status.status_code
+
+    async def test_tracing_disabled(self):
+        """Tests no span is started while tracing is off"""
+        with start_span("parse") as span:
+            assert span is None
+
+    async def test_configure_without_opentelemetry(self):
+        """Tests tracing stays off if opentelemetry is not installed"""
+        with (
+            patch("aind_smartsheet_service_server.tracing.trace", None),
+            patch("logging.warning") as mock_warn,
+        ):
+            assert not configure_tracing()
+        mock_warn.assert_called_once()
+        with start_span("parse") as span:
+            assert span is None
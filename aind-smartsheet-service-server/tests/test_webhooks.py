@@ -0,0 +1,145 @@
+"""Tests webhooks module"""
+
+import json
+import os
+from pathlib import Path
+from typing import Optional
+from unittest.mock import AsyncMock, patch
+
+import pytest
+from httpx import Response
+from pydantic import SecretStr
+from starlette.testclient import TestClient
+
+from aind_smartsheet_service_server.configs import settings
+from aind_smartsheet_service_server.shared import SharedSheets
+from aind_smartsheet_service_server.snapshot import snapshot_store
+from aind_smartsheet_service_server.webhooks import sign_payload
+
+WEBHOOKS_DIR = (
+    Path(os.path.dirname(os.path.realpath(__file__)))
+    / "resources"
+    / "webhooks"
+)
+SHARED_SECRET = "shared-secret"
+
+
+def send_callback(
+    client: TestClient,
+    payload_name: str,
+    shared_secret: Optional[str] = SHARED_SECRET,
+    **overrides,
+) -> Response:
+    """Stand in for Smartsheet. Posts a recorded payload signed the same way
+    Smartsheet signs callbacks."""
+    with open(WEBHOOKS_DIR / payload_name) as f:
+        payload = json.load(f)
+    body = json.dumps(dict(payload, **overrides)).encode()
+    headers = {"Content-Type": "application/json"}
+    if shared_secret is not None:
+        headers["Smartsheet-Hmac-SHA256"] = sign_payload(body, shared_secret)
+    return client.post("/webhooks/smartsheet", content=body, headers=headers)
+
+
+@pytest.fixture()
+def shared_secret():
+    """Configure the webhook shared secret."""
+    with patch.object(
+        settings, "webhook_shared_secret", SecretStr(SHARED_SECRET)
+    ):
+        yield
+
+
+@pytest.mark.asyncio
+class TestWebhooks:
+    """Test responses in webhooks module."""
+
+    async def test_verification(self, client: TestClient, shared_secret):
+        """Tests the verification challenge is echoed back"""
+        response = send_callback(client, "verification.json")
+        challenge = "d78dd1d3-01ce-4481-81de-92b4f3aa5ab1"
+        assert 200 == response.status_code
+        assert challenge == response.headers["Smartsheet-Hook-Response"]
+        assert {"smartsheetHookResponse": challenge} == response.json()
+
+    @patch("aind_smartsheet_service_server.route.get_smartsheet")
+    async def test_row_updated(
+        self,
+        mock_get_sheet: AsyncMock,
+        client: TestClient,
+        shared_secret,
+        mock_raw_funding_sheet: dict,
+    ):
+        """Tests a change to a served sheet reloads it"""
+        mock_get_sheet.return_value = mock_raw_funding_sheet
+        response = send_callback(client, "row_updated.json")
+        assert 200 == response.status_code
+        assert {} == response.json()
+        mock_get_sheet.assert_awaited_once()
+        assert 100 == mock_get_sheet.call_args.kwargs["sheet_id"]
+        assert 105 == snapshot_store.get_current(100).version
+
+    @patch("aind_smartsheet_service_server.route.get_smartsheet")
+    async def test_row_updated_ignored(
+        self, mock_get_sheet: AsyncMock, client: TestClient, shared_secret
+    ):
+        """Tests changes to other sheets or without events are ignored"""
+        response = send_callback(client, "row_updated.json", scopeObjectId=1)
+        assert 200 == response.status_code
+        response = send_callback(client, "row_updated.json", events=[])
+        assert 200 == response.status_code
+        mock_get_sheet.assert_not_called()
+
+    @patch("aind_smartsheet_service_server.route.get_smartsheet")
+    async def test_row_updated_reload_error(
+        self, mock_get_sheet: AsyncMock, client: TestClient, shared_secret
+    ):
+        """Tests a failed reload is logged"""
+        mock_get_sheet.side_effect = ConnectionError("Timed out")
+        with patch("logging.warning") as mock_log_warn:
+            response = send_callback(client, "row_updated.json")
+        assert 200 == response.status_code
+        mock_log_warn.assert_called_once_with(
+            "Unable to refresh sheet 100: Timed out"
+        )
+
+    @patch("aind_smartsheet_service_server.route.get_smartsheet")
+    async def test_row_updated_shared_sheets(
+        self, mock_get_sheet: AsyncMock, client: TestClient, shared_secret
+    ):
+        """Tests changes are rejected when the sheets are shared, but the
+        verification challenge is still echoed back"""
+        with patch(
+            "aind_smartsheet_service_server.shared.shared_sheets",
+            SharedSheets(Path("sheets")),
+        ):
+            response = send_callback(client, "row_updated.json")
+            assert 409 == response.status_code
+            response = send_callback(client, "verification.json")
+            assert 200 == response.status_code
+        mock_get_sheet.assert_not_called()
+
+    async def test_status_changed(self, client: TestClient, shared_secret):
+        """Tests a webhook status change is logged"""
+        with patch("logging.warning") as mock_log_warn:
+            response = send_callback(client, "status_changed.json")
+        assert 200 == response.status_code
+        mock_log_warn.assert_called_once_with(
+            "Webhook 4503604829677444 is now DISABLED_SCOPE_INACCESSIBLE."
+        )
+
+    async def test_invalid_signature(self, client: TestClient, shared_secret):
+        """Tests unsigned or wrongly signed callbacks are rejected"""
+        response = send_callback(
+            client, "verification.json", shared_secret=None
+        )
+        assert 401 == response.status_code
+        response = send_callback(
+            client, "verification.json", shared_secret="other"
+        )
+        assert 401 == response.status_code
+
+    async def test_not_configured(self, client: TestClient):
+        """Tests callbacks are rejected without a shared secret"""
+        response = send_callback(client, "verification.json")
+        assert 503 == response.status_code